@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados precalculados por año - AFJ Global
+Se construyen una vez por snapshot (KPIs, recurrencia, tendencias y heatmap
+para cada año y para "all") y los endpoints solo hacen una búsqueda.
+
+Con NumPy instalado los agregados de un snapshot se calculan vectorizados
+sobre las columnas (fechas en int64 epoch, conteos con bincount); sin NumPy
+se usa el recorrido fila a fila. Ambas rutas dan el mismo resultado.
+"""
+
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+
+from ticket_columns import MISSING, STATUS_NAMES, parse_epoch
+
+try:
+    import numpy as np  # opcional: pip install numpy
+except ImportError:
+    np = None
+
+log = logging.getLogger(__name__)
+
+# Nivel del informe PDF, nombre de prioridad y código (clasificación por contenido)
+REPORT_LEVELS = (('ALTA', 'Alto', 3), ('MEDIA', 'Medio', 2), ('BAJA', 'Bajo', 1))
+
+DAYS_ES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+# Contadores de un Aggregate
+COUNTERS = ('by_status', 'by_priority', 'subjects', 'monthly', 'weekday', 'hourly', 'heatmap', 'dates')
+
+
+def _bump(counter, key, sign):
+    """Suma `sign` a un contador eliminando la clave si llega a cero"""
+    counter[key] += sign
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def parse_created(ticket):
+    """`created_at` del ticket como datetime (None si falta o no es válido)"""
+    created_str = ticket.get('created_at', '')
+    if not created_str:
+        return None
+    try:
+        return datetime.fromisoformat(created_str.replace('Z', '+00:00'))
+    except Exception as e:
+        log.warning("Error procesando fecha", extra={'value': created_str, 'error': str(e)})
+        return None
+
+
+class Aggregate:
+    """Contadores de un conjunto de tickets; admite altas y bajas individuales"""
+
+    def __init__(self, tickets=()):
+        self.total = 0
+        self.closed = 0
+        self.by_status = Counter()
+        self.by_priority = Counter()
+        self.subjects = Counter()
+        self.monthly = Counter()
+        self.weekday = Counter()
+        self.hourly = Counter()
+        self.heatmap = Counter()    # (día, hora) -> tickets
+        self.dates = Counter()
+        self._results = {}
+
+        for ticket in tickets:
+            self.add(ticket)
+
+    def add(self, ticket, sign=1):
+        """Incorpora un ticket en forma de dict (o lo descuenta con sign=-1)"""
+        created = parse_created(ticket)
+        self.add_values(
+            ticket.get('status'), ticket.get('priority'), ticket.get('subject'),
+            created.timetuple() if created is not None else None, sign
+        )
+
+    def add_values(self, status, priority, subject, created, sign=1):
+        """
+        Incorpora un ticket ya descompuesto; `created` es un struct_time en
+        UTC (o None). Es la ruta usada al construir desde columnas.
+        """
+        self._results.clear()
+
+        self.total += sign
+        if status in [4, 5]:
+            self.closed += sign
+        _bump(self.by_status, status, sign)
+        _bump(self.by_priority, priority, sign)
+        if subject:
+            _bump(self.subjects, subject, sign)
+
+        if created is not None:
+            weekday = DAYS_ES[created.tm_wday]
+            month_key = f"{created.tm_year:04d}-{created.tm_mon:02d}"
+            _bump(self.monthly, month_key, sign)
+            _bump(self.weekday, weekday, sign)
+            _bump(self.hourly, created.tm_hour, sign)
+            _bump(self.heatmap, (weekday, created.tm_hour), sign)
+            _bump(self.dates, f"{month_key}-{created.tm_mday:02d}", sign)
+
+    def copy(self):
+        """Agregado independiente con los mismos contadores"""
+        aggregate = Aggregate()
+        aggregate.total = self.total
+        aggregate.closed = self.closed
+        for name in COUNTERS:
+            setattr(aggregate, name, getattr(self, name).copy())
+        return aggregate
+
+    # --------------------------------------------------------
+    # Resultados (mismo formato que los endpoints)
+    # --------------------------------------------------------
+
+    def _memo(self, key, build):
+        if key not in self._results:
+            self._results[key] = build()
+        return self._results[key]
+
+    def kpis(self):
+        return self._memo('kpis', self._build_kpis)
+
+    def recurrence(self, clusters=None):
+        """
+        Top 20 de asuntos. Con `clusters` (recurrence.SubjectClusters) los
+        asuntos parecidos se agrupan; sin él se cuentan asuntos exactos.
+        """
+        if clusters is None:
+            return self._memo('recurrence', self._build_recurrence)
+        return self._memo('recurrence_clusters',
+                          lambda: clusters.recurrence(self.subjects, self.total))
+
+    def trends(self):
+        return self._memo('trends', self._build_trends)
+
+    def report(self):
+        """Contadores con el formato de generate_report.analyze_data (informe PDF)"""
+        return self._memo('report', self._build_report)
+
+    def _build_kpis(self):
+        total = self.total
+        if total == 0:
+            return {
+                "total": 0,
+                "closed": 0,
+                "open": 0,
+                "resolution_rate": 0,
+                "by_priority": {"alta": 0, "media": 0, "baja": 0},
+                "percentages": {"alta": 0, "media": 0, "baja": 0}
+            }
+
+        alta = self.by_priority[3]
+        media = self.by_priority[2]
+        baja = self.by_priority[1]
+
+        return {
+            "total": total,
+            "closed": self.closed,
+            "open": total - self.closed,
+            "resolution_rate": round((self.closed / total * 100), 2),
+            "by_priority": {
+                "alta": alta,
+                "media": media,
+                "baja": baja
+            },
+            "percentages": {
+                "alta": round((alta / total * 100), 1),
+                "media": round((media / total * 100), 1),
+                "baja": round((baja / total * 100), 1)
+            }
+        }
+
+    def _build_recurrence(self):
+        total = self.total
+        return [
+            {
+                "subject": subject,
+                "count": count,
+                "percentage": round((count / total * 100), 1) if total > 0 else 0
+            }
+            for subject, count in self.subjects.most_common(20)
+        ]
+
+    def _build_trends(self):
+        # Heatmap anidado día -> hora, en el orden en que aparecieron
+        heatmap_data = {}
+        for (day, hour), count in self.heatmap.items():
+            heatmap_data.setdefault(day, {})[hour] = count
+
+        # Hora pico (primer máximo, como el recorrido original)
+        max_hour = 0
+        max_count = 0
+        max_day = ''
+        for day in heatmap_data:
+            for hour in heatmap_data[day]:
+                if heatmap_data[day][hour] > max_count:
+                    max_count = heatmap_data[day][hour]
+                    max_hour = hour
+                    max_day = day
+
+        total_days = len(self.dates) if self.dates else 1
+
+        max_load_date = None
+        max_load_count = 0
+        if self.dates:
+            max_load_date, max_load_count = self.dates.most_common(1)[0]
+
+        return {
+            'monthly_created': dict(self.monthly),
+            'weekday_distribution': dict(self.weekday),
+            'hourly_distribution': dict(self.hourly),
+            'heatmap': heatmap_data,
+            'peak_hour': {
+                'day': max_day,
+                'hour': max_hour,
+                'count': max_count
+            },
+            'avg_daily_created': round(self.total / total_days, 2),
+            'avg_daily_resolved': round(self.closed / total_days, 2),
+            'max_load_day': {
+                'date': max_load_date,
+                'count': max_load_count
+            }
+        }
+
+
+    def _build_report(self):
+        years = Counter()
+        for month, count in self.monthly.items():
+            years[int(month[:4])] += count
+        return {
+            'total_tickets': self.total,
+            'priority_count': Counter({name: self.by_priority[code]
+                                       for _, name, code in REPORT_LEVELS if self.by_priority[code]}),
+            'status_count': Counter({
+                STATUS_NAMES.get(status, f"Estado {'N/A' if status in (None, MISSING) else status}"): count
+                for status, count in self.by_status.items()
+            }),
+            'year_count': years,
+            'top_10_subjects': self.subjects.most_common(10),
+            'clasificacion': {level: self.by_priority[code] for level, _, code in REPORT_LEVELS}
+        }
+
+
+def add_row(aggregate, columns, i, created=None, sign=1):
+    """Incorpora la fila `i` de un TicketColumns a un agregado (o la descuenta con sign=-1)"""
+    if created is None and columns.created[i] != MISSING:
+        created = time.gmtime(columns.created[i])
+    aggregate.add_values(columns.status[i], columns.priority[i], columns.subject[i], created, sign)
+
+
+def aggregate_rows(columns, indices):
+    """Agregado de un subconjunto de filas de un TicketColumns"""
+    if np is not None:
+        return _aggregate_arrays(_column_arrays(columns), np.asarray(indices, dtype=np.int64))
+    aggregate = Aggregate()
+    for i in indices:
+        add_row(aggregate, columns, i)
+    return aggregate
+
+
+def build_index(columns):
+    """Agregados para 'all' y para cada año de un TicketColumns, en una sola pasada"""
+    if np is not None:
+        return _build_index_numpy(columns)
+
+    index = {'all': Aggregate()}
+    for i in range(len(columns)):
+        epoch = columns.created[i]
+        created = time.gmtime(epoch) if epoch != MISSING else None
+        add_row(index['all'], columns, i, created)
+        if created is not None:
+            year = str(created.tm_year)
+            if year not in index:
+                index[year] = Aggregate()
+            add_row(index[year], columns, i, created)
+    return index
+
+
+def analyze_trends(tickets):
+    """
+    Tendencias de una lista de tickets (dicts). Con NumPy las fechas se
+    convierten una sola vez a un array int64 y los conteos son vectorizados.
+    """
+    if np is None:
+        return Aggregate(tickets).trends()
+
+    created = np.fromiter((parse_epoch(t.get('created_at')) for t in tickets), dtype=np.int64)
+    status = np.fromiter((t.get('status') or MISSING for t in tickets), dtype=np.int64)
+
+    aggregate = Aggregate()
+    aggregate.total = len(created)
+    aggregate.closed = int(np.count_nonzero((status == 4) | (status == 5)))
+    _add_epochs(aggregate, created[created != MISSING])
+    return aggregate.trends()
+
+
+# ============================================================
+# RUTA VECTORIZADA (NumPy)
+# ============================================================
+#
+# Los contadores se llenan en el orden de primera aparición de cada clave,
+# igual que al sumar fila a fila: así los empates de recurrencia, hora pico
+# y día de máxima carga se resuelven igual en las dos rutas.
+
+SECONDS_PER_DAY = 86400
+
+
+def _count_first(keys, size):
+    """Cuenta y primera posición de cada clave entera en [0, size)"""
+    counts = np.bincount(keys, minlength=size)
+    first = np.full(size, len(keys), dtype=np.int64)
+    np.minimum.at(first, keys, np.arange(len(keys), dtype=np.int64))
+    return counts, first
+
+
+def _group_count_first(groups, counts, first, size):
+    """Reagrupa cuentas/primeras posiciones (p. ej. días -> meses)"""
+    grouped_counts = np.bincount(groups, weights=counts, minlength=size).astype(np.int64)
+    grouped_first = np.full(size, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(grouped_first, groups, first)
+    return grouped_counts, grouped_first
+
+
+def _in_order(counts, first):
+    """Claves presentes con su cuenta, en orden de primera aparición"""
+    present = np.flatnonzero(counts)
+    present = present[np.argsort(first[present], kind='stable')]
+    return present.tolist(), counts[present].tolist()
+
+
+def _first_seen_counts(keys, size):
+    """Claves enteras en [0, size) con su cuenta, en orden de primera aparición"""
+    return _in_order(*_count_first(keys, size))
+
+
+def _add_epochs(aggregate, epochs):
+    """
+    Suma de una vez las fechas de creación (int64 epoch UTC, sin MISSING).
+    Fila a fila solo se calculan día y celda día-semana×hora; mes, día de la
+    semana y hora se derivan de esos conteos, que tienen pocas claves.
+    """
+    aggregate._results.clear()
+    if not len(epochs):
+        return
+
+    days = epochs // SECONDS_PER_DAY
+    first_day = int(days.min())
+    day_span = int(days.max()) - first_day + 1
+    day_counts, day_first = _count_first(days - first_day, day_span)
+
+    # 1970-01-01 fue jueves; lunes = 0
+    cells = ((days + 3) % 7) * 24 + (epochs - days * SECONDS_PER_DAY) // 3600
+    cell_counts, cell_first = _count_first(cells, 7 * 24)
+
+    day_numbers = np.arange(first_day, first_day + day_span, dtype=np.int64)
+    months = day_numbers.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    first_month = int(months[0])
+    keys, counts = _in_order(*_group_count_first(
+        months - first_month, day_counts, day_first, int(months[-1]) - first_month + 1
+    ))
+    labels = np.datetime_as_string((np.array(keys, dtype=np.int64) + first_month).astype('datetime64[M]'))
+    for label, count in zip(labels.tolist(), counts):
+        aggregate.monthly[label] += count
+
+    keys, counts = _in_order(*_group_count_first((day_numbers + 3) % 7, day_counts, day_first, 7))
+    for weekday, count in zip(keys, counts):
+        aggregate.weekday[DAYS_ES[weekday]] += count
+
+    keys, counts = _in_order(*_group_count_first(np.arange(7 * 24) % 24, cell_counts, cell_first, 24))
+    for hour, count in zip(keys, counts):
+        aggregate.hourly[hour] += count
+
+    keys, counts = _in_order(cell_counts, cell_first)
+    for cell, count in zip(keys, counts):
+        aggregate.heatmap[(DAYS_ES[cell // 24], cell % 24)] += count
+
+    keys, counts = _in_order(day_counts, day_first)
+    labels = np.datetime_as_string((np.array(keys, dtype=np.int64) + first_day).astype('datetime64[D]'))
+    for label, count in zip(labels.tolist(), counts):
+        aggregate.dates[label] += count
+
+
+def _column_arrays(columns):
+    """Vistas NumPy (sin copia) de las columnas que usan los agregados"""
+    return {
+        'status': np.frombuffer(columns.status, dtype=np.int16),
+        'priority': np.frombuffer(columns.priority, dtype=np.int8),
+        'created': np.frombuffer(columns.created, dtype=np.int64),
+        'subject': np.frombuffer(columns.subject.codes, dtype=np.uint32),
+        'subject_values': columns.subject.values,
+        'subject_valid': np.array([bool(v) for v in columns.subject.values], dtype=bool),
+    }
+
+
+def _aggregate_arrays(arrays, rows=None):
+    """Agregado de las filas `rows` (todas si es None) a partir de _column_arrays"""
+    status, priority, created, subject = (
+        arrays[name] if rows is None else arrays[name][rows]
+        for name in ('status', 'priority', 'created', 'subject')
+    )
+
+    aggregate = Aggregate()
+    aggregate.total = len(status)
+    aggregate.closed = int(np.count_nonzero((status == 4) | (status == 5)))
+
+    if len(status):
+        keys, counts = _first_seen_counts(status.astype(np.int64) - MISSING,
+                                          int(status.max()) - MISSING + 1)
+        for key, count in zip(keys, counts):
+            aggregate.by_status[key + MISSING] += count
+
+    if len(priority):
+        lowest = int(priority.min())
+        keys, counts = _first_seen_counts(priority.astype(np.int64) - lowest,
+                                          int(priority.max()) - lowest + 1)
+        for key, count in zip(keys, counts):
+            aggregate.by_priority[key + lowest] += count
+
+    subject = subject[arrays['subject_valid'][subject]]
+    if len(subject):
+        names = arrays['subject_values']
+        keys, counts = _first_seen_counts(subject, len(names))
+        for code, count in zip(keys, counts):
+            aggregate.subjects[names[code]] += count
+
+    _add_epochs(aggregate, created[created != MISSING])
+    return aggregate
+
+
+def _build_index_numpy(columns):
+    arrays = _column_arrays(columns)
+    index = {'all': _aggregate_arrays(arrays)}
+
+    created = arrays['created']
+    valid = np.flatnonzero(created != MISSING)
+    years = created[valid].astype('datetime64[s]').astype('datetime64[Y]').astype(np.int64) + 1970
+    for year in np.unique(years).tolist():
+        index[str(year)] = _aggregate_arrays(arrays, valid[years == year])
+    return index
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks del servidor y del informe - AFJ Global
+Cada bench_*.py se ejecuta como script (python benchmarks/bench_x.py);
+synthetic.py genera carga sintética y bench_suite.py mide todo contra la
+API simulada, guardando los resultados en benchmarks/results/.
+"""
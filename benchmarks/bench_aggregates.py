@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: agregados recalculados por petición vs índice precalculado
+
+Uso:
+    python benchmarks/bench_aggregates.py [10000 100000 ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TICKET_STORE_FILE', os.path.join(tempfile.gettempdir(), 'bench_ticket_store.db'))
+
+from aggregates import Aggregate, build_index  # noqa: E402
+from ticket_columns import TicketColumns  # noqa: E402
+from freshdesk_server import filter_by_year, process_ticket  # noqa: E402
+from mock_freshdesk import generate_tickets  # noqa: E402
+
+REQUESTS = 20
+YEARS = ['all', '2025', '2026']
+
+
+def per_request(tickets):
+    """Coste anterior: filtrar y recalcular KPIs, recurrencia y tendencias"""
+    for year in YEARS:
+        aggregate = Aggregate(filter_by_year(tickets, year))
+        aggregate.kpis()
+        aggregate.recurrence()
+        aggregate.trends()
+
+
+def lookup(index):
+    """Coste nuevo: búsqueda en el índice del snapshot"""
+    for year in YEARS:
+        aggregate = index.get(year) or Aggregate()
+        aggregate.kpis()
+        aggregate.recurrence()
+        aggregate.trends()
+
+
+def run(size):
+    tickets = [process_ticket(t) for t in generate_tickets(size)]
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        per_request(tickets)
+    before = (time.perf_counter() - start) / (REQUESTS * len(YEARS))
+
+    start = time.perf_counter()
+    index = build_index(TicketColumns.from_tickets(tickets))
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        lookup(index)
+    after = (time.perf_counter() - start) / (REQUESTS * len(YEARS))
+
+    print(f"{size:>8} tickets | por petición antes: {before * 1000:9.2f} ms | "
+          f"después: {after * 1000:7.3f} ms | construcción del índice (1 vez): {build * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
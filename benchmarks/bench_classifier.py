@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: clasificación de criticidad, implementación anterior vs classifier.py
+
+También mide una sola pasada por nivel (alternancia por prefijos de `re`,
+como con `word_boundary` pero sin `\\b`) frente a `keyword in text`, con
+asuntos solos y con descripciones de varios largos: `in` (búsqueda de
+subcadena en C) gana en todos los casos, por eso sigue siendo el modo por
+defecto.
+
+Uso:
+    python benchmarks/bench_classifier.py [1000000]
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classifier import DEFAULT_LEVEL, RULES, Classifier, _trie_pattern, fold, strip_accents  # noqa: E402
+from mock_freshdesk import SUBJECTS  # noqa: E402
+
+WORDS = ("el usuario indica que la impresora de la oficina no imprime desde ayer "
+         "y necesita ayuda con la configuracion del equipo nuevo").split()
+
+KEYWORDS_ALTA = RULES[0][1]
+KEYWORDS_MEDIA = RULES[1][1]
+
+
+def legacy_classify(subject, description=""):
+    """Implementación anterior: `keyword in text` keyword por keyword"""
+    text = f"{subject} {description}".lower()
+    for keyword in KEYWORDS_ALTA:
+        if keyword in text:
+            return 'Alto'
+    for keyword in KEYWORDS_MEDIA:
+        if keyword in text:
+            return 'Medio'
+    return 'Bajo'
+
+
+class SinglePassClassifier:
+    """Un patrón por nivel sin `\\b` (mismas coincidencias que `in`)"""
+
+    def __init__(self, rules=RULES):
+        self.levels = [
+            (level, re.compile(_trie_pattern(sorted({fold(k) for k in keywords}))).search)
+            for level, keywords in rules
+        ]
+
+    def classify_many(self, tickets):
+        result = []
+        for subject, description in tickets:
+            text = f"{subject} {description}".lower()
+            if not text.isascii():
+                text = strip_accents(text)
+            result.append(next((level for level, search in self.levels if search(text)), DEFAULT_LEVEL))
+        return result
+
+
+def run_single_pass(size):
+    """Subcadenas: `in` por keyword frente a una alternancia por nivel"""
+    rnd = random.Random(2)
+    classifier, single_pass = Classifier(), SinglePassClassifier()
+    for length in (0, 100, 400, 1500):
+        pairs = [(rnd.choice(SUBJECTS), ' '.join(rnd.choice(WORDS) for _ in range(length // 6)))
+                 for _ in range(size)]
+        timings, results = [], []
+        for candidate in (classifier, single_pass):
+            start = time.perf_counter()
+            results.append(candidate.classify_many(pairs))
+            timings.append(time.perf_counter() - start)
+        assert results[0] == results[1]
+        print(f"{size:>8} tickets | descripción ~{length:>4} car. | in {timings[0]:6.2f} s | "
+              f"una pasada (re) {timings[1]:6.2f} s")
+
+
+def run(size):
+    rnd = random.Random(1)
+    pairs = [(f"{rnd.choice(SUBJECTS)} - usuario {i}", '') for i in range(size)]
+
+    start = time.perf_counter()
+    for subject, description in pairs:
+        legacy_classify(subject, description)
+    legacy = time.perf_counter() - start
+
+    for name, classifier in [('reglas', Classifier(accent_insensitive=False)),
+                             ('reglas + tildes', Classifier()),
+                             ('reglas + \\b', Classifier(word_boundary=True))]:
+        start = time.perf_counter()
+        classifier.classify_many(pairs)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>8} asuntos | {name:<15} {elapsed:6.2f} s ({size / elapsed:>10,.0f}/s)")
+
+    print(f"{size:>8} asuntos | {'anterior':<15} {legacy:6.2f} s ({size / legacy:>10,.0f}/s)")
+
+
+if __name__ == '__main__':
+    for size in [int(s) for s in sys.argv[1:]] or [1000000]:
+        run(size)
+        run_single_pass(min(size, 100000))
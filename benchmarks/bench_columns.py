@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: memoria del snapshot como lista de dicts vs TicketColumns
+
+Cada medición corre en un subproceso propio. Los tickets se generan por
+bloques y pasan por JSON (igual que al leerlos del almacén), así solo queda
+en memoria la representación medida.
+
+Uso:
+    python benchmarks/bench_columns.py [100000 1000000 ...]
+"""
+
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK = 50000
+
+
+def current_rss():
+    """RSS actual del proceso en MB (Linux)"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def stored_tickets(size):
+    """Tickets procesados tal como salen del almacén (un json.loads por fila)"""
+    from freshdesk_server import process_ticket
+    from mock_freshdesk import generate_tickets
+
+    for offset in range(0, size, CHUNK):
+        for t in generate_tickets(min(CHUNK, size - offset), seed=offset):
+            t['id'] += offset
+            yield json.loads(json.dumps(process_ticket(t)))
+
+
+def measure(mode, size):
+    from ticket_columns import TicketColumns
+    import freshdesk_server  # noqa: F401 - carga las dependencias antes de medir
+
+    gc.collect()
+    before = current_rss()
+    start = time.perf_counter()
+    if mode == 'dicts':
+        data = list(stored_tickets(size))
+    else:
+        data = TicketColumns.from_tickets(stored_tickets(size))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = current_rss() - before
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'retained_mb': retained, 'peak_mb': peak, 'seconds': elapsed,
+                      'rows': len(data)}))
+
+
+def run(size):
+    results = {}
+    for mode in ('dicts', 'columns'):
+        out = subprocess.run(
+            [sys.executable, __file__, '--measure', mode, str(size)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    d, c = results['dicts'], results['columns']
+    print(f"{size:>9} tickets | dicts {d['retained_mb']:8.1f} MB (pico {d['peak_mb']:7.1f}) | "
+          f"columnas {c['retained_mb']:7.1f} MB (pico {c['peak_mb']:7.1f}) | "
+          f"x{d['retained_mb'] / max(c['retained_mb'], 0.1):.1f} menos")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--measure':
+        os.environ.setdefault('TICKET_STORE_FILE', os.path.join(tempfile.gettempdir(), 'bench_ticket_store.db'))
+        measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        sizes = [int(a) for a in sys.argv[1:]] or [100000, 1000000]
+        for size in sizes:
+            run(size)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: recurrencia por asunto exacto vs clusters MinHash/LSH
+
+Genera asuntos a partir de los de tickets_data.json con variaciones típicas
+(RE:/FW:, otros nombres de persona, fechas, números de portátil, erratas) y
+mide la asignación incremental a clusters y el cálculo del top 20.
+
+Uso:
+    python benchmarks/bench_recurrence.py [10000 100000 ...]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from recurrence import SubjectClusters  # noqa: E402
+
+NAMES = ['Laura', 'Pedro', 'Camila', 'Jorge', 'Valentina', 'Diego', 'Sofía', 'Matías']
+SURNAMES = ['Rojas', 'Muñoz', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda', 'Morales']
+MONTHS = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Octubre', 'Diciembre']
+PREFIXES = ['', '', '', 'RE: ', 'RV: ', 'FW: ']
+
+
+def base_subjects():
+    with open(os.path.join(ROOT, 'tickets_data.json'), encoding='utf-8') as f:
+        return [t['subject'] for t in json.load(f)['tickets'] if t['subject']]
+
+
+def variant(rnd, subject):
+    """Una variación realista de un asunto"""
+    text = subject
+    roll = rnd.random()
+    if roll < 0.3:
+        text += f" - {rnd.choice(NAMES)} {rnd.choice(SURNAMES)}"
+    elif roll < 0.5:
+        text += f"_{rnd.choice(MONTHS)} {rnd.randint(1, 28):02d}"
+    elif roll < 0.6:
+        text += f" - Portátil {rnd.randint(1, 150)}"
+    if rnd.random() < 0.05 and len(text) > 8:
+        i = rnd.randrange(len(text))
+        text = text[:i] + text[i + 1:]
+    return rnd.choice(PREFIXES) + text
+
+
+def coverage(top, total):
+    return sum(entry['count'] for entry in top) / total * 100
+
+
+def run(size):
+    rnd = random.Random(7)
+    bases = base_subjects()
+    subjects = [variant(rnd, rnd.choice(bases)) for _ in range(size)]
+
+    start = time.perf_counter()
+    counter = Counter(subjects)
+    exact = [{'subject': s, 'count': c} for s, c in counter.most_common(20)]
+    exact_time = time.perf_counter() - start
+
+    clusters = SubjectClusters()
+    start = time.perf_counter()
+    clusters.add_many(counter)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fuzzy = clusters.recurrence(counter, size)
+    query_time = time.perf_counter() - start
+
+    fresh = [variant(rnd, rnd.choice(bases)) + f" #{i}" for i in range(1000)]
+    start = time.perf_counter()
+    for subject in fresh:
+        clusters.cluster_of(subject)
+    incremental = (time.perf_counter() - start) / len(fresh)
+
+    print(f"{size:>8} asuntos ({len(counter)} distintos -> {len(clusters)} clusters)")
+    print(f"         exacto: top20 {exact_time * 1000:7.1f} ms, cubre {coverage(exact, size):5.1f}% de los tickets")
+    print(f"         LSH:    asignación inicial {build_time * 1000:7.1f} ms "
+          f"({build_time / len(counter) * 1e6:.0f} µs/asunto distinto), "
+          f"top20 {query_time * 1000:6.1f} ms, cubre {coverage(fuzzy, size):5.1f}%")
+    print(f"         ticket nuevo (asunto no visto): {incremental * 1e6:.0f} µs")
+    for entry in fuzzy[:5]:
+        print(f"           {entry['count']:>6}  {entry['variants']:>5} variantes  {entry['subject']}")
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: carga del informe PDF (Excel completo en memoria vs streaming)
+
+Genera un Excel con N filas (por defecto 500.000) a partir de los tickets de
+tickets_data.json, y los mismos datos en JSON y NDJSON. Cada variante corre
+en un proceso aparte para medir su pico de memoria (ru_maxrss):
+
+- antes: openpyxl.load_workbook completo + lista de dicts + analyze_data
+- xlsx / json / ndjson: generadores de report_sources + analyze_data en una pasada
+
+Uso:
+    python benchmarks/bench_report.py [500000]
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = ('antes', 'xlsx', 'json', 'ndjson')
+
+
+def write_inputs(size, directory):
+    """Excel (write_only), JSON y NDJSON con `size` tickets"""
+    import openpyxl
+
+    with open(os.path.join(ROOT, 'tickets_data.json'), encoding='utf-8') as f:
+        base = json.load(f)['tickets']
+    headers = list(base[0].keys())
+
+    def rows():
+        for n in range(size):
+            t = dict(base[n % len(base)])
+            t['id'] = n + 1
+            yield t
+
+    paths = {name: os.path.join(directory, f'tickets_{size}.{name}') for name in VARIANTS[1:]}
+    paths['antes'] = paths['xlsx']
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Todos los Tickets')
+    sheet.append(headers)
+    for t in rows():
+        sheet.append([t[h] for h in headers])
+    workbook.save(paths['xlsx'])
+
+    with open(paths['json'], 'w', encoding='utf-8') as f:
+        f.write('{"tickets": [\n')
+        for n, t in enumerate(rows()):
+            f.write((',\n' if n else '') + json.dumps(t, ensure_ascii=False))
+        f.write('\n]}\n')
+    with open(paths['ndjson'], 'w', encoding='utf-8') as f:
+        for t in rows():
+            f.write(json.dumps(t, ensure_ascii=False) + '\n')
+    return paths
+
+
+def run_variant(variant, path):
+    """Se ejecuta en un proceso hijo: imprime tiempo y pico de memoria"""
+    from generate_report import analyze_data
+    from report_sources import open_source
+
+    start = time.perf_counter()
+    if variant == 'antes':
+        import openpyxl
+        workbook = openpyxl.load_workbook(path)
+        sheet = workbook['Todos los Tickets']
+        headers = [cell.value for cell in sheet[1]]
+        tickets = [dict(zip(headers, row)) for row in sheet.iter_rows(min_row=2, values_only=True)]
+        data = analyze_data(tickets)
+    else:
+        data = analyze_data(open_source(path))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'seconds': elapsed, 'rss_mb': peak, 'total': data['total_tickets'],
+                      'clasificacion': data['clasificacion']}))
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    directory = os.environ.get('BENCH_DIR', tempfile.gettempdir())
+
+    start = time.perf_counter()
+    paths = write_inputs(size, directory)
+    print(f"{size} filas (archivos en {directory}, {time.perf_counter() - start:.0f}s en generarlos)")
+    for name in VARIANTS[1:]:
+        print(f"  {name:<7} {os.path.getsize(paths[name]) / 1e6:8.1f} MB")
+
+    results = {}
+    for variant in VARIANTS:
+        output = subprocess.run([sys.executable, __file__, '--run', variant, paths[variant]],
+                                capture_output=True, text=True, check=True).stdout
+        results[variant] = json.loads(output.strip().splitlines()[-1])
+        r = results[variant]
+        print(f"  {variant:<7} {r['seconds']:7.1f} s   pico RSS {r['rss_mb']:7.0f} MB   "
+              f"({r['total']} tickets, {r['clasificacion']})")
+
+    assert len({json.dumps(r['clasificacion']) for r in results.values()}) == 1
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run_variant(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: búsqueda con índice invertido vs filtrar todos los tickets
+
+Los asuntos salen de tickets_data.json (con variaciones) y las descripciones
+se arman con frases típicas de soporte (~40 palabras). Se mide la
+construcción del índice, la latencia de consultas (palabra común, rara,
+prefijo, varias palabras, con año), el coste de un ticket nuevo o
+actualizado y, como referencia, el filtrado lineal que hacía el navegador.
+
+Uso:
+    python benchmarks/bench_search.py [10000 100000 ...]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from classifier import fold  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from ticket_columns import TicketColumns  # noqa: E402
+
+PHRASES = [
+    'El usuario indica que no puede acceder al correo desde el portátil.',
+    'Se reinició el equipo y el problema persiste.',
+    'Solicita revisar la impresora de la oficina, no imprime en color.',
+    'Outlook muestra el mensaje de buzón lleno y no recibe correos.',
+    'Se requiere dar de alta la licencia de Office para el nuevo colaborador.',
+    'La conexión por escritorio remoto se corta cada pocos minutos.',
+    'No sincroniza la carpeta compartida de SharePoint con OneDrive.',
+    'Pide restablecer la contraseña de la plataforma Moodle.',
+    'Se detectó un posible virus en el adjunto recibido.',
+    'La VPN no conecta desde la red de la casa del usuario.',
+    'Adjunta captura de pantalla con el error.',
+    'Gracias, quedo atento a sus comentarios.',
+]
+
+QUERIES = [
+    ('común', 'correo'),
+    ('rara', 'virus'),
+    ('prefijo', 'impre'),
+    ('dos palabras', 'buzón lleno'),
+    ('con tilde', 'contrasena'),
+    ('prefijo corto', 'co'),
+    ('año', 'outlook', '2025'),
+    ('sin resultados', 'kubernetes'),
+]
+
+REPEAT = 30
+
+
+def base_subjects():
+    with open(os.path.join(ROOT, 'tickets_data.json'), encoding='utf-8') as f:
+        return [t['subject'] for t in json.load(f)['tickets'] if t['subject']]
+
+
+def make_tickets(size, rnd):
+    subjects = base_subjects()
+    start = 1704067200          # 2024-01-01
+    tickets = []
+    for n in range(size):
+        created = start + rnd.randrange(3 * 365 * 86400)
+        tickets.append({
+            'id': 100000 + n,
+            'subject': f"{rnd.choice(subjects)} - {rnd.randint(1, 500)}",
+            'description': ' '.join(rnd.sample(PHRASES, 4)),
+            'status': rnd.choice((2, 3, 4, 5)),
+            'priority': rnd.choice((1, 2, 3)),
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(created)),
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(created + 3600)),
+            'requester_name': f"Usuario {n % 300}",
+            'tags': [],
+        })
+    return tickets
+
+
+def linear(columns, words):
+    """Referencia: recorrer todos los tickets buscando las palabras"""
+    found = []
+    for i in range(len(columns)):
+        text = fold(f"{columns.subject[i]} {columns.description[i]}")
+        if all(word in text for word in words):
+            found.append(i)
+    return found
+
+
+def timed(function, *args):
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return result, times[len(times) // 2] * 1000, times[int(len(times) * 0.95)] * 1000
+
+
+def run(size):
+    rnd = random.Random(16)
+    tickets = make_tickets(size, rnd)
+    columns = TicketColumns.from_tickets(tickets)
+
+    start = time.perf_counter()
+    index = SearchIndex(columns)
+    build = time.perf_counter() - start
+    print(f"{size:>8} tickets: índice en {build * 1000:.0f} ms, {len(index.postings)} términos")
+
+    for name, query, *year in QUERIES:
+        (total, hits, _), median, p95 = timed(index.search, query, year[0] if year else None)
+        print(f"         {name:<15} {query!r:<14} {total:>7} resultados  "
+              f"mediana {median:6.2f} ms  p95 {p95:6.2f} ms")
+
+    start = time.perf_counter()
+    _, median, _ = timed(linear, columns, [fold(w) for w in 'buzón lleno'.split()]) \
+        if size <= 100000 else (None, float('nan'), None)
+    print(f"         filtrado lineal 'buzón lleno': {median:.1f} ms")
+
+    changes = [dict(rnd.choice(tickets), subject=f"Nuevo asunto {n}") for n in range(200)]
+    start = time.perf_counter()
+    for t in changes:
+        i = columns.positions[t['id']]
+        index.remove(i)
+        columns.replace(i, t)
+        index.add(i)
+    update = (time.perf_counter() - start) / len(changes)
+    print(f"         ticket actualizado: {update * 1e6:.0f} µs")
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: snapshot en disco JSON vs binario mapeado (snapshot_binary.py)
+
+Para cada tamaño se arman las columnas con tickets sintéticos, se escriben
+el snapshot JSON (snapshot_file.py) y el binario sin comprimir y con las
+descripciones comprimidas, y se mide en un subproceso nuevo (como un worker
+recién arrancado) cuánto tarda cada uno en quedar listo para servir filas,
+cuánto crece la memoria propia del proceso (RSS privado: las páginas
+mapeadas del archivo se comparten entre procesos) y cuánto tarda en armarse
+el Snapshot (agregados y filas por año) sobre esas columnas.
+
+Uso:
+    python benchmarks/bench_snapshot.py [100000 1000000 ...]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CHUNK = 50000
+
+
+def private_rss():
+    """Memoria privada del proceso en MB (Linux): RSS menos páginas compartidas"""
+    with open('/proc/self/statm') as f:
+        _, resident, shared = (int(value) for value in f.read().split()[:3])
+    return (resident - shared) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def processed_tickets(size):
+    """Tickets con el formato del visor, generados por bloques"""
+    import synthetic
+    from ticket_columns import PRIORITY_NAMES
+
+    for offset in range(0, size, CHUNK):
+        for t in synthetic.generate(min(CHUNK, size - offset), seed=offset):
+            priority = 1 + t['id'] % 3
+            yield {
+                'id': t['id'] + offset,
+                'subject': t['subject'],
+                'description': t['description_text'][:200],
+                'priority': priority,
+                'priority_name': PRIORITY_NAMES[priority],
+                'status': t['status'],
+                'status_name': '',
+                'created_at': t['created_at'],
+                'updated_at': t['updated_at'],
+                'requester_name': t['requester']['name'],
+                'tags': t['tags']
+            }
+
+
+def write_files(size, directory):
+    from snapshot_binary import pack_columns, write_binary, zstandard
+    from snapshot_file import write_snapshot
+    from ticket_columns import TicketColumns
+
+    columns = TicketColumns.from_tickets(processed_tickets(size))
+    meta = {'version': 1, 'synced_at': time.time(), 'high_water_mark': None}
+    files = {}
+
+    start = time.perf_counter()
+    path = os.path.join(directory, f'bench_{size}.json')
+    write_snapshot(path, meta, iter(columns))
+    files['json'] = (path, time.perf_counter() - start)
+
+    for compression in ('none', 'zlib') + (('zstd',) if zstandard is not None else ()):
+        start = time.perf_counter()
+        path = os.path.join(directory, f'bench_{size}_{compression}.snap')
+        write_binary(path, meta, pack_columns(columns), compression)
+        files[f'snap {compression}'] = (path, time.perf_counter() - start)
+    return files
+
+
+def measure(kind, path):
+    """Se ejecuta en un subproceso: abre el snapshot como un worker recién arrancado"""
+    from snapshot import Snapshot
+    from snapshot_binary import open_binary
+    from snapshot_file import read_snapshot
+    from ticket_columns import TicketColumns
+
+    before = private_rss()
+    start = time.perf_counter()
+    if kind == 'json':
+        columns = TicketColumns.from_tickets(read_snapshot(path)['tickets'])
+    else:
+        columns = open_binary(path)['columns']
+    opened = time.perf_counter() - start
+    rows = [columns.row(i) for i in (0, len(columns) // 2, len(columns) - 1)]
+    first_rows = time.perf_counter() - start - opened
+    retained = private_rss() - before
+
+    start = time.perf_counter()
+    snapshot = Snapshot(columns, 1)
+    built = time.perf_counter() - start
+    print(json.dumps({'open_ms': opened * 1000, 'rows_ms': first_rows * 1000, 'private_mb': retained,
+                      'snapshot_ms': built * 1000, 'tickets': len(snapshot), 'rows': len(rows)}))
+
+
+def run(size):
+    directory = tempfile.mkdtemp(prefix='bench_snapshot_')
+    files = write_files(size, directory)
+    for kind, (path, written) in files.items():
+        out = subprocess.run(
+            [sys.executable, __file__, '--measure', kind.split()[0], path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{size:>9} {kind:<10} | {os.path.getsize(path) / 2**20:8.1f} MB "
+              f"(escritura {written:6.2f} s) | abrir {r['open_ms']:9.1f} ms | "
+              f"3 filas {r['rows_ms']:6.2f} ms | privada {r['private_mb']:7.1f} MB | "
+              f"Snapshot {r['snapshot_ms']:8.0f} ms")
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--measure':
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        sizes = [int(a) for a in sys.argv[1:]] or [100000, 1000000]
+        for size in sizes:
+            run(size)
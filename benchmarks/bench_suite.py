@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark completo con carga sintética y la API de Freshdesk simulada
+
+Para cada tamaño (por defecto 1k, 10k, 100k y 1M tickets), en un proceso
+aparte para que la memoria de un tamaño no afecte al siguiente:
+
+1. Genera los tickets con benchmarks/synthetic.py (distribuciones de
+   tickets_data.json).
+2. Levanta mock_freshdesk.py en otro proceso con esos mismos tickets
+   (misma semilla), con la latencia, el tamaño de página y los 429 pedidos.
+3. Mide las funciones clave: classify_priority, fetch_tickets (descarga de
+   la API), sync_tickets completo, carga del snapshot, analyze_trends y
+   generate_report.analyze_data.
+4. Mide todos los endpoints de Flask con el cliente de pruebas: primera
+   llamada (construye agregados, índices y caches) y repeticiones. Si hay un
+   endpoint registrado que no está en ENDPOINTS se indica en el resultado.
+
+Los resultados se guardan en benchmarks/results/ (JSON) para comparar
+ejecuciones:
+
+Uso:
+    python benchmarks/bench_suite.py                       # 1k, 10k, 100k, 1M
+    python benchmarks/bench_suite.py --sizes 1000 10000 --latency 0.05 --throttle-every 20
+    python benchmarks/bench_suite.py --compare results/antes.json results/despues.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Cada medición se repite hasta superar REPEAT_SECONDS (o MAX_REPEAT veces)
+REPEAT_SECONDS = 2.0
+MAX_REPEAT = 20
+
+# Diferencia (en la mediana) a partir de la cual --compare marca un cambio
+COMPARE_THRESHOLD = 0.10
+
+WEBHOOK_SECRET = 'bench'
+PROFILE_TOKEN = 'bench'
+
+# (nombre, método, ruta, opciones): la primera llamada es en frío
+ENDPOINTS = [
+    ('index', 'GET', '/', {}),
+    ('index empresa', 'GET', '/afj/', {}),
+    ('companies', 'GET', '/api/companies', {}),
+    ('tickets', 'GET', '/api/tickets', {}),
+    ('tickets año', 'GET', '/api/tickets?year=2025', {}),
+    ('tickets página', 'GET', '/api/tickets?limit=100&sort=-created_at', {}),
+    ('tickets empresa', 'GET', '/api/afj/tickets?limit=100', {}),
+    ('export ndjson', 'GET', '/api/tickets/export?format=ndjson', {}),
+    ('export csv', 'GET', '/api/tickets/export?format=csv&year=2025', {}),
+    ('kpis', 'GET', '/api/kpis', {}),
+    ('kpis año', 'GET', '/api/kpis?year=2025', {}),
+    ('recurrence', 'GET', '/api/recurrence', {}),
+    ('recurrence exact', 'GET', '/api/recurrence?mode=exact', {}),
+    ('trends', 'GET', '/api/trends', {}),
+    ('dashboard', 'GET', '/api/dashboard', {}),
+    ('dashboard año', 'GET', '/api/dashboard?year=2025', {}),
+    ('search', 'GET', '/api/search?q=correo', {}),
+    ('search prefijo', 'GET', '/api/search?q=impre&year=2025', {}),
+    ('report.pdf', 'GET', '/api/report.pdf?year=2025', {}),
+    ('events', 'GET', '/api/events', {'stream': True}),
+    ('webhook', 'POST', '/api/webhooks/freshdesk', {'webhook': True}),
+    ('refresh', 'GET', '/api/refresh', {}),
+    ('metrics', 'GET', '/metrics', {}),
+    ('kpis perfilado', 'GET', f'/api/kpis?_profile=1&_profile_token={PROFILE_TOKEN}', {}),
+    ('dashboard stacks', 'GET', f'/api/dashboard?_profile=stacks&_profile_token={PROFILE_TOKEN}', {}),
+    ('profiles', 'GET', f'/debug/profiles?token={PROFILE_TOKEN}', {}),
+    ('profile texto', 'GET', f'/debug/profiles/{{name}}?token={PROFILE_TOKEN}&format=text', {'profile': True}),
+    ('refresh full', 'GET', '/api/refresh?full=1', {'repeat': 1}),
+]
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def measure(function, repeat=MAX_REPEAT, budget=REPEAT_SECONDS):
+    """
+    Ejecuta `function` dos veces (una si repeat=1) y la repite hasta
+    `budget` segundos. Retorna (último resultado, tiempos): la primera
+    llamada va aparte porque suele construir caches; mediana y p95 son de
+    las siguientes (o de la primera si no hubo más).
+    """
+    times = []
+    started = time.perf_counter()
+    while True:
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+        if len(times) >= min(repeat, 2) and (
+                len(times) >= repeat or time.perf_counter() - started >= budget):
+            break
+    warm = sorted(times[1:]) or times
+    return result, {
+        'first_ms': round(times[0] * 1000, 3),
+        'median_ms': round(warm[len(warm) // 2] * 1000, 3),
+        'p95_ms': round(warm[min(len(warm) - 1, int(len(warm) * 0.95))] * 1000, 3),
+        'runs': len(times)
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve_mock(port, size, seed, latency, throttle_every, page_size):
+    """Proceso del mock: genera los mismos tickets (misma semilla) y los sirve"""
+    from werkzeug.serving import make_server
+    import mock_freshdesk
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = mock_freshdesk.create_app(synthetic.generate(size, seed), latency=latency,
+                                    throttle_every=throttle_every, retry_after=1,
+                                    page_size=page_size)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def wait_for(port, timeout=900):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El mock no respondió en el puerto {port}")
+
+
+def call_endpoint(client, method, path, options, webhook_ids):
+    """Una petición completa (cuerpo incluido); retorna (status, bytes)"""
+    if options.get('stream'):
+        response = client.open(path, method=method, buffered=False)
+        chunks = response.response
+        body = next(chunks) + next(chunks)        # retry + evento hello
+        response.close()
+        return response.status_code, len(body)
+    if options.get('profile'):
+        # El .prof más reciente (los deja 'kpis perfilado')
+        profiles = sys.modules['freshdesk_server'].profiler.list()
+        path = path.format(name=next(p['name'] for p in profiles if p['name'].endswith('.prof')))
+    if options.get('webhook'):
+        ticket_id = next(webhook_ids)
+        payload = {"freshdesk_webhook": {
+            "ticket_id": ticket_id, "ticket_status": "Resolved",
+            "ticket_updated_at": time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "ticket_company_id": synthetic.COMPANY_ID
+        }}
+        response = client.open(path, method=method, json=payload,
+                                headers={'X-Webhook-Secret': WEBHOOK_SECRET})
+        return response.status_code, len(response.get_data())
+    response = client.open(path, method=method)
+    return response.status_code, len(response.get_data())
+
+
+def run_size(size, options):
+    """Se ejecuta en un proceso hijo; retorna el dict de resultados del tamaño"""
+    directory = options.tmpdir
+    store = os.path.join(directory, f'bench_suite_{size}.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(store + suffix):
+            os.remove(store + suffix)
+    # Sin PDFs de una ejecución anterior: la primera petición del informe es en frío
+    reports = os.path.join(directory, f'bench_suite_reports_{size}')
+    shutil.rmtree(reports, ignore_errors=True)
+
+    port = free_port()
+    os.environ.pop('FRESHDESK_COMPANIES', None)
+    os.environ.update({
+        'TICKET_STORE_FILE': store,
+        'FRESHDESK_URL': f'http://127.0.0.1:{port}',
+        'FRESHDESK_RATE_LIMIT': str(10 ** 9),     # sin turnos: se mide el cliente y el mock
+        'FRESHDESK_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'REPORT_CACHE_DIR': reports,
+        'PROFILE_TOKEN': PROFILE_TOKEN,
+        'PROFILE_DIR': os.path.join(reports, 'profiles'),
+        'SNAPSHOT_DIR': os.path.join(reports, 'snapshots'),
+        'SNAPSHOT_SEED': '',                      # sin semilla: solo los tickets del mock
+        'CACHE_TTL': str(10 ** 6),                # sin actualizaciones en segundo plano
+        'LOG_LEVEL': 'WARNING'                    # un log por webhook ensuciaría la salida
+    })
+
+    # El mock arranca antes de importar el servidor (proceso aún sin hilos)
+    mock = multiprocessing.get_context('fork').Process(
+        target=serve_mock, daemon=True,
+        args=(port, size, options.seed, options.latency, options.throttle_every, options.page_size)
+    )
+    mock.start()
+
+    functions, endpoints = {}, {}
+    result = {'size': size, 'functions': functions, 'endpoints': endpoints}
+    quiet = open(os.devnull, 'w') if not options.verbose else sys.stderr
+    stdout, sys.stdout = sys.stdout, quiet
+    try:
+        raw, functions['generate'] = measure(lambda: synthetic.generate(size, options.seed), repeat=1)
+        log(f"{size}: {len(raw)} tickets generados en {functions['generate']['first_ms'] / 1000:.1f}s")
+
+        start = time.perf_counter()
+        import freshdesk_server as fs
+        from generate_report import analyze_data
+        from tenants import Tenant
+        fs.start()
+        functions['import_server'] = {'first_ms': round((time.perf_counter() - start) * 1000, 3)}
+        tenant = fs.tenants[fs.DEFAULT_TENANT]
+        fs.client.per_page = options.page_size
+        fs.client.max_pages = size // options.page_size + 1
+
+        # Clasificación: ticket a ticket (classify_priority) y en lote
+        def classify_all():
+            for t in raw:
+                fs.classify_priority(t['subject'], t['description_text'])
+        _, functions['classify_priority'] = measure(classify_all, repeat=2)
+        functions['classify_priority']['per_ticket_us'] = round(
+            functions['classify_priority']['median_ms'] * 1000 / size, 3)
+        priorities, functions['classify_many'] = measure(
+            lambda: fs.classify_many((t['subject'], t['description_text']) for t in raw), repeat=2)
+
+        # Informe PDF: agregación de generate_report sobre filas tipo Excel
+        rows = [synthetic.report_ticket(t, p) for t, p in zip(raw, priorities)]
+        raw = priorities = None
+        _, functions['analyze_data'] = measure(lambda: analyze_data(rows), repeat=3)
+        rows = None
+
+        # Descarga desde el mock (antes get_tickets_from_api) e ingesta completa
+        wait_for(port)
+        throttled = fs.client.throttled
+        fetched, functions['fetch_tickets'] = measure(lambda: fs.fetch_tickets(tenant), repeat=1)
+        functions['fetch_tickets'].update({
+            'tickets': len(fetched), 'pages': -(-len(fetched) // options.page_size),
+            'throttled': fs.client.throttled - throttled
+        })
+        del fetched
+        log(f"{size}: descarga en {functions['fetch_tickets']['first_ms'] / 1000:.1f}s")
+
+        _, functions['sync_tickets_full'] = measure(lambda: fs.sync_tickets(tenant, full=True), repeat=1)
+        snapshot, functions['snapshot_load'] = measure(lambda: fs.get_cached_tickets(tenant), repeat=1)
+
+        # Arranque en caliente: copia en disco y restauración en un almacén vacío
+        def save_snapshot():
+            tenant.saved_version = None
+            tenant.save_lock.acquire()
+            fs._save_snapshot(tenant)
+        _, functions['snapshot_save'] = measure(save_snapshot, repeat=1)
+        warm_store = os.path.join(directory, f'bench_suite_warm_{size}.db')
+
+        def warm_start():
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(warm_store + suffix):
+                    os.remove(warm_store + suffix)
+            warm = Tenant(tenant.slug, tenant.company_id, tenant.name, warm_store)
+            fs.restore_snapshot(warm)
+            fs.load_snapshot(warm)
+            return len(warm.cache['data'])
+        restored, functions['warm_start'] = measure(warm_start, repeat=1)
+        functions['warm_start']['tickets'] = restored
+
+        # Worker nuevo sobre el mismo almacén: mapea la copia binaria en lugar de leer SQLite
+        def map_snapshot():
+            worker = Tenant(tenant.slug, tenant.company_id, tenant.name, tenant.store.path)
+            fs.load_snapshot(worker)
+            return len(worker.cache['data'])
+        mapped, functions['snapshot_map'] = measure(map_snapshot, repeat=1)
+        functions['snapshot_map']['tickets'] = mapped
+
+        tickets = snapshot.columns.rows()
+        _, functions['analyze_trends'] = measure(lambda: fs.analyze_trends(tickets), repeat=3)
+        tickets = None
+        log(f"{size}: funciones medidas, endpoints...")
+
+        # Endpoints
+        client = fs.app.test_client()
+        adapter = fs.app.url_map.bind('localhost')
+        ids = snapshot.columns.ids
+        webhook_ids = (ids[i % len(ids)] for i in range(10 ** 9))
+        covered = set()
+        for name, method, path, opts in ENDPOINTS:
+            covered.add(adapter.match(path.split('?')[0], method=method)[0])
+            (status, size_bytes), timing = measure(
+                lambda: call_endpoint(client, method, path, opts, webhook_ids),
+                repeat=opts.get('repeat', MAX_REPEAT))
+            endpoints[name] = {'method': method, 'path': path, 'status': status,
+                               'bytes': size_bytes, **timing}
+            log(f"{size}: {name:<18} {status} {timing['first_ms']:10.1f} ms en frío, "
+                f"mediana {timing['median_ms']:9.1f} ms")
+
+        registered = {rule.endpoint for rule in fs.app.url_map.iter_rules() if rule.endpoint != 'static'}
+        result['uncovered_endpoints'] = sorted(registered - covered)
+    finally:
+        sys.stdout = stdout
+        mock.terminate()
+
+    result['rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(results):
+    for key, data in results['sizes'].items():
+        if 'error' in data:
+            print(f"\n{key} tickets: ERROR {data['error']}")
+            continue
+        print(f"\n{key} tickets (pico RSS {data['rss_mb']:.0f} MB)")
+        for name, timing in data['functions'].items():
+            print(f"  {name:<22} {timing.get('median_ms', timing['first_ms']):12.1f} ms")
+        for name, timing in data['endpoints'].items():
+            print(f"  {timing['method']} {name:<18} {timing['status']}  frío {timing['first_ms']:10.1f} ms"
+                  f"   mediana {timing['median_ms']:9.1f} ms   {timing['bytes']:>11} bytes")
+        if data.get('uncovered_endpoints'):
+            print(f"  ⚠️ endpoints sin medir: {', '.join(data['uncovered_endpoints'])}")
+
+
+def compare(old_path, new_path, threshold=COMPARE_THRESHOLD):
+    """Tabla de medianas de dos ejecuciones; marca los cambios mayores que `threshold`"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"{old_path} ({old['meta'].get('commit')}) -> {new_path} ({new['meta'].get('commit')})")
+
+    regressions = 0
+    for size in new['sizes']:
+        if size not in old['sizes'] or 'error' in new['sizes'][size] or 'error' in old['sizes'][size]:
+            continue
+        print(f"\n{size} tickets")
+        for group in ('functions', 'endpoints'):
+            before_group = old['sizes'][size].get(group, {})
+            for name, after in new['sizes'][size].get(group, {}).items():
+                if name not in before_group:
+                    continue
+                before = before_group[name].get('median_ms', before_group[name]['first_ms'])
+                value = after.get('median_ms', after['first_ms'])
+                ratio = value / before if before else float('inf')
+                mark = ''
+                if ratio > 1 + threshold:
+                    mark, regressions = '  ⚠️ más lento', regressions + 1
+                elif ratio < 1 - threshold:
+                    mark = '  ✅ más rápido'
+                print(f"  {name:<22} {before:12.2f} ms -> {value:12.2f} ms  x{ratio:5.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark con carga sintética y mock de Freshdesk')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.0, help='segundos por petición al mock')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--throttle-every', type=int, default=0, help='429 cada N peticiones')
+    parser.add_argument('--output', help='archivo JSON (por defecto en benchmarks/results/)')
+    parser.add_argument('--tmpdir', default=os.environ.get('BENCH_DIR', tempfile.gettempdir()))
+    parser.add_argument('--verbose', action='store_true', help='muestra la salida del servidor')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'))
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.compare:
+        sys.exit(1 if compare(*options.compare) else 0)
+
+    if options.run_size:
+        # Proceso hijo: resultados de un tamaño en options.output
+        result = run_size(options.run_size, options)
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': sys.version.split()[0],
+            'cpus': os.cpu_count(),
+            'numpy': importlib.util.find_spec('numpy') is not None,
+            'options': {name: getattr(options, name)
+                        for name in ('sizes', 'seed', 'latency', 'page_size', 'throttle_every')}
+        },
+        'sizes': {}
+    }
+    for size in options.sizes:
+        partial = os.path.join(options.tmpdir, f'bench_suite_{size}.json')
+        command = [sys.executable, os.path.abspath(__file__), '--run-size', str(size),
+                   '--output', partial, '--seed', str(options.seed),
+                   '--latency', str(options.latency), '--page-size', str(options.page_size),
+                   '--throttle-every', str(options.throttle_every), '--tmpdir', options.tmpdir]
+        if options.verbose:
+            command.append('--verbose')
+        start = time.perf_counter()
+        process = subprocess.run(command)
+        if process.returncode != 0:
+            results['sizes'][str(size)] = {'error': f"salida {process.returncode}"}
+            continue
+        with open(partial, encoding='utf-8') as f:
+            results['sizes'][str(size)] = json.load(f)
+        results['sizes'][str(size)]['wall_seconds'] = round(time.perf_counter() - start, 1)
+
+    output = options.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"suite_{stamp}_{results['meta']['commit'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+
+    print_summary(results)
+    print(f"\nResultados en {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: tendencias fila a fila vs vectorizadas con NumPy
+
+Mide la construcción del índice de agregados desde las columnas del snapshot
+(ruta fila a fila con time.gmtime vs bincount sobre int64), solo las
+tendencias a partir del array de fechas y, hasta 100k, analyze_trends sobre
+una lista de dicts. Comprueba que ambas rutas coinciden.
+
+Uso:
+    python benchmarks/bench_trends.py [10000 100000 1000000 ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TICKET_STORE_FILE', os.path.join(tempfile.gettempdir(), 'bench_ticket_store.db'))
+
+import aggregates  # noqa: E402
+from freshdesk_server import process_ticket  # noqa: E402
+from mock_freshdesk import generate_tickets  # noqa: E402
+from ticket_columns import TicketColumns  # noqa: E402
+
+# Por encima de este tamaño solo se mide el índice (la lista de dicts no cabe cómoda)
+MAX_DICTS = 100000
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def without_numpy(fn, *args):
+    np = aggregates.np
+    aggregates.np = None
+    try:
+        return timed(fn, *args)
+    finally:
+        aggregates.np = np
+
+
+def synthetic_columns(size):
+    """Columnas de `size` tickets (se repiten bloques generados para tamaños grandes)"""
+    block = [process_ticket(t) for t in generate_tickets(min(size, MAX_DICTS))]
+    columns = TicketColumns()
+    for i in range(size):
+        t = block[i % len(block)]
+        columns.append(dict(t, id=i))
+    return columns, block if size <= MAX_DICTS else None
+
+
+def run(size):
+    columns, tickets = synthetic_columns(size)
+
+    loop, loop_time = without_numpy(aggregates.build_index, columns)
+    vector, vector_time = timed(aggregates.build_index, columns)
+    assert all(vector[y].trends() == loop[y].trends() for y in loop), "índices distintos"
+
+    print(f"{size:>9} tickets | índice fila a fila {loop_time * 1000:9.1f} ms | "
+          f"NumPy {vector_time * 1000:8.1f} ms | x{loop_time / vector_time:.0f}")
+
+    created = aggregates.np.frombuffer(columns.created, dtype=aggregates.np.int64)
+    _, epochs_time = timed(aggregates._add_epochs, aggregates.Aggregate(), created)
+    print(f"{'':>9}         | tendencias desde el array int64 (mensual, diario, semana, hora, heatmap): "
+          f"{epochs_time * 1000:.1f} ms")
+
+    if tickets is not None:
+        before, before_time = without_numpy(aggregates.analyze_trends, tickets)
+        after, after_time = timed(aggregates.analyze_trends, tickets)
+        assert before == after, "analyze_trends distinto"
+        print(f"{'':>9}         | analyze_trends    {before_time * 1000:9.1f} ms | "
+              f"NumPy {after_time * 1000:8.1f} ms | x{before_time / after_time:.1f} (incluye parseo ISO)")
+
+
+if __name__ == '__main__':
+    if aggregates.np is None:
+        sys.exit("NumPy no está instalado: pip install numpy")
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+    for size in sizes:
+        run(size)
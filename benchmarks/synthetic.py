@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generador de tickets sintéticos con la forma de los reales - AFJ Global
+
+Las distribuciones salen de tickets_data.json: asuntos (con su frecuencia),
+mezcla de estados, hora del día y día de la semana de creación, tiempo
+hasta la última actualización y tags. Los asuntos se varían con nombres de
+persona, como en los reales ("Alta Arturo Figueroa", "revisar pc - andrea"),
+para que el número de asuntos distintos crezca con el volumen. Las
+descripciones se arman con frases típicas de soporte.
+
+Con la misma semilla se obtienen siempre los mismos tickets: el mock de la
+API puede generarlos en otro proceso sin tener que enviárselos.
+
+Uso:
+    python benchmarks/synthetic.py 100000 > tickets.ndjson
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_FILE = os.path.join(ROOT, 'tickets_data.json')
+
+COMPANY_ID = 63000424434
+# Dos años completos (2024-2025), en el pasado: los sondeos incrementales
+# (updated_since) no encuentran cambios salvo los que haga el benchmark
+START = 1704067200               # 2024-01-01 (lunes)
+DAYS = 2 * 364
+
+# Proporción de asuntos con un nombre de persona añadido
+VARIANT_RATE = 0.5
+
+FIRST_NAMES = ['Andrea', 'Carmen', 'Arturo', 'Michel', 'Lydia', 'Héctor', 'René', 'María José',
+               'Edy', 'Carolina', 'Juan Francisco', 'Sebastián', 'Carla', 'Patricio', 'Silvia',
+               'Gastón', 'Enrique', 'Liz', 'Laura', 'Pedro', 'Gerardo', 'Ángel', 'Lucía', 'Diego']
+LAST_NAMES = ['Charlin', 'Orellana', 'Figueroa', 'Gómez', 'Cruz', 'Pomodoro', 'Andrade', 'Moncada',
+              'Riquelme', 'Martínez', 'Vielma', 'Cueto', 'Alonso', 'Martini', 'Muñoz', 'Contreras',
+              'Barrios', 'Ruiz', 'Fernández', 'Rojas', 'Soto', 'Pérez', 'Díaz', 'Torres']
+
+PHRASES = [
+    'El usuario indica que no puede acceder al correo desde el portátil.',
+    'Se reinició el equipo y el problema persiste.',
+    'Solicita revisar la impresora de la oficina, no imprime en color.',
+    'Outlook muestra el mensaje de buzón lleno y no recibe correos.',
+    'Se requiere dar de alta la licencia de Office para el nuevo colaborador.',
+    'La conexión por escritorio remoto se corta cada pocos minutos.',
+    'No sincroniza la carpeta compartida de SharePoint con OneDrive.',
+    'Pide restablecer la contraseña de la plataforma Moodle.',
+    'Se detectó un posible virus en el adjunto recibido.',
+    'La VPN no conecta desde la red de la casa del usuario.',
+    'Adjunta captura de pantalla con el error.',
+    'Gracias, quedo atento a sus comentarios.',
+]
+
+
+def _weights(counter, keys, smoothing=1):
+    """Pesos acumulados de `keys` según `counter` (+smoothing para no dejar ceros)"""
+    total, cumulative = 0, []
+    for key in keys:
+        total += counter.get(key, 0) + smoothing
+        cumulative.append(total)
+    return cumulative
+
+
+class Distribution:
+    """Distribuciones empíricas de tickets_data.json"""
+
+    def __init__(self, path=SEED_FILE):
+        with open(path, encoding='utf-8') as f:
+            tickets = json.load(f)['tickets']
+
+        subjects = Counter(t['subject'].strip() for t in tickets if (t.get('subject') or '').strip())
+        self.subjects = list(subjects)
+        self.subject_weights = _weights(subjects, self.subjects, smoothing=0)
+
+        statuses = Counter(t['status'] for t in tickets)
+        self.statuses = [2, 3, 4, 5]
+        self.status_weights = _weights(statuses, self.statuses, smoothing=0)
+
+        created = [datetime.fromisoformat(t['created_at'].replace('Z', '+00:00')) for t in tickets]
+        self.hours = list(range(24))
+        self.hour_weights = _weights(Counter(c.hour for c in created), self.hours)
+        self.weekdays = list(range(7))
+        self.weekday_weights = _weights(Counter(c.weekday() for c in created), self.weekdays)
+
+        self.delays = [
+            max(0, int(datetime.fromisoformat(t['updated_at'].replace('Z', '+00:00')).timestamp()
+                       - c.timestamp()))
+            for t, c in zip(tickets, created)
+        ]
+        tags = Counter(t.get('tags') or '' for t in tickets)
+        self.tags = list(tags)
+        self.tag_weights = _weights(tags, self.tags, smoothing=0)
+
+
+def generate(count, seed=42, distribution=None, start=START, days=DAYS):
+    """
+    `count` tickets crudos con el formato de /api/v2/tickets (description_text,
+    requester...), ordenados del más reciente al más antiguo como la API.
+    """
+    d = distribution or Distribution()
+    rnd = random.Random(seed)
+    weeks = days // 7
+
+    subjects = rnd.choices(d.subjects, cum_weights=d.subject_weights, k=count)
+    statuses = rnd.choices(d.statuses, cum_weights=d.status_weights, k=count)
+    hours = rnd.choices(d.hours, cum_weights=d.hour_weights, k=count)
+    weekdays = rnd.choices(d.weekdays, cum_weights=d.weekday_weights, k=count)
+    tags = rnd.choices(d.tags, cum_weights=d.tag_weights, k=count)
+
+    tickets = []
+    for n in range(count):
+        subject = subjects[n]
+        if rnd.random() < VARIANT_RATE:
+            subject = f"{subject} - {rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        created = (start + (rnd.randrange(weeks) * 7 + weekdays[n]) * 86400
+                   + hours[n] * 3600 + rnd.randrange(3600))
+        updated = created + rnd.choice(d.delays)
+        tickets.append({
+            'id': 100000 + n,
+            'subject': subject,
+            'description_text': ' '.join(rnd.sample(PHRASES, rnd.randint(1, 4))),
+            'status': statuses[n],
+            'priority': 1,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(created)),
+            'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(updated)),
+            'requester': {'name': f"Usuario {rnd.randrange(300)}"},
+            'tags': [tags[n]] if tags[n] else [],
+            'company_id': COMPANY_ID
+        })
+    tickets.sort(key=lambda t: t['created_at'], reverse=True)
+    return tickets
+
+
+def report_ticket(raw, priority):
+    """Ticket crudo con el formato del Excel exportado (entrada de generate_report)"""
+    return {
+        'id': raw['id'],
+        'subject': raw['subject'],
+        'description': raw['description_text'],
+        'priority': priority,
+        'status': raw['status'],
+        'created_at': raw['created_at'],
+        'updated_at': raw['updated_at'],
+        'tags': ','.join(raw['tags'])
+    }
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for ticket in generate(size):
+        sys.stdout.write(json.dumps(ticket, ensure_ascii=False) + '\n')
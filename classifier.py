@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clasificador de criticidad por keywords - AFJ Global
+Reglas únicas para el servidor y el generador de informes. Se preparan una
+sola vez (keywords normalizadas, o un patrón compilado cuando se pide
+coincidencia por palabra completa) y se aplican por lote.
+"""
+
+import re
+import unicodedata
+
+# Reglas por nivel, de mayor a menor criticidad (se escriben sin tildes).
+# Lo que no coincide con ninguna regla queda en DEFAULT_LEVEL.
+RULES = [
+    ('Alto', [
+        'aws', 'alarm', 'no enciende', 'no prende', 'escritorio remoto',
+        'virus', 'malware', 'error servidor', 'afjlearning',
+        'sharepoint lentitud', 'moodle', 'caido', 'down', 'critical', 'urgente'
+    ]),
+    ('Medio', [
+        'outlook', 'correo', 'fundae', 'limpieza', 'buzon', 'antivirus',
+        'pst', 'revisar pc', 'sharepoint', 'spam', 'cambio licencia',
+        'acceso carpeta', 'email', 'password', 'licencia'
+    ]),
+]
+
+DEFAULT_LEVEL = 'Bajo'
+
+
+def strip_accents(text):
+    """Quita tildes y diacríticos (buzón -> buzon); descarta lo que no sea ASCII"""
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def fold(text, accent_insensitive=True):
+    """Minúsculas y, opcionalmente, sin tildes"""
+    text = text.lower()
+    if accent_insensitive and not text.isascii():
+        text = strip_accents(text)
+    return text
+
+
+def _trie_pattern(words):
+    """Alternancia factorizada por prefijos ('aws|alarm' -> 'a(?:ws|larm)')"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        optional = '' in node
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        body = '(?:' + '|'.join(branches) + ')'
+        return body + '?' if optional else body
+
+    return build(trie)
+
+
+class Classifier:
+    """
+    Reglas preparadas una vez por nivel.
+
+    Sin `word_boundary` cada nivel es una tupla de keywords normalizadas que se
+    buscan como subcadenas: en CPython `in` es más rápido que una alternancia
+    de `re` para este tamaño de reglas, también con descripciones largas
+    (benchmarks/bench_classifier.py: ~1,3x con asuntos solos, ~1,9x con
+    1.500 caracteres). Con `word_boundary` cada nivel se compila en un único
+    patrón por prefijos con `\b` en los extremos.
+    """
+
+    def __init__(self, rules=RULES, default=DEFAULT_LEVEL, word_boundary=False,
+                 accent_insensitive=True):
+        self.default = default
+        self.word_boundary = word_boundary
+        self.accent_insensitive = accent_insensitive
+        self.levels = []
+
+        for level, keywords in rules:
+            words = tuple(sorted({fold(k, accent_insensitive) for k in keywords}))
+            if word_boundary:
+                self.levels.append((level, re.compile(rf"\b{_trie_pattern(words)}\b").search))
+            else:
+                self.levels.append((level, words))
+
+    def classify(self, subject, description=""):
+        """Nivel de criticidad de un ticket (el primer nivel con coincidencia)"""
+        text = f"{subject} {description}".lower()
+        if self.accent_insensitive and not text.isascii():
+            text = strip_accents(text)
+
+        if self.word_boundary:
+            for level, search in self.levels:
+                if search(text):
+                    return level
+            return self.default
+
+        for level, words in self.levels:
+            for word in words:
+                if word in text:
+                    return level
+        return self.default
+
+    def classify_many(self, tickets):
+        """Clasifica un iterable de pares (asunto, descripción)"""
+        classify = self.classify
+        return [classify(subject, description) for subject, description in tickets]
+
+
+# Instancia compartida con la configuración por defecto
+default_classifier = Classifier()
+
+
+def classify(subject, description=""):
+    return default_classifier.classify(subject, description)
+
+
+def classify_many(tickets):
+    return default_classifier.classify_many(tickets)
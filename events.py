@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canal de eventos en vivo (Server-Sent Events) - AFJ Global
+Cada cliente conectado a /api/events tiene una cola; cuando el snapshot
+cambia se publica un único diff compacto (ids cambiados + variación de
+KPIs) que se reparte a todas las colas. Un solo hilo vigila el almacén
+mientras haya clientes, así la carga depende de los cambios y no del número
+de dashboards abiertos.
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Eventos pendientes por cliente antes de considerarlo desconectado
+MAX_PENDING = 100
+
+# Segundos entre comentarios keep-alive (y entre comprobaciones del almacén)
+KEEPALIVE_SECONDS = 15
+
+
+def format_event(event, data, event_id=None):
+    """Mensaje SSE: líneas `id`, `event` y `data` terminadas en línea en blanco"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return "\n".join(lines) + "\n\n"
+
+
+class EventBroker:
+    """
+    Reparte eventos a los clientes SSE de este proceso.
+
+    `watch` se llama periódicamente desde un hilo propio mientras haya
+    suscriptores (p. ej. para comprobar si otro worker publicó una versión
+    nueva del snapshot).
+    """
+
+    def __init__(self, watch=None, interval=KEEPALIVE_SECONDS):
+        self.watch = watch
+        self.interval = interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=MAX_PENDING)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self.watch and (self._watcher is None or not self._watcher.is_alive()):
+                self._watcher = threading.Thread(target=self._watch_loop, daemon=True)
+                self._watcher.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data, event_id=None):
+        """Encola el evento para todos los clientes; descarta a los que no leen"""
+        message = format_event(event, data, event_id)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(subscriber)
+                log.warning("Cliente SSE sin leer eventos: desconectado")
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._watcher = None
+                    return
+            try:
+                self.watch()
+            except Exception:
+                log.exception("Error comprobando cambios para SSE")
+
+    def stream(self, subscriber, first=None):
+        """
+        Generador de la respuesta SSE: `first` (si hay) y luego los eventos de
+        la cola, con un comentario keep-alive cuando no llega nada.
+        """
+        try:
+            yield f"retry: {self.interval * 1000}\n\n"
+            if first:
+                yield first
+            while True:
+                try:
+                    yield subscriber.get(timeout=self.interval)
+                except queue.Empty:
+                    if subscriber not in self._subscribers:
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
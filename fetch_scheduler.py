@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reparto del rate limit de Freshdesk entre empresas - AFJ Global
+El límite de la API es por cuenta, no por empresa: todas las descargas del
+proceso piden turno aquí antes de cada página. Un token bucket mantiene el
+ritmo por debajo del presupuesto por minuto y, cuando varias empresas
+esperan, el turno es de la que menos ha consumido (cola justa por tiempo
+virtual). Las empresas con alguien mirando el visor pesan ACTIVE_WEIGHT
+veces más: sus páginas avanzan antes sin dejar sin turno a las demás.
+"""
+
+import threading
+import time
+
+# Peso de una empresa con visores activos frente a una sin visores
+ACTIVE_WEIGHT = 4
+
+
+class FetchScheduler:
+    """Token bucket compartido + turno justo entre empresas"""
+
+    def __init__(self, rate_per_minute, burst=10, is_active=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.is_active = is_active or (lambda slug: False)
+
+        self._cond = threading.Condition()
+        self._refilled = time.monotonic()
+        self._clock = 0.0        # tiempo virtual de la última página concedida
+        self.virtual = {}        # empresa -> páginas consumidas / peso
+        self.waiting = {}        # empresa -> peticiones esperando turno
+        self.served = {}         # empresa -> páginas concedidas en total
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _next(self):
+        """Empresa a la que le toca: la de menor tiempo virtual entre las que esperan"""
+        waiting = [slug for slug, count in self.waiting.items() if count]
+        return min(waiting, key=lambda slug: (self.virtual[slug], slug)) if waiting else None
+
+    def acquire(self, slug):
+        """Espera turno y presupuesto para una petición de la empresa `slug`"""
+        with self._cond:
+            if not self.waiting.get(slug):
+                # Una empresa que vuelve tras estar inactiva no acumula crédito
+                self.virtual[slug] = max(self.virtual.get(slug, 0.0), self._clock)
+            self.waiting[slug] = self.waiting.get(slug, 0) + 1
+            self._cond.notify_all()
+            try:
+                while True:
+                    self._refill()
+                    if self.tokens >= 1:
+                        if self._next() == slug:
+                            break
+                        self._cond.wait()
+                    else:
+                        self._cond.wait((1 - self.tokens) / self.rate)
+
+                self.tokens -= 1
+                self._clock = self.virtual[slug]
+                weight = ACTIVE_WEIGHT if self.is_active(slug) else 1
+                self.virtual[slug] += 1.0 / weight
+                self.served[slug] = self.served.get(slug, 0) + 1
+            finally:
+                self.waiting[slug] -= 1
+                self._cond.notify_all()
+
+    def gate(self, slug):
+        """Función sin argumentos para FreshdeskClient (una llamada por petición)"""
+        return lambda: self.acquire(slug)
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            return {
+                "rate_per_minute": round(self.rate * 60),
+                "tokens": round(self.tokens, 1),
+                "served": dict(self.served),
+                "waiting": {slug: count for slug, count in self.waiting.items() if count}
+            }
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cliente HTTP para la API de Freshdesk - AFJ Global
+Reutiliza conexiones keep-alive, descarga páginas en paralelo y respeta los
+límites de la API (429 / Retry-After / X-RateLimit-Remaining).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import UPSTREAM_BYTES, UPSTREAM_SECONDS, UPSTREAM_THROTTLED
+
+log = logging.getLogger(__name__)
+
+
+class FreshdeskAPIError(Exception):
+    """La API de Freshdesk respondió con error tras agotar los reintentos"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"Error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class FreshdeskClient:
+    """Cliente con sesión compartida, páginas concurrentes y throttling adaptativo"""
+
+    # Códigos que se reintentan (además de errores de red)
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, base_url, api_key, workers=4, per_page=100, max_pages=24,
+                 max_retries=5, timeout=30, low_remaining=10):
+        self.base_url = base_url.rstrip('/')
+        self.workers = max(1, workers)
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.low_remaining = low_remaining
+
+        self.session = requests.Session()
+        self.session.auth = (api_key, 'X')
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Estado de throttling compartido entre hilos
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self.rate_limit_remaining = None
+        self.throttled = 0
+
+    # --------------------------------------------------------
+    # Throttling
+    # --------------------------------------------------------
+
+    def _wait_for_budget(self):
+        """Espera si algún hilo recibió un 429 o el presupuesto está casi agotado"""
+        with self._lock:
+            delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _update_budget(self, response):
+        """Ajusta la pausa global según las cabeceras de rate limit"""
+        now = time.monotonic()
+        pause = 0.0
+
+        if response.status_code == 429:
+            self.throttled += 1
+            UPSTREAM_THROTTLED.inc()
+            try:
+                pause = float(response.headers.get('Retry-After', 1))
+            except ValueError:
+                pause = 1.0
+
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            remaining = int(remaining)
+            self.rate_limit_remaining = remaining
+            # Freshdesk renueva el presupuesto cada minuto: si queda poco,
+            # repartir las peticiones restantes a lo largo de la ventana
+            if remaining < self.low_remaining:
+                pause = max(pause, 60.0 / (remaining + 1))
+
+        if pause > 0:
+            with self._lock:
+                self._paused_until = max(self._paused_until, now + pause)
+
+    # --------------------------------------------------------
+    # Peticiones
+    # --------------------------------------------------------
+
+    def get(self, path, params=None, gate=None):
+        """
+        GET con reintentos; retorna el JSON o lanza FreshdeskAPIError.
+        `gate` se llama antes de cada intento (turno en el FetchScheduler).
+        """
+        url = f"{self.base_url}{path}"
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if gate is not None:
+                gate()
+            self._wait_for_budget()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                UPSTREAM_SECONDS.observe(time.perf_counter() - start, status='error')
+                log.warning("Error de red con Freshdesk", extra={'path': path, 'attempt': attempt, 'error': str(e)})
+                last_error = FreshdeskAPIError(None, str(e))
+                time.sleep(min(2 ** attempt, 30))
+                continue
+
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, status=response.status_code)
+            UPSTREAM_BYTES.inc(len(response.content))
+            self._update_budget(response)
+
+            if response.status_code == 200:
+                return response.json()
+
+            last_error = FreshdeskAPIError(response.status_code, response.text[:200])
+            if response.status_code not in self.RETRY_STATUS:
+                break
+            log.warning("Freshdesk respondió con error, reintentando",
+                        extra={'path': path, 'status': response.status_code, 'attempt': attempt})
+            if response.status_code != 429:
+                time.sleep(min(2 ** attempt, 30))
+
+        raise last_error
+
+    def get_pages(self, path, params=None, gate=None):
+        """
+        Descarga las páginas de un listado: retorna (items, completo).
+
+        La primera página se pide sola (un sondeo incremental suele caber en
+        ella) y, solo si llega llena, las siguientes de `workers` en
+        `workers`. Se detiene en la primera página incompleta; si llega a
+        `max_pages` con páginas llenas avisa en el log y `completo` es False.
+        Si alguna página falla lanza FreshdeskAPIError en lugar de retornar
+        datos parciales. `gate` se pasa a cada `get`.
+        """
+        params = dict(params or {})
+
+        def fetch(p):
+            items = self.get(path, {**params, 'page': p, 'per_page': self.per_page}, gate)
+            log.debug("Página recibida", extra={'page': p, 'tickets': len(items)})
+            return items
+
+        results = fetch(1)
+        if len(results) < self.per_page:
+            return results, True
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            page = 2
+            while page <= self.max_pages:
+                batch = range(page, min(page + self.workers, self.max_pages + 1))
+                futures = [executor.submit(fetch, p) for p in batch]
+                pages = [f.result() for f in futures]
+
+                for items in pages:
+                    results.extend(items)
+                    if len(items) < self.per_page:
+                        return results, True
+
+                page += self.workers
+
+        log.warning("Listado truncado en max_pages", extra={
+            'path': path, 'max_pages': self.max_pages, 'items': len(results)
+        })
+        return results, False
+
+    def close(self):
+        self.session.close()
@@ -3,155 +3,604 @@
 """
 Servidor Flask para Visor de Tickets Freshdesk - AFJ Global
 Versión 6.0: Análisis avanzado con Tendencias, KPIs, Criticidad, Recurrencia, Heatmap
+Varias empresas en un mismo proceso: /api/<empresa>/... (ver tenants.py)
 """
 
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, Response, abort, g, has_request_context, jsonify, send_file, request, stream_with_context
 from flask_cors import CORS
-import requests
-from datetime import datetime
-from collections import Counter
+import csv
+import io
+import json
+import logging
 import os
+import socket
+import threading
 import time
 
+from aggregates import analyze_trends as aggregate_trends
+from classifier import classify, classify_many
+from events import EventBroker, format_event
+from fetch_scheduler import FetchScheduler
+from freshdesk_client import FreshdeskAPIError, FreshdeskClient
+from log_config import configure_logging
+from metrics import (AGGREGATION_SECONDS, CACHE_REQUESTS, CLASSIFICATION_SECONDS, CLASSIFIED_TICKETS,
+                     CONTENT_TYPE, REGISTRY, REQUEST_SECONDS, gauge)
+from pagination import PaginationError, page, parse_fields, parse_limit, parse_sort, parse_year
+from profiling import Profiler, stats_text
+from report_cache import ReportCache
+from response_cache import ResponseCache
+from snapshot import Snapshot
+from snapshot_binary import SnapshotFormatError, binary_path, open_binary, pack_columns, write_binary
+from snapshot_file import read_snapshot, seed_tickets, snapshot_path
+from tenants import build_tenants, load_companies
+from ticket_store import LeaseLost
+from ticket_columns import TicketColumns
+from webhooks import WebhookError, as_raw, ticket_from_payload, verify_secret
+
+log = logging.getLogger(__name__)
+
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['ETag', 'X-Snapshot-Age', 'X-Snapshot-Stale', 'X-Snapshot-Version',
+                          'X-Report-Cache', 'X-Profile-Id'])
 
 # ============================================================
 # CONFIGURACIÓN
 # ============================================================
 FRESHDESK_DOMAIN = os.environ.get("FRESHDESK_DOMAIN", "consultame")
 FRESHDESK_API_KEY = os.environ.get("FRESHDESK_API_KEY", "6egUChwBAUA2633n18DC")
-COMPANY_ID = 63000424434
-CLIENTE = "AFJ Global"
-
-# Cache simple
-cache = {
-    'data': None,
-    'timestamp': None,
-    'ttl': 300  # 5 minutos
-}
+
+# URL base de la API (se puede apuntar a mock_freshdesk.py para pruebas locales)
+FRESHDESK_URL = os.environ.get("FRESHDESK_URL", f"https://{FRESHDESK_DOMAIN}.freshdesk.com")
+FRESHDESK_WORKERS = int(os.environ.get("FRESHDESK_WORKERS", 4))
+# Presupuesto de la cuenta (peticiones por minuto) compartido por todas las empresas
+FRESHDESK_RATE_LIMIT = int(os.environ.get("FRESHDESK_RATE_LIMIT", 200))
+
+# Secreto compartido de los webhooks de Freshdesk (sin secreto el endpoint está desactivado)
+WEBHOOK_SECRET = os.environ.get("FRESHDESK_WEBHOOK_SECRET", "")
+# Archivo NDJSON donde guardar los webhooks recibidos (para reproducirlos en local)
+WEBHOOK_RECORD_FILE = os.environ.get("FRESHDESK_WEBHOOK_RECORD")
+
+# Carpeta de los PDF de /api/report.pdf y procesos que los construyen
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", "report_cache")
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 1))
+
+# Copia en disco del último snapshot de cada empresa (arranque en caliente) y
+# semilla para cuando no hay ninguna (vacío = sin semilla)
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_SEED = os.environ.get("SNAPSHOT_SEED", "tickets_data.json")
+
+# Perfilado de peticiones (profiling.py): token de operador para ?_profile=1 y
+# /debug/profiles, 1 de cada N peticiones perfiladas (0 = nunca) y carpeta
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_EVERY = int(os.environ.get("PROFILE_SAMPLE_EVERY", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+
+# Cliente HTTP compartido (conexiones keep-alive + control de rate limit)
+client = FreshdeskClient(FRESHDESK_URL, FRESHDESK_API_KEY, workers=FRESHDESK_WORKERS)
+
+# Empresas servidas: almacén, snapshot, locks y clientes SSE de cada una.
+# La primera es la de las rutas sin empresa (/api/kpis...). Se cargan en start()
+tenants = {}
+DEFAULT_TENANT = None
+tenants_by_company = {}
+_start_lock = threading.Lock()
+
+# Turno de descarga entre empresas dentro del presupuesto de la cuenta
+scheduler = FetchScheduler(FRESHDESK_RATE_LIMIT, burst=FRESHDESK_WORKERS * 2,
+                           is_active=lambda slug: tenants[slug].is_active())
+
+# Duración del lease de actualización entre procesos; mientras dura la
+# sincronización se renueva cada LEASE_SECONDS / 3
+LEASE_SECONDS = 120
+
+# Cambios que se aplican sobre el snapshot en memoria sin reconstruirlo
+# (como mínimo; hasta un 10% del snapshot)
+INCREMENTAL_MIN = 1000
+
+# Modos de /api/recurrence (asuntos parecidos agrupados, o idénticos)
+RECURRENCE_MODES = ('fuzzy', 'exact')
+
+# Filas por bloque en las exportaciones en streaming
+EXPORT_BATCH = 500
+
+# Resultados por página en /api/search
+SEARCH_LIMIT = 20
+
+# Segundos que /api/report.pdf espera al PDF antes de responder 202 (la construcción sigue)
+REPORT_TIMEOUT = 60
 
 # ============================================================
 # FUNCIONES AUXILIARES
 # ============================================================
 
 def classify_priority(subject, description=""):
-    """Clasifica la prioridad del ticket basado en keywords"""
-    text = f"{subject} {description}".lower()
-
-    # Keywords para prioridad ALTA
-    keywords_alta = [
-        'aws', 'alarm', 'no enciende', 'no prende', 'escritorio remoto',
-        'virus', 'malware', 'error servidor', 'afjlearning',
-        'sharepoint lentitud', 'moodle', 'caido', 'down', 'critical', 'urgente'
-    ]
-
-    # Keywords para prioridad MEDIA
-    keywords_media = [
-        'outlook', 'correo', 'fundae', 'limpieza', 'buzon', 'antivirus',
-        'pst', 'revisar pc', 'sharepoint', 'spam', 'cambio licencia',
-        'acceso carpeta', 'email', 'password', 'licencia'
-    ]
-
-    # Clasificar
-    for keyword in keywords_alta:
-        if keyword in text:
-            return 'Alto'
-
-    for keyword in keywords_media:
-        if keyword in text:
-            return 'Medio'
-
-    return 'Bajo'
-
-def get_tickets_from_api():
-    """Obtiene tickets de Freshdesk API con análisis completo - SOLO AFJ Global"""
-    url = f"https://{FRESHDESK_DOMAIN}.freshdesk.com/api/v2/tickets"
-    all_tickets = []
+    """Clasifica la prioridad del ticket basado en keywords (reglas de classifier.py)"""
+    return classify(subject, description)
 
+def fetch_tickets(tenant, updated_since=None):
+    """
+    Descarga tickets crudos de una empresa (páginas en paralelo, cada una
+    con su turno en el scheduler compartido).
+
+    Con `updated_since` solo pide los tickets modificados desde esa fecha.
+    Se piden por `updated_at` ascendente: si el listado supera max_pages se
+    sigue con otra tanda desde el último `updated_at` recibido, así la marca
+    de agua nunca deja atrás tickets sin descargar. Lanza FreshdeskAPIError
+    si alguna página falla tras los reintentos o si una tanda no avanza.
+    """
+    params = {
+        'company_id': tenant.company_id,  # Filtrar por empresa
+        'include': 'requester,description',
+        'order_by': 'updated_at',
+        'order_type': 'asc'
+    }
+    tickets = {}
+    since = updated_since
+    while True:
+        if since:
+            params['updated_since'] = since
+        raw, complete = client.get_pages('/api/v2/tickets', params, gate=scheduler.gate(tenant.slug))
+        # updated_since es inclusivo: los repetidos entre tandas se quedan con la última versión
+        tickets.update((t['id'], t) for t in raw)
+        if complete:
+            return list(tickets.values())
+        last = max((t.get('updated_at') or '' for t in raw), default='')
+        if not last or last == since:
+            raise FreshdeskAPIError(None, f"Listado truncado en {client.max_pages} páginas "
+                                          f"sin avanzar updated_at (desde {since})")
+        log.warning("Listado truncado: se sigue desde el último updated_at",
+                    extra={'company': tenant.slug, 'since': last, 'tickets': len(tickets)})
+        since = last
+
+def process_ticket(t, priority=None):
+    """
+    Convierte un ticket crudo de la API al formato del visor.
+    `priority` permite pasar la clasificación ya calculada en lote.
+    """
+    status_map = {2: "Abierto", 3: "Pendiente", 4: "Resuelto", 5: "Cerrado"}
+
+    subject = t.get('subject', 'Sin asunto')
+    description = t.get('description_text', '')
+    if priority is None:
+        priority = classify_priority(subject, description)
+
+    # Convertir prioridad a número para compatibilidad
+    priority_num = {'Bajo': 1, 'Medio': 2, 'Alto': 3}.get(priority, 1)
+
+    return {
+        "id": t.get('id'),
+        "subject": subject,
+        "description": description[:200] if description else '',
+        "priority": priority_num,
+        "priority_name": priority,
+        "status": t.get('status'),
+        "status_name": status_map.get(t.get('status'), "Otro"),
+        "created_at": t.get('created_at'),
+        "updated_at": t.get('updated_at'),
+        "requester_name": (t.get('requester') or {}).get('name', 'Desconocido'),
+        "tags": t.get('tags', [])
+    }
+
+def sync_tickets(tenant, full=False, owner=None):
+    """
+    Sincroniza el almacén de una empresa con Freshdesk.
+
+    La primera vez (o con `full=True`) descarga todo y sustituye el
+    contenido del almacén; después solo pide los tickets con `updated_at`
+    posterior a la marca de agua y los fusiona por id. Si la descarga falla
+    el almacén no se toca; con `owner` tampoco si ese worker perdió el lease
+    por el camino. Retorna True si la sincronización terminó correctamente.
+    """
+    store = tenant.store
     try:
-        print(f"Obteniendo tickets de AFJ Global (Company ID: {COMPANY_ID})...")
-
-        # Obtener tickets con filtro por compañía directamente en el endpoint
-        for page in range(1, 25):  # Hasta 2400 tickets (25 páginas x 100 por página)
-            params = {
-                'company_id': COMPANY_ID,  # Filtrar por AFJ Global
-                'page': page,
-                'per_page': 100,
-                'include': 'requester,description'
-            }
-
-            response = requests.get(
-                url,
-                auth=(FRESHDESK_API_KEY, 'X'),
-                params=params,
-                timeout=30
-            )
+        since = None if full else store.high_water_mark()
+        if since:
+            log.info("Sincronizando cambios", extra={'company': tenant.slug, 'since': since})
+        else:
+            log.info("Sincronización completa", extra={'company': tenant.slug, 'company_id': tenant.company_id})
 
-            if response.status_code == 200:
-                tickets = response.json()
-                if not tickets:
-                    print(f"No más tickets después de página {page-1}")
-                    break
-                print(f"✓ Página {page}: {len(tickets)} tickets")
-                all_tickets.extend(tickets)
+        start = time.perf_counter()
+        raw = fetch_tickets(tenant, updated_since=since)
+        fetched = time.perf_counter()
+        priorities = classify_many(
+            (t.get('subject', 'Sin asunto'), t.get('description_text', '')) for t in raw
+        )
+        classified = time.perf_counter()
+        CLASSIFICATION_SECONDS.observe(classified - fetched)
+        CLASSIFIED_TICKETS.inc(len(raw))
+        tickets = [process_ticket(t, p) for t, p in zip(raw, priorities)]
+        new, updated = store.replace_all(tickets, owner=owner) if full \
+            else store.merge(tickets, owner=owner)
+
+        log.info("Tickets sincronizados", extra={
+            'company': tenant.slug, 'received': len(raw), 'new': new, 'updated': updated,
+            'fetch_seconds': fetched - start, 'classify_seconds': classified - fetched,
+            'store_seconds': time.perf_counter() - classified
+        })
+        return True
+
+    except LeaseLost:
+        log.warning("Lease perdido: se descarta la sincronización", extra={'company': tenant.slug})
+        return False
+    except Exception:
+        log.exception("Error obteniendo tickets", extra={'company': tenant.slug})
+        return False
+
+def load_snapshot(tenant):
+    """
+    Recarga la copia local si otro worker publicó una versión nueva (si
+    cambiaron pocos tickets solo se aplican esos) y, si hay clientes en
+    /api/events, les envía el diff respecto a la anterior
+    """
+    cache, broker = tenant.cache, tenant.broker
+    with tenant.snapshot_lock:
+        previous = cache['data']
+        if previous is None:
+            # Worker nuevo o reiniciado: se parte de la copia binaria en disco
+            # (mapeada, sin leer SQLite) y solo se aplica lo que cambió después
+            previous = _map_saved_snapshot(tenant)
+        # Sobre un snapshot vacío (versión 0) la primera carga se arma entera:
+        # aplicada ticket a ticket los empates quedarían en otro orden
+        max_changes = max(INCREMENTAL_MIN, len(previous) // 10) if previous else 0
+        meta, tickets, incremental = tenant.store.changes(cache['version'], max_changes)
+        if tickets is not None:
+            # Los asuntos se asignan a clusters antes de publicar el snapshot
+            if incremental:
+                # Pocos cambios: se aplican sobre el snapshot actual
+                tenant.clusters.add_many(t.get('subject') for t in tickets)
+                start = time.perf_counter()
+                cache['data'], diff = previous.apply(tickets, meta['version'])
+                AGGREGATION_SECONDS.observe(time.perf_counter() - start, kind='incremental')
             else:
-                print(f"Error {response.status_code}: {response.text[:200]}")
-                break
-
-        print(f"\n✅ Total tickets de AFJ Global: {len(all_tickets)}\n")
-
-        # Procesar y enriquecer tickets
-        processed = []
-        status_map = {2: "Abierto", 3: "Pendiente", 4: "Resuelto", 5: "Cerrado"}
-
-        for t in all_tickets:
-            subject = t.get('subject', 'Sin asunto')
-            description = t.get('description_text', '')
-            priority = classify_priority(subject, description)
-
-            # Convertir prioridad a número para compatibilidad
-            priority_num = {'Bajo': 1, 'Medio': 2, 'Alto': 3}.get(priority, 1)
-
-            processed.append({
-                "id": t.get('id'),
-                "subject": subject,
-                "description": description[:200] if description else '',
-                "priority": priority_num,
-                "priority_name": priority,
-                "status": t.get('status'),
-                "status_name": status_map.get(t.get('status'), "Otro"),
-                "created_at": t.get('created_at'),
-                "updated_at": t.get('updated_at'),
-                "requester_name": t.get('requester', {}).get('name', 'Desconocido'),
-                "tags": t.get('tags', [])
-            })
-
-        return processed
-
-    except Exception as e:
-        print(f"Error obteniendo tickets: {e}")
-        return []
-
-def get_cached_tickets():
-    """Retorna tickets del cache o hace una nueva petición"""
+                start = time.perf_counter()
+                snapshot = Snapshot.from_tickets(tickets, meta['version'])
+                AGGREGATION_SECONDS.observe(time.perf_counter() - start, kind='snapshot')
+                tenant.clusters.add_many(snapshot.columns.subject.values)
+                cache['data'] = snapshot
+                if previous is not None and previous.has_search_index:
+                    # Ya se buscó en este worker: el índice nuevo se prepara en segundo plano
+                    threading.Thread(target=cache['data'].search_index, daemon=True).start()
+                diff = cache['data'].diff(previous) if previous is not None and len(broker) else None
+            cache['version'] = meta['version']
+            if diff is not None and len(broker):
+                broker.publish('snapshot', diff, cache['version'])
+        cache['timestamp'] = meta['synced_at']
+
+def _map_saved_snapshot(tenant):
+    """
+    Publica el snapshot binario de SNAPSHOT_DIR si es de este mismo almacén y
+    no más nuevo que él. Se llama con snapshot_lock tomado. Retorna el
+    Snapshot publicado o None.
+    """
+    saved = open_binary(binary_path(SNAPSHOT_DIR, tenant.slug))
+    if saved is None:
+        return None
+    state = tenant.store.sync_state()
+    if saved.get('store_id') != state['store_id'] or not isinstance(saved.get('version'), int) \
+            or saved['version'] > state['version']:
+        return None
+    start = time.perf_counter()
+    cache = tenant.cache
+    snapshot = Snapshot(saved['columns'], saved['version'])
+    AGGREGATION_SECONDS.observe(time.perf_counter() - start, kind='snapshot')
+    tenant.clusters.add_many(snapshot.columns.subject.values)
+    cache['data'] = snapshot
+    cache['version'] = tenant.saved_version = saved['version']
+    log.info("Snapshot binario mapeado", extra={
+        'company': tenant.slug, 'version': saved['version'], 'tickets': len(cache['data']),
+        'seconds': time.perf_counter() - start
+    })
+    return cache['data']
+
+def worker_id():
+    """Identidad del worker para el lease (se calcula tras el fork de gunicorn)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _keep_lease(tenant, owner, done):
+    """
+    Renueva el lease de `owner` hasta que `done` se active: una sincronización
+    completa puede durar más que LEASE_SECONDS y, sin renovarlo, otro worker
+    empezaría otra a la vez
+    """
+    while not done.wait(LEASE_SECONDS / 3):
+        if not tenant.store.acquire_lease(owner, LEASE_SECONDS):
+            # Otro worker lo tomó: merge/replace_all no guardarán nada
+            return
+
+def _is_fresh(tenant):
+    synced_at = tenant.store.snapshot_meta()['synced_at']
+    return synced_at is not None and time.time() - synced_at < tenant.cache['ttl']
+
+def refresh_snapshot(tenant, full=False, wait=False):
+    """
+    Sincroniza el almacén compartido de la empresa si este worker obtiene el
+    lease y recarga el snapshot. Con `wait=True` espera a que el lease quede
+    libre. Retorna False si otro worker ya estaba actualizando y no se esperó
+    o si la sincronización falló.
+    """
+    store = tenant.store
+    owner = worker_id()
+    waited = False
+    while not store.acquire_lease(owner, LEASE_SECONDS):
+        if not wait:
+            return False
+        waited = True
+        time.sleep(0.5)
+
+    tenant.cache['last_attempt'] = time.time()
+    attempted = synced = False
+    done = threading.Event()
+    try:
+        # Si otro worker terminó de sincronizar mientras esperábamos, basta con leer
+        if full or not (waited and _is_fresh(tenant)):
+            attempted = True
+            threading.Thread(target=_keep_lease, args=(tenant, owner, done), daemon=True).start()
+            synced = sync_tickets(tenant, full=full, owner=owner)
+    finally:
+        done.set()
+        store.release_lease(owner)
+
+    load_snapshot(tenant)
+    if synced and tenant.save_lock.acquire(blocking=False):
+        # La copia en disco se escribe aparte: no retrasa a quien espera los datos
+        threading.Thread(target=_save_snapshot, args=(tenant,), daemon=True).start()
+    return synced or not attempted
+
+def _save_snapshot(tenant):
+    """
+    Escribe el snapshot en memoria de la empresa en SNAPSHOT_DIR (formato
+    binario) si cambió desde la última copia. Un snapshot publicado no se
+    modifica, así que se empaqueta y escribe fuera del candado.
+    """
+    try:
+        start = time.perf_counter()
+        with tenant.snapshot_lock:
+            snapshot = tenant.cache['data']
+            if snapshot is None or snapshot.version == tenant.saved_version:
+                return
+            # La marca de agua tiene que ser la de esta misma versión: si el
+            # almacén ya avanzó, guardará la copia quien lo sincronizó
+            state = tenant.store.sync_state()
+            if state['version'] != snapshot.version:
+                return
+        sections = pack_columns(snapshot.columns, snapshot.order)
+        count = len(snapshot)
+        path = binary_path(SNAPSHOT_DIR, tenant.slug)
+        size = write_binary(path, {**state, 'count': count}, sections)
+        tenant.saved_version = state['version']
+        log.info("Snapshot guardado en disco", extra={
+            'company': tenant.slug, 'file': path, 'tickets': count, 'bytes': size,
+            'seconds': time.perf_counter() - start
+        })
+    except Exception:
+        log.exception("No se pudo guardar el snapshot en disco", extra={'company': tenant.slug})
+    finally:
+        tenant.save_lock.release()
+
+def restore_snapshot(tenant):
+    """
+    Con el almacén vacío, lo llena con la copia en disco del último snapshot
+    (binaria o, de versiones anteriores, JSON) o, si no hay, con la semilla
+    (tickets de la empresa en SNAPSHOT_SEED).
+    Conserva su fecha de sincronización: el snapshot se sirve como caducado
+    y la actualización en segundo plano lo pone al día. True si cargó algo.
+    """
+    store = tenant.store
+    if store.snapshot_meta()['synced_at'] is not None:
+        return False
+    start = time.perf_counter()
+    mapped = open_binary(binary_path(SNAPSHOT_DIR, tenant.slug))
+    if mapped is not None:
+        # El archivo guarda las filas en el orden del snapshot (pack_columns)
+        source, columns = 'binary', mapped['columns']
+        try:
+            meta = store.restore(columns, mapped.get('high_water_mark'), mapped.get('synced_at'))
+        except SnapshotFormatError as e:
+            # Una sección comprimida dañada solo se detecta al leerla (store.restore no guardó nada)
+            log.warning("Snapshot binario inválido, se ignora", extra={'company': tenant.slug, 'error': str(e)})
+            mapped = None
+    if mapped is None:
+        saved = read_snapshot(snapshot_path(SNAPSHOT_DIR, tenant.slug))
+        if saved is not None:
+            source, tickets = 'snapshot', saved['tickets']
+            meta = store.restore(tickets, saved.get('high_water_mark'), saved.get('synced_at'))
+        elif SNAPSHOT_SEED and os.path.exists(SNAPSHOT_SEED):
+            # Sin marca de agua: la primera sincronización pide todo (sin vaciar el almacén)
+            # La criticidad de la semilla es antigua: se clasifican como en una sincronización
+            source = 'seed'
+            raw = seed_tickets(SNAPSHOT_SEED, tenant.company_id)
+            priorities = classify_many(
+                (t.get('subject', 'Sin asunto'), t.get('description_text', '')) for t in raw
+            )
+            tickets = [process_ticket(t, p) for t, p in zip(raw, priorities)]
+            meta = store.restore(tickets, None, os.path.getmtime(SNAPSHOT_SEED)) if tickets else None
+        else:
+            return False
+    if meta is None:
+        return False
+
+    if mapped is None:
+        # El snapshot en memoria se arma con los tickets ya leídos (mismo
+        # orden que el almacén), sin volver a leerlos de SQLite
+        tickets.sort(key=lambda t: (t.get('created_at') or '', t['id']), reverse=True)
+        columns = TicketColumns.from_tickets(tickets)
+    cache = tenant.cache
+    with tenant.snapshot_lock:
+        if cache['version'] is None or cache['version'] < meta['version']:
+            snapshot = Snapshot(columns, meta['version'])
+            tenant.clusters.add_many(snapshot.columns.subject.values)
+            cache['data'] = snapshot
+            cache['version'] = meta['version']
+            cache['timestamp'] = meta['synced_at']
+    if tenant.save_lock.acquire(blocking=False):
+        # Copia con la identidad de este almacén: los demás workers la mapean sin leer SQLite
+        threading.Thread(target=_save_snapshot, args=(tenant,), daemon=True).start()
+    log.info("Arranque en caliente", extra={
+        'company': tenant.slug, 'source': source, 'tickets': len(columns),
+        'seconds': time.perf_counter() - start
+    })
+    return True
+
+def warm_start(tenant):
+    """Al arrancar: restaura el almacén si está vacío y carga el snapshot en memoria"""
+    try:
+        restore_snapshot(tenant)
+        if tenant.store.snapshot_meta()['synced_at'] is not None:
+            load_snapshot(tenant)
+    except Exception:
+        log.exception("Error en el arranque en caliente", extra={'company': tenant.slug})
+
+def _background_refresh(tenant):
+    """Actualiza el snapshot en segundo plano y libera el candado al terminar"""
+    try:
+        refresh_snapshot(tenant)
+    finally:
+        tenant.refresh_lock.release()
+
+def _snapshot_result(result):
+    """Anota hit/stale/miss del snapshot una vez por petición (se cuenta en after_request)"""
+    if has_request_context():
+        g.setdefault('snapshot_cache', result)
+
+def get_cached_tickets(tenant):
+    """
+    Retorna el snapshot de la empresa (stale-while-revalidate).
+
+    Cada petición comprueba la versión del almacén compartido y solo recarga
+    si cambió. Si el snapshot expiró se sirve igualmente y se lanza una
+    actualización en segundo plano: una por empresa y proceso y, gracias al
+    lease, una sola entre todos los workers. Únicamente la primera petición
+    (sin snapshot) espera a Freshdesk. Las descargas de todas las empresas
+    comparten el presupuesto de la cuenta a través del scheduler.
+    """
+    cache, refresh_lock = tenant.cache, tenant.refresh_lock
+    tenant.touch()
+    load_snapshot(tenant)
+
+    if cache['timestamp'] is None:
+        _snapshot_result('miss')
+        # Sin snapshot: se restaura la copia en disco (o la semilla) y, si no
+        # hay, la primera petición descarga y las demás esperan su resultado
+        with refresh_lock:
+            load_snapshot(tenant)
+            if cache['timestamp'] is None:
+                # Lo restaura esta petición o el arranque en caliente que estaba en curso
+                restore_snapshot(tenant)
+                load_snapshot(tenant)
+            if cache['timestamp'] is None:
+                log.info("Sin snapshot: obteniendo datos de Freshdesk", extra={'company': tenant.slug})
+                refresh_snapshot(tenant, wait=True)
+                return cache['data']
+
     now = time.time()
+    expired = now - cache['timestamp'] >= cache['ttl']
+    retry_due = now - cache['last_attempt'] >= cache['ttl']
+    _snapshot_result('stale' if expired else 'hit')
+    if expired and retry_due and refresh_lock.acquire(blocking=False):
+        log.info("Snapshot expirado: actualizando en segundo plano", extra={'company': tenant.slug})
+        threading.Thread(target=_background_refresh, args=(tenant,), daemon=True).start()
+    return cache['data']
+
+def tenant_for(company=None):
+    """Empresa de la ruta (/api/<empresa>/...); sin empresa, la primera configurada"""
+    tenant = tenants.get(company or DEFAULT_TENANT)
+    if tenant is None:
+        abort(404, description=f"Empresa desconocida: {company}")
+    return tenant
+
+def request_tenant():
+    """Empresa de la petición en curso"""
+    return tenant_for((request.view_args or {}).get('company'))
+
+def snapshot_info(snapshot):
+    """Versión del snapshot servido, para incluir en las respuestas"""
+    return {"snapshot_version": snapshot.version}
+
+def snapshot_headers():
+    """
+    Edad del snapshot como cabeceras: cambia en cada petición, así que no va
+    en el cuerpo (que se cachea por versión)
+    """
+    cache = request_tenant().cache
+    age = time.time() - cache['timestamp'] if cache['timestamp'] else None
+    return {
+        "X-Snapshot-Age": f"{age:.1f}" if age is not None else "",
+        "X-Snapshot-Stale": "1" if age is None or age >= cache['ttl'] else "0"
+    }
+
+def current_version():
+    """
+    Asegura el snapshot de la empresa cargado y retorna su versión junto a
+    la identidad del almacén (las versiones de otro archivo no son comparables)
+    """
+    tenant = request_tenant()
+    return tenant.store.store_id(), get_cached_tickets(tenant).version
+
+def current_scope():
+    """Empresa de la petición: cada una tiene su versión y sus respuestas"""
+    return request_tenant().slug
 
-    # Si hay cache válido, retornarlo
-    if cache['data'] and cache['timestamp']:
-        if now - cache['timestamp'] < cache['ttl']:
-            print("Usando datos del cache")
-            return cache['data']
+def clusters_state():
+    """Asignación de clusters de la empresa, de la que depende la recurrencia fuzzy"""
+    return request_tenant().clusters.state
 
-    # Si no hay cache o expiró, obtener nuevos datos
-    print("Obteniendo datos frescos de Freshdesk...")
-    tickets = get_tickets_from_api()
+# Respuestas JSON cacheadas por versión del snapshot (ETag + gzip/brotli),
+# separadas por empresa para que alternarlas no vacíe el cache
+responses = ResponseCache(current_version, snapshot_headers, current_scope)
 
-    # Actualizar cache
-    cache['data'] = tickets
-    cache['timestamp'] = now
+# PDFs de /api/report.pdf por clave de contenido, construidos en otro proceso
+reports = ReportCache(REPORT_CACHE_DIR, workers=REPORT_WORKERS)
 
-    return tickets
+# Perfiles de peticiones a petición del operador o por muestreo
+profiler = Profiler(PROFILE_DIR, token=PROFILE_TOKEN, sample_every=PROFILE_SAMPLE_EVERY,
+                    exclude=('metrics', 'list_profiles', 'get_profile'))
+
+# Edad y tamaño del snapshot de cada empresa (se calculan al consultar /metrics)
+gauge('freshdesk_snapshot_age_seconds', 'Segundos desde la última sincronización del snapshot',
+      ('company',), callback=lambda: {
+          (slug,): time.time() - tenant.cache['timestamp'] if tenant.cache['timestamp'] else None
+          for slug, tenant in tenants.items()
+      })
+gauge('freshdesk_snapshot_tickets', 'Tickets en el snapshot en memoria', ('company',),
+      callback=lambda: {
+          (slug,): len(tenant.cache['data']) if tenant.cache['data'] is not None else None
+          for slug, tenant in tenants.items()
+      })
+
+def start():
+    """
+    Arranca el servidor en este proceso: logging, empresas con sus almacenes,
+    clientes SSE y arranque en caliente. No se hace al importar el módulo:
+    los procesos 'spawn' del pool de informes lo reimportan (como
+    __mp_main__) y no deben repetirlo. Lo llaman `python freshdesk_server.py`
+    y el hook post_worker_init de gunicorn (gunicorn.conf.py); con otro
+    servidor WSGI, la primera petición. Solo actúa la primera vez.
+    """
+    global DEFAULT_TENANT
+    with _start_lock:
+        if tenants:
+            return
+        configure_logging()
+        loaded = build_tenants(load_companies())
+        tenants_by_company.update((tenant.company_id, tenant) for tenant in loaded.values())
+        # Clientes SSE de /api/<empresa>/events; mientras haya alguno se vigila su almacén
+        for tenant in loaded.values():
+            tenant.broker = EventBroker(watch=lambda tenant=tenant: get_cached_tickets(tenant))
+        DEFAULT_TENANT = next(iter(loaded))
+        tenants.update(loaded)
+
+    # Arranque en caliente: cada empresa carga su último snapshot en segundo plano
+    # (la primera petición no espera a Freshdesk; si llega antes, restaura ella)
+    for tenant in loaded.values():
+        threading.Thread(target=warm_start, args=(tenant,), daemon=True).start()
+
+def tenant_route(rule, **options):
+    """Registra la vista en /api<rule> (primera empresa) y en /api/<company><rule>"""
+    def decorator(view):
+        app.route(f'/api{rule}', **options)(view)
+        app.route(f'/api/<company>{rule}', **options)(view)
+        return view
+    return decorator
 
 def filter_by_year(tickets, year):
     """Filtra tickets por año"""
@@ -160,206 +609,533 @@ def filter_by_year(tickets, year):
     return [t for t in tickets if t['created_at'].startswith(year)]
 
 def analyze_trends(tickets):
-    """Análisis completo de tendencias temporales con heatmap"""
-    # Contadores
-    monthly_created = Counter()
-    weekday_count = Counter()
-    hourly_count = Counter()
-    heatmap_data = {}
-    date_counter = Counter()
-
-    days_es = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-
-    for ticket in tickets:
-        created_str = ticket.get('created_at', '')
-        if created_str:
-            try:
-                created = datetime.fromisoformat(created_str.replace('Z', '+00:00'))
-
-                # Mes/Año
-                month_key = created.strftime('%Y-%m')
-                monthly_created[month_key] += 1
-
-                # Día de la semana
-                weekday = days_es[created.weekday()]
-                weekday_count[weekday] += 1
-
-                # Hora del día
-                hour = created.hour
-                hourly_count[hour] += 1
-
-                # Heatmap (día x hora)
-                if weekday not in heatmap_data:
-                    heatmap_data[weekday] = {}
-                if hour not in heatmap_data[weekday]:
-                    heatmap_data[weekday][hour] = 0
-                heatmap_data[weekday][hour] += 1
-
-                # Contador de fechas
-                date_key = created.strftime('%Y-%m-%d')
-                date_counter[date_key] += 1
-
-            except Exception as e:
-                print(f"Error procesando fecha: {e}")
-                pass
-
-    # Encontrar hora pico
-    max_hour = 0
-    max_count = 0
-    max_day = ''
-    for day in heatmap_data:
-        for hour in heatmap_data[day]:
-            if heatmap_data[day][hour] > max_count:
-                max_count = heatmap_data[day][hour]
-                max_hour = hour
-                max_day = day
-
-    # Calcular promedios
-    total_days = len(date_counter) if date_counter else 1
-    closed_tickets = sum(1 for t in tickets if t.get('status') in [4, 5])
-
-    avg_daily_created = len(tickets) / total_days
-    avg_daily_resolved = closed_tickets / total_days
-
-    # Día con mayor carga
-    max_load_date = None
-    max_load_count = 0
-    if date_counter:
-        max_load_date, max_load_count = date_counter.most_common(1)[0]
+    """Análisis completo de tendencias temporales con heatmap (vectorizado si hay NumPy)"""
+    return aggregate_trends(tickets)
 
-    return {
-        'monthly_created': dict(monthly_created),
-        'weekday_distribution': dict(weekday_count),
-        'hourly_distribution': dict(hourly_count),
-        'heatmap': heatmap_data,
-        'peak_hour': {
-            'day': max_day,
-            'hour': max_hour,
-            'count': max_count
-        },
-        'avg_daily_created': round(avg_daily_created, 2),
-        'avg_daily_resolved': round(avg_daily_resolved, 2),
-        'max_load_day': {
-            'date': max_load_date,
-            'count': max_load_count
-        }
-    }
+def record_webhook(payload):
+    """Guarda el cuerpo recibido (una línea JSON) si FRESHDESK_WEBHOOK_RECORD está definido"""
+    if not WEBHOOK_RECORD_FILE:
+        return
+    try:
+        with open(WEBHOOK_RECORD_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + '\n')
+    except OSError as e:
+        log.warning("No se pudo guardar el webhook", extra={'file': WEBHOOK_RECORD_FILE, 'error': str(e)})
+
+def apply_webhook(tenant, raw):
+    """
+    Aplica un ticket recibido por webhook: completa los campos que falten
+    con el ticket guardado, lo vuelve a clasificar (solo ese ticket), lo
+    guarda sin mover la marca de agua del sondeo y actualiza el snapshot
+    en memoria de forma incremental. Retorna (ticket procesado, es_nuevo, cambió).
+    Lanza WebhookError si el ticket no cabe en las columnas del snapshot.
+    """
+    existing = tenant.store.get(raw['id'])
+    if existing is not None:
+        raw = {**as_raw(existing), **raw}
+    # Se prueba la fila antes de guardarla: un ticket que no cabe en las
+    # columnas, una vez en el almacén, haría fallar todas las cargas siguientes
+    try:
+        ticket = process_ticket(raw)
+        TicketColumns().append(ticket)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise WebhookError(f"Ticket inválido: {e}")
+    new, updated = tenant.store.merge([ticket], advance=False)
+    load_snapshot(tenant)
+    return ticket, existing is None, bool(new or updated)
+
+def recurrence_for(tenant, aggregate, mode):
+    """Top 20 de recurrencia: asuntos parecidos agrupados (fuzzy) o exactos (exact)"""
+    return aggregate.recurrence(tenant.clusters if mode == 'fuzzy' else None)
+
+def export_ndjson(columns, rows, fields):
+    """Genera NDJSON por bloques: un objeto por línea"""
+    batch = []
+    for i in rows:
+        batch.append(json.dumps(columns.row(i, fields), ensure_ascii=False))
+        if len(batch) == EXPORT_BATCH:
+            yield '\n'.join(batch) + '\n'
+            batch = []
+    if batch:
+        yield '\n'.join(batch) + '\n'
+
+def export_csv(columns, rows, fields):
+    """Genera CSV por bloques (cabecera primero; tags separados por ';')"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for n, i in enumerate(rows, 1):
+        row = columns.row(i, fields)
+        if 'tags' in row:
+            row['tags'] = ';'.join(row['tags'])
+        writer.writerow([row[field] for field in fields])
+        if n % EXPORT_BATCH == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'csv': (export_csv, 'text/csv')
+}
 
 # ============================================================
 # ENDPOINTS DE LA API
 # ============================================================
 
+@app.before_request
+def start_timer():
+    if not tenants:
+        start()
+    g.request_start = time.perf_counter()
+    g.profile = profiler.begin(request)
+
+@app.after_request
+def observe_latency(response):
+    """Latencia por endpoint (vista de Flask; las dos rutas de tenant_route cuentan juntas)"""
+    session = g.pop('profile', None)
+    if session is not None:
+        name = profiler.finish(session, request.endpoint)
+        response.headers['X-Profile-Id'] = name
+        log.info("Perfil capturado", extra={'profile': name, 'endpoint': request.endpoint,
+                                            'seconds': session.seconds})
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint or 'none',
+                                method=request.method, status=response.status_code)
+    result = g.pop('snapshot_cache', None)
+    if result is not None:
+        CACHE_REQUESTS.inc(cache='snapshot', result=result)
+    return response
+
+@app.teardown_request
+def stop_profile(error=None):
+    """Si la petición terminó con una excepción sin respuesta, el perfil se descarta"""
+    session = g.pop('profile', None)
+    if session is not None:
+        session.stop()
+
+@app.errorhandler(404)
+def not_found(error):
+    """Errores 404 de la API en JSON (empresa desconocida, ruta inexistente)"""
+    if request.path.startswith('/api/'):
+        return jsonify({"success": False, "error": error.description}), 404
+    return error
+
 @app.route('/')
 def index():
     """Sirve el HTML del visor avanzado"""
     return send_file('index.html')
 
-@app.route('/api/tickets')
-def get_tickets():
-    """Endpoint: Retorna todos los tickets"""
-    year = request.args.get('year')
-    tickets = get_cached_tickets()
-    filtered = filter_by_year(tickets, year)
+@app.route('/<company>/')
+def company_index(company):
+    """El mismo visor para otra empresa (consulta /api/<company>/...)"""
+    tenant_for(company)
+    return send_file('index.html')
+
+@app.route('/api/companies')
+def list_companies():
+    """Endpoint: Empresas servidas, su snapshot y el reparto del rate limit"""
+    return jsonify({
+        "success": True,
+        "default": DEFAULT_TENANT,
+        "companies": [{
+            "slug": tenant.slug,
+            "name": tenant.name,
+            "company_id": tenant.company_id,
+            "active": tenant.is_active(),
+            "viewers": len(tenant.broker),
+            "snapshot_version": tenant.cache['version'],
+            "tickets": len(tenant.cache['data']) if tenant.cache['data'] is not None else None,
+            "synced_at": tenant.cache['timestamp']
+        } for tenant in tenants.values()],
+        "scheduler": scheduler.stats()
+    })
+
+@tenant_route('/tickets')
+@responses.cached
+def get_tickets(company=None):
+    """
+    Endpoint: Retorna los tickets (todos, o paginados).
+
+    - limit / cursor: paginación por cursor; la respuesta trae next_cursor
+    - sort: created_at, updated_at o id (prefijo '-' para descendente)
+    - fields: lista de campos separados por coma
+    """
+    try:
+        year = parse_year(request.args.get('year'))
+        limit = parse_limit(request.args.get('limit'))
+        field, descending = parse_sort(request.args.get('sort'))
+        fields = parse_fields(request.args.get('fields'), TicketColumns.FIELDS)
+        cursor = request.args.get('cursor')
+        snapshot = get_cached_tickets(tenant_for(company))
+
+        next_cursor = None
+        if limit is None and not request.args.get('sort'):
+            # Sin paginar: orden del snapshot (más recientes primero)
+            rows = snapshot.rows_for_year(year)
+            total = len(rows)
+        else:
+            rows = snapshot.sorted_rows(year, field)
+            total = len(rows)
+            if limit is None:
+                rows = rows[::-1] if descending else rows
+            else:
+                rows, next_cursor = page(rows, snapshot.columns.sort_key(field),
+                                         descending, limit, cursor)
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
     return jsonify({
         "success": True,
-        "tickets": filtered,
-        "total": len(filtered),
+        "tickets": snapshot.columns.rows(rows, fields),
+        "total": total,
+        "next_cursor": next_cursor,
         "cached": True,
-        "timestamp": datetime.now().isoformat()
+        **snapshot_info(snapshot)
     })
 
-@app.route('/api/kpis')
-def get_kpis():
-    """Endpoint: KPIs de rendimiento"""
-    year = request.args.get('year')
-    tickets = get_cached_tickets()
-    filtered = filter_by_year(tickets, year)
+@tenant_route('/tickets/export')
+def export_tickets(company=None):
+    """
+    Endpoint: Exporta los tickets en streaming (format=ndjson o csv).
 
-    total = len(filtered)
-    if total == 0:
-        return jsonify({
-            "success": True,
-            "kpis": {
-                "total": 0,
-                "closed": 0,
-                "open": 0,
-                "resolution_rate": 0,
-                "by_priority": {"alta": 0, "media": 0, "baja": 0},
-                "percentages": {"alta": 0, "media": 0, "baja": 0}
-            }
-        })
+    Las filas se serializan por bloques a medida que se envían, desde el
+    snapshot vigente al empezar: la memoria y el tiempo hasta el primer byte
+    no dependen del número de tickets.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "error": "format debe ser ndjson o csv"}), 400
+    try:
+        year = parse_year(request.args.get('year'))
+        fields = parse_fields(request.args.get('fields'), TicketColumns.FIELDS)
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    generate, mimetype = EXPORT_FORMATS[export_format]
+    rows = snapshot.rows_for_year(year)
+
+    response = Response(
+        stream_with_context(generate(snapshot.columns, rows, fields or TicketColumns.FIELDS)),
+        mimetype=mimetype
+    )
+    filename = f"tickets_{year or 'all'}.{export_format}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    response.headers.update(snapshot_headers())
+    return response
+
+@tenant_route('/search')
+@responses.cached
+def search_tickets(company=None):
+    """
+    Endpoint: Búsqueda de texto en asunto y descripción.
+
+    - q: palabras a buscar (sin distinguir tildes ni mayúsculas; cada una
+      vale como prefijo y deben aparecer todas)
+    - year, limit (20 por defecto), offset, fields
+    Cada resultado trae su puntaje BM25 y las posiciones [inicio, fin) de
+    las coincidencias en el asunto y la descripción.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"success": False, "error": "Falta el parámetro q"}), 400
+    offset = request.args.get('offset', '0')
+    if not offset.isdigit():
+        return jsonify({"success": False, "error": "offset debe ser un número >= 0"}), 400
+    offset = int(offset)
+    try:
+        year = parse_year(request.args.get('year'))
+        limit = parse_limit(request.args.get('limit')) or SEARCH_LIMIT
+        fields = parse_fields(request.args.get('fields'), TicketColumns.FIELDS)
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
 
-    closed = sum(1 for t in filtered if t.get('status') in [4, 5])
-    alta = sum(1 for t in filtered if t.get('priority') == 3)
-    media = sum(1 for t in filtered if t.get('priority') == 2)
-    baja = sum(1 for t in filtered if t.get('priority') == 1)
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    index = snapshot.search_index()
+    total, hits, words = index.search(query, year, limit, offset)
+
+    results = []
+    for i, score in hits:
+        row = snapshot.columns.row(i, fields)
+        row["score"] = round(score, 4)
+        row["highlights"] = index.highlights(i, words)
+        results.append(row)
 
     return jsonify({
         "success": True,
-        "kpis": {
-            "total": total,
-            "closed": closed,
-            "open": total - closed,
-            "resolution_rate": round((closed / total * 100), 2),
-            "by_priority": {
-                "alta": alta,
-                "media": media,
-                "baja": baja
-            },
-            "percentages": {
-                "alta": round((alta / total * 100), 1),
-                "media": round((media / total * 100), 1),
-                "baja": round((baja / total * 100), 1)
-            }
-        }
+        "query": query,
+        "terms": words,
+        "results": results,
+        "total": total,
+        "offset": offset,
+        **snapshot_info(snapshot)
     })
 
-@app.route('/api/recurrence')
-def get_recurrence():
-    """Endpoint: Análisis de tickets recurrentes"""
-    year = request.args.get('year')
-    tickets = get_cached_tickets()
-    filtered = filter_by_year(tickets, year)
-
-    counts = Counter([t['subject'] for t in filtered if t.get('subject')])
-    total = len(filtered)
-
-    recurrence = [
-        {
-            "subject": subject,
-            "count": count,
-            "percentage": round((count / total * 100), 1) if total > 0 else 0
-        }
-        for subject, count in counts.most_common(20)
-    ]
+@tenant_route('/kpis')
+@responses.cached
+def get_kpis(company=None):
+    """Endpoint: KPIs de rendimiento"""
+    try:
+        year = parse_year(request.args.get('year'))
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    aggregate = snapshot.aggregate(year)
+
+    return jsonify({
+        "success": True,
+        "kpis": aggregate.kpis(),
+        **snapshot_info(snapshot)
+    })
+
+@tenant_route('/recurrence')
+@responses.cached(vary=clusters_state)
+def get_recurrence(company=None):
+    """
+    Endpoint: Análisis de tickets recurrentes.
+    Por defecto agrupa asuntos parecidos (mode=fuzzy); mode=exact cuenta asuntos idénticos.
+    """
+    mode = request.args.get('mode', 'fuzzy')
+    if mode not in RECURRENCE_MODES:
+        return jsonify({"success": False, "error": "mode debe ser fuzzy o exact"}), 400
+    try:
+        year = parse_year(request.args.get('year'))
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    aggregate = snapshot.aggregate(year)
 
     return jsonify({
         "success": True,
-        "recurrence": recurrence,
-        "total": total
+        "recurrence": recurrence_for(tenant, aggregate, mode),
+        "total": aggregate.total,
+        **snapshot_info(snapshot)
     })
 
-@app.route('/api/trends')
-def get_trends():
+@tenant_route('/trends')
+@responses.cached
+def get_trends(company=None):
     """Endpoint: Análisis de tendencias y heatmap"""
-    year = request.args.get('year')
-    tickets = get_cached_tickets()
-    filtered = filter_by_year(tickets, year)
+    try:
+        year = parse_year(request.args.get('year'))
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    aggregate = snapshot.aggregate(year)
+
+    return jsonify({
+        "success": True,
+        "trends": aggregate.trends(),
+        **snapshot_info(snapshot)
+    })
+
+@tenant_route('/dashboard')
+@responses.cached(vary=clusters_state)
+def get_dashboard(company=None):
+    """
+    Endpoint: KPIs, recurrencia, tendencias y tickets en una sola respuesta.
+    Con ?tickets=0 se omite la lista de tickets; mode=exact como en /api/recurrence.
+    """
+    mode = request.args.get('mode', 'fuzzy')
+    if mode not in RECURRENCE_MODES:
+        return jsonify({"success": False, "error": "mode debe ser fuzzy o exact"}), 400
+    try:
+        year = parse_year(request.args.get('year'))
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    aggregate = snapshot.aggregate(year)
+
+    payload = {
+        "success": True,
+        "kpis": aggregate.kpis(),
+        "recurrence": recurrence_for(tenant, aggregate, mode),
+        "trends": aggregate.trends(),
+        "total": aggregate.total,
+        **snapshot_info(snapshot)
+    }
+    if request.args.get('tickets') != '0':
+        payload["tickets"] = snapshot.tickets_for_year(year)
 
-    trends = analyze_trends(filtered)
+    return jsonify(payload)
 
+@tenant_route('/events')
+def stream_events(company=None):
+    """
+    Endpoint: Server-Sent Events con los cambios del snapshot.
+
+    Cada actualización envía un evento `snapshot` con los ids nuevos,
+    actualizados, cerrados y eliminados, los años afectados y la variación
+    de KPIs. Al reconectar con un Last-Event-ID antiguo se envía `reset`.
+    """
+    tenant = tenant_for(company)
+    broker = tenant.broker
+    subscriber = broker.subscribe()
+    snapshot = get_cached_tickets(tenant)
+    last_event_id = request.headers.get('Last-Event-ID')
+
+    if last_event_id is None:
+        first = format_event('hello', {"version": snapshot.version}, snapshot.version)
+    elif last_event_id != str(snapshot.version):
+        first = format_event('reset', {"version": snapshot.version}, snapshot.version)
+    else:
+        first = None
+
+    response = Response(stream_with_context(broker.stream(subscriber, first)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@tenant_route('/webhooks/freshdesk', methods=['POST'])
+def freshdesk_webhook(company=None):
+    """
+    Endpoint: Webhook de automatizaciones de Freshdesk (ticket creado/actualizado).
+    El secreto va en la cabecera X-Webhook-Secret (o ?secret=). En
+    /api/webhooks/freshdesk la empresa sale del company_id del ticket; en
+    /api/<company>/webhooks/freshdesk se ignoran los de otras empresas.
+    """
+    if not WEBHOOK_SECRET:
+        return jsonify({"success": False, "error": "Webhook desactivado (falta FRESHDESK_WEBHOOK_SECRET)"}), 503
+    provided = request.headers.get('X-Webhook-Secret') or request.args.get('secret')
+    if not verify_secret(WEBHOOK_SECRET, provided):
+        return jsonify({"success": False, "error": "Secreto inválido"}), 401
+
+    payload = request.get_json(silent=True)
+    record_webhook(payload)
+    try:
+        raw = ticket_from_payload(payload)
+    except WebhookError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    company_id = raw.pop('company_id', None)
+    if company is None and company_id is not None:
+        tenant = tenants_by_company.get(int(company_id)) if str(company_id).isdigit() else None
+    else:
+        tenant = tenant_for(company)
+        if company_id is not None and str(company_id) != str(tenant.company_id):
+            tenant = None
+    if tenant is None:
+        return jsonify({"success": True, "ignored": True, "id": raw['id']})
+
+    try:
+        ticket, new, changed = apply_webhook(tenant, raw)
+    except WebhookError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    log.info("Webhook aplicado", extra={
+        'company': tenant.slug, 'ticket': ticket['id'], 'new': new, 'priority': ticket['priority_name']
+    })
+
+    return jsonify({
+        "success": True,
+        "id": ticket['id'],
+        "new": new,
+        "changed": changed,
+        "priority_name": ticket['priority_name'],
+        "company": tenant.slug,
+        "snapshot_version": tenant.cache['version']
+    })
+
+@tenant_route('/report.pdf')
+def report_pdf(company=None):
+    """
+    Endpoint: Informe PDF (secciones de generate_report) desde el snapshot.
+
+    - year: año del informe (por defecto, todos los tickets)
+    El PDF se guarda en disco con el hash de sus datos agregados y se
+    reutiliza hasta que cambian. Se construye en otro proceso; las peticiones
+    simultáneas por el mismo informe esperan a la misma construcción.
+    """
+    try:
+        year = parse_year(request.args.get('year'))
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    tenant = tenant_for(company)
+    snapshot = get_cached_tickets(tenant)
+    data = snapshot.aggregate(year).report()
+    if not data['total_tickets']:
+        return jsonify({"success": False, "error": f"No hay tickets en {year}"}), 404
+
+    try:
+        key, path, status = reports.get(data, tenant.name, year, timeout=REPORT_TIMEOUT)
+    except TimeoutError:
+        return jsonify({"success": True, "status": "building"}), 202, {"Retry-After": "5"}
+    except Exception:
+        log.exception("Error generando informe PDF", extra={'company': tenant.slug, 'year': year})
+        return jsonify({"success": False, "error": "No se pudo generar el informe"}), 500
+
+    response = send_file(path, mimetype='application/pdf', etag=key, max_age=0,
+                         download_name=f"Informe_Soporte_Tecnico_{tenant.slug}_{year or 'historico'}.pdf")
+    response.headers['X-Report-Cache'] = status
+    response.headers['X-Snapshot-Version'] = str(snapshot.version)
+    response.headers.update(snapshot_headers())
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Endpoint: Métricas de este proceso en formato de texto de Prometheus"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def _profiles_allowed():
+    provided = request.headers.get('X-Profile-Token') or request.args.get('token')
+    if not PROFILE_TOKEN:
+        abort(503, description="Perfilado desactivado (falta PROFILE_TOKEN)")
+    if not profiler.authorized(provided):
+        abort(401, description="Token inválido")
+
+@app.route('/debug/profiles')
+def list_profiles():
+    """Endpoint: Perfiles guardados (más recientes primero) y cuántos se capturaron"""
+    _profiles_allowed()
     return jsonify({
         "success": True,
-        "trends": trends
+        "captured": profiler.stats,
+        "sample_every": profiler.sample_every,
+        "profiles": profiler.list()
     })
 
-@app.route('/api/refresh')
-def refresh_cache():
-    """Fuerza actualización del cache"""
-    cache['data'] = None
-    cache['timestamp'] = None
-    tickets = get_cached_tickets()
+@app.route('/debug/profiles/<name>')
+def get_profile(name):
+    """
+    Endpoint: Descarga un perfil (.prof de cProfile o .collapsed para flamegraph).
+    Con ?format=text un .prof se devuelve como resumen de pstats.
+    """
+    _profiles_allowed()
+    path = profiler.path_for(name)
+    if path is None:
+        abort(404, description=f"Perfil desconocido: {name}")
+    if request.args.get('format') == 'text' and name.endswith('.prof'):
+        return Response(stats_text(path), mimetype='text/plain')
+    return send_file(path, mimetype='application/octet-stream' if name.endswith('.prof') else 'text/plain',
+                     as_attachment=True, download_name=name)
+
+@tenant_route('/refresh')
+def refresh_cache(company=None):
+    """Fuerza actualización del cache (con ?full=1 rehace la sincronización completa)"""
+    full = request.args.get('full') == '1'
+    tenant = tenant_for(company)
+    with tenant.refresh_lock:
+        synced = refresh_snapshot(tenant, full=full, wait=True)
+    tickets = tenant.cache['data']
+
+    if not synced:
+        # Se sigue sirviendo el snapshot anterior (el almacén no se tocó)
+        return jsonify({
+            "success": False,
+            "error": "No se pudo sincronizar con Freshdesk",
+            "total_tickets": len(tickets) if tickets is not None else 0
+        }), 502
 
     return jsonify({
         "success": True,
@@ -372,14 +1148,14 @@ def refresh_cache():
 # ============================================================
 
 if __name__ == '__main__':
+    start()
     port = int(os.environ.get("PORT", 8080))
-    print("\n" + "="*60)
-    print("SERVIDOR FRESHDESK V6.0 - ANALISIS AVANZADO")
-    print("="*60)
-    print(f"Cliente: {CLIENTE}")
-    print(f"Company ID: {COMPANY_ID}")
-    print(f"Dominio: {FRESHDESK_DOMAIN}.freshdesk.com")
-    print(f"\nServidor corriendo en: http://localhost:{port}")
-    print("="*60 + "\n")
+    log.info("SERVIDOR FRESHDESK V6.0 - ANALISIS AVANZADO", extra={'url': f"http://localhost:{port}"})
+    for n, tenant in enumerate(tenants.values()):
+        route = "/api/..." if n == 0 else f"/api/{tenant.slug}/..."
+        log.info("Cliente", extra={'company': tenant.slug, 'company_name': tenant.name,
+                                   'company_id': tenant.company_id, 'route': route})
+    log.info("API de Freshdesk", extra={'url': FRESHDESK_URL, 'workers': FRESHDESK_WORKERS,
+                                         'rate_limit': FRESHDESK_RATE_LIMIT})
 
     app.run(host='0.0.0.0', port=port, debug=True, use_reloader=False)
@@ -3,9 +3,15 @@
 """
 Generador de Informe de Soporte Técnico - AFJ Global
 Basado en datos de Freshdesk
+
+Uso:
+    python generate_report.py                              # Excel exportado
+    python generate_report.py --source tickets_data.json   # o .ndjson, ticket_store.db
 """
 
-import openpyxl
+import argparse
+import re
+import time
 from datetime import datetime
 from collections import Counter
 from reportlab.lib import colors
@@ -21,6 +27,9 @@ from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 import io
 
+from classifier import classify
+from report_sources import open_source, excel_tickets
+
 # Configuración
 EXCEL_FILE = 'reporte_freshdesk_AFJ_Global.xlsx'
 OUTPUT_PDF = 'Informe_Soporte_Tecnico_AFJ_Global.pdf'
@@ -36,92 +45,139 @@ COLOR_MEDIA = colors.HexColor('#ffd93d')
 COLOR_BAJA = colors.HexColor('#6bcf7f')
 
 def load_excel_data():
-    """Carga y analiza datos del Excel"""
-    wb = openpyxl.load_workbook(EXCEL_FILE)
-    ws = wb['Todos los Tickets']
+    """Carga los tickets del Excel como lista (el informe usa la fuente en streaming)"""
+    return list(excel_tickets(EXCEL_FILE))
+
+# Estados de Freshdesk y niveles del clasificador con los nombres del informe
+STATUS_NAMES = {
+    '2': 'Abierto',
+    '3': 'Pendiente',
+    '4': 'Resuelto',
+    '5': 'Cerrado'
+}
+LEVEL_NAMES = {'Alto': 'ALTA', 'Medio': 'MEDIA', 'Bajo': 'BAJA'}
+
+MONTH_NAMES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio',
+               'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Períodos: '2025' (año), '2025-Q1' (trimestre), '2025-03' (mes); None = todo el histórico
+PERIOD = re.compile(r'^(\d{4})(?:-Q([1-4])|-(0[1-9]|1[0-2]))?$')
+
+
+def parse_period(period):
+    """Valida un período y lo devuelve normalizado (ValueError si no es válido)"""
+    if period in (None, '', 'todo'):
+        return None
+    period = str(period).strip().upper()
+    if not PERIOD.match(period):
+        raise ValueError(f"Período inválido: {period!r} (use 2025, 2025-Q1 o 2025-03)")
+    return period
+
+
+def period_label(period):
+    """Texto del período para el informe: 'Año 2025', '1er trimestre 2025', 'Marzo 2025'"""
+    if period is None:
+        return 'Todo el histórico'
+    year, quarter, month = PERIOD.match(period).groups()
+    if quarter:
+        return f"{quarter}º trimestre {year}"
+    if month:
+        return f"{MONTH_NAMES[int(month) - 1]} {year}"
+    return f"Año {year}"
+
+
+def ticket_periods(created):
+    """Períodos que contienen una fecha de creación (año, trimestre y mes)"""
+    year = str(created.year)
+    return (year, f"{year}-Q{(created.month - 1) // 3 + 1}", f"{year}-{created.month:02d}")
+
+
+def _created(t):
+    """Fecha de creación del ticket (None si falta o no se puede leer)"""
+    if not t.get('created_at'):
+        return None
+    try:
+        return datetime.fromisoformat(str(t['created_at']).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+class TicketCounters:
+    """Contadores del informe para un conjunto de tickets (sin guardar las filas)"""
+
+    def __init__(self):
+        self.total_tickets = 0
+        self.priority_count = Counter()
+        self.status_count = Counter()
+        self.year_count = Counter()
+        self.subject_count = Counter()
+        self.clasificacion = {'ALTA': 0, 'MEDIA': 0, 'BAJA': 0}
+
+    def add(self, t, created, level):
+        self.total_tickets += 1
+
+        # Por prioridad
+        self.priority_count[t.get('priority', 'N/A')] += 1
+
+        # Por estado
+        status = str(t.get('status', 'N/A'))
+        self.status_count[STATUS_NAMES.get(status, f'Estado {status}')] += 1
 
-    tickets = []
-    headers = [cell.value for cell in ws[1]]
+        # Por año
+        if created is not None:
+            self.year_count[created.year] += 1
+
+        # Asuntos (para el top 10)
+        subject = t.get('subject') or ''
+        subject = subject.strip() if isinstance(subject, str) else ''
+        if subject:
+            self.subject_count[subject] += 1
 
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        ticket = dict(zip(headers, row))
-        tickets.append(ticket)
+        self.clasificacion[LEVEL_NAMES[level]] += 1
 
-    return tickets
+    def result(self):
+        return {
+            'total_tickets': self.total_tickets,
+            'priority_count': self.priority_count,
+            'status_count': self.status_count,
+            'year_count': self.year_count,
+            'top_10_subjects': self.subject_count.most_common(10),
+            'clasificacion': self.clasificacion
+        }
 
-def analyze_data(tickets):
-    """Analiza los datos de tickets"""
-    total_tickets = len(tickets)
-
-    # Por prioridad
-    priority_count = Counter([t.get('priority', 'N/A') for t in tickets])
-
-    # Por estado
-    status_count = Counter()
-    status_map = {
-        '2': 'Abierto',
-        '3': 'Pendiente',
-        '4': 'Resuelto',
-        '5': 'Cerrado'
-    }
-    for t in tickets:
-        status = str(t.get('status', 'N/A'))
-        status_name = status_map.get(status, f'Estado {status}')
-        status_count[status_name] += 1
 
-    # Por año
-    year_count = Counter()
+def analyze_data(tickets):
+    """
+    Analiza los datos de tickets en una sola pasada. `tickets` puede ser
+    cualquier iterable (lista o generador de report_sources): solo se guardan
+    los contadores, no las filas.
+    """
+    counters = TicketCounters()
     for t in tickets:
-        if t.get('created_at'):
-            try:
-                year = datetime.fromisoformat(str(t['created_at']).replace('Z', '+00:00')).year
-                year_count[year] += 1
-            except:
-                pass
-
-    # Top 10 asuntos
-    subject_count = Counter()
+        # Clasificación por contenido (mismas reglas que el servidor)
+        counters.add(t, _created(t), classify(t.get('subject') or '', t.get('description') or ''))
+    return counters.result()
+
+
+def analyze_periods(tickets, periods):
+    """
+    Como analyze_data, pero para varios períodos a la vez en una sola pasada:
+    devuelve {período: datos}. Cada ticket se clasifica una vez y suma en los
+    períodos que lo contienen (None = todos los tickets).
+    """
+    counters = {period: TicketCounters() for period in periods}
     for t in tickets:
-        subject = t.get('subject') or ''
-        subject = subject.strip() if isinstance(subject, str) else ''
-        if subject:
-            subject_count[subject] += 1
-    top_10_subjects = subject_count.most_common(10)
-
-    # Clasificación por contenido (similar a la lógica del servidor)
-    clasificacion = {'ALTA': 0, 'MEDIA': 0, 'BAJA': 0}
-
-    keywords_alta = ['aws', 'alarm', 'no enciende', 'no prende', 'escritorio remoto',
-                     'virus', 'malware', 'error servidor', 'afjlearning',
-                     'sharepoint lentitud', 'moodle']
-    keywords_media = ['outlook', 'correo', 'fundae', 'limpieza', 'buzón',
-                      'antivirus', 'pst', 'revisar pc', 'sharepoint', 'spam',
-                      'cambio licencia', 'acceso carpeta']
-    keywords_baja = ['revisión windows', 'mensaje ausencia', 'alta', 'baja',
-                     'redirección', 'instalación']
-
-    for ticket in tickets:
-        subject_val = ticket.get('subject') or ''
-        desc_val = ticket.get('description') or ''
-        subject = (str(subject_val) + ' ' + str(desc_val)).lower()
-
-        if any(kw in subject for kw in keywords_alta):
-            clasificacion['ALTA'] += 1
-        elif any(kw in subject for kw in keywords_media):
-            clasificacion['MEDIA'] += 1
-        elif any(kw in subject for kw in keywords_baja):
-            clasificacion['BAJA'] += 1
-        else:
-            clasificacion['BAJA'] += 1
-
-    return {
-        'total_tickets': total_tickets,
-        'priority_count': priority_count,
-        'status_count': status_count,
-        'year_count': year_count,
-        'top_10_subjects': top_10_subjects,
-        'clasificacion': clasificacion
-    }
+        created = _created(t)
+        targets = [counters[p] for p in ticket_periods(created) if p in counters] \
+            if created is not None else []
+        if None in counters:
+            targets.append(counters[None])
+        if not targets:
+            continue
+        level = classify(t.get('subject') or '', t.get('description') or '')
+        for target in targets:
+            target.add(t, created, level)
+    return {period: c.result() for period, c in counters.items()}
 
 def create_pie_chart(data_dict, title, width=300, height=200):
     """Crea un gráfico de dona/pie"""
@@ -175,8 +231,11 @@ def create_bar_chart(data_dict, title, width=400, height=200):
 class ReportTemplate:
     """Clase para generar el PDF con estilos consistentes"""
 
-    def __init__(self, filename):
+    def __init__(self, filename, company=COMPANY_NAME, period=None, date=None):
         self.filename = filename
+        self.company = company
+        self.period = period
+        self.date = date or REPORT_DATE
         self.doc = SimpleDocTemplate(filename, pagesize=A4,
                                       rightMargin=72, leftMargin=72,
                                       topMargin=72, bottomMargin=72)
@@ -239,8 +298,9 @@ class ReportTemplate:
 
         # Información del cliente
         info_data = [
-            ['Cliente:', COMPANY_NAME],
-            ['Fecha:', REPORT_DATE],
+            ['Cliente:', self.company],
+            ['Período:', period_label(self.period)],
+            ['Fecha:', self.date],
             ['Versión:', REPORT_VERSION],
             ['Elaborado por:', 'Mesa de Ayuda TI']
         ]
@@ -264,7 +324,7 @@ class ReportTemplate:
         self.story.append(Spacer(1, 0.2*inch))
 
         summary_text = f"""
-        Durante el período analizado, la Mesa de Ayuda de {COMPANY_NAME} ha gestionado un total de
+        Durante el período analizado, la Mesa de Ayuda de {self.company} ha gestionado un total de
         <b>{data['total_tickets']} tickets de soporte técnico</b>. Este informe presenta un análisis
         detallado del rendimiento del servicio, la distribución de incidencias por criticidad,
         y las principales áreas de atención requeridas por los usuarios.
@@ -509,7 +569,7 @@ class ReportTemplate:
 
         # Firma
         signature = Paragraph(
-            f"<b>Mesa de Ayuda TI<br/>{COMPANY_NAME}<br/>{REPORT_DATE}</b>",
+            f"<b>Mesa de Ayuda TI<br/>{self.company}<br/>{self.date}</b>",
             ParagraphStyle(
                 name='Signature',
                 fontSize=11,
@@ -523,39 +583,46 @@ class ReportTemplate:
         """Construye el PDF"""
         self.doc.build(self.story)
 
+def render_report(data, filename, company=COMPANY_NAME, period=None, date=None):
+    """Arma todas las secciones del informe con los datos agregados y escribe el PDF"""
+    report = ReportTemplate(filename, company, period, date)
+
+    report.add_cover_page()
+    report.add_executive_summary(data)
+    report.add_classification_analysis(data)
+    report.add_status_analysis(data)
+    report.add_top_tickets(data)
+    report.add_recommendations(data)
+    report.add_conclusions(data)
+
+    report.build()
+
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description='Informe PDF de soporte técnico')
+    parser.add_argument('--source', default=EXCEL_FILE,
+                        help='tickets: .xlsx, .json, .ndjson/.jsonl o ticket_store.db')
+    parser.add_argument('--output', default=OUTPUT_PDF, help='archivo PDF de salida')
+    args = parser.parse_args()
+
     print("📊 Generando Informe de Soporte Técnico - AFJ Global")
     print("=" * 60)
 
-    # Cargar datos
-    print("📁 Cargando datos del Excel...")
-    tickets = load_excel_data()
+    # Cargar y analizar datos en una sola pasada
+    print(f"📁 Leyendo y analizando tickets de {args.source}...")
+    start = time.perf_counter()
+    data = analyze_data(open_source(args.source))
 
-    # Analizar datos
-    print("🔍 Analizando tickets...")
-    data = analyze_data(tickets)
-
-    print(f"✅ Total de tickets: {data['total_tickets']}")
+    print(f"✅ Total de tickets: {data['total_tickets']} ({time.perf_counter() - start:.1f}s)")
     print(f"✅ Clasificación: ALTA={data['clasificacion']['ALTA']}, " +
           f"MEDIA={data['clasificacion']['MEDIA']}, BAJA={data['clasificacion']['BAJA']}")
 
     # Generar PDF
     print("\n📄 Generando PDF...")
-    report = ReportTemplate(OUTPUT_PDF)
-
-    report.add_cover_page()
-    report.add_executive_summary(data)
-    report.add_classification_analysis(data)
-    report.add_status_analysis(data)
-    report.add_top_tickets(data)
-    report.add_recommendations(data)
-    report.add_conclusions(data)
-
-    report.build()
+    render_report(data, args.output)
 
     print(f"\n✅ ¡Informe generado exitosamente!")
-    print(f"📍 Ubicación: {OUTPUT_PDF}")
+    print(f"📍 Ubicación: {args.output}")
     print("=" * 60)
 
 if __name__ == '__main__':
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración de gunicorn - AFJ Global
+gunicorn la lee sola desde el directorio del proyecto. El servidor no arranca
+al importarse (ver freshdesk_server.start): cada worker lo arranca aquí, ya
+con su propio PID para el lease.
+"""
+
+
+def post_worker_init(worker):
+    import freshdesk_server
+    freshdesk_server.start()
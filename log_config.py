@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Logging estructurado del servidor - AFJ Global
+Los módulos usan `logging.getLogger(__name__)` y pasan los datos de cada
+evento en `extra` (empresa, tickets, duración...). Aquí se configura la
+salida: texto con pares clave=valor o una línea JSON por evento.
+
+Variables de entorno:
+    LOG_LEVEL   DEBUG, INFO (por defecto), WARNING, ERROR
+    LOG_FORMAT  text (por defecto) o json
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+
+# Atributos propios de LogRecord: lo demás viene de `extra`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+def _timestamp(record):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}"
+
+
+def _value(value):
+    """Valor de un par clave=valor; entre comillas si tiene espacios"""
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    text = str(value)
+    if not text or ' ' in text or '"' in text:
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class TextFormatter(logging.Formatter):
+    """2026-01-19T09:12:38.123 INFO freshdesk_server: mensaje empresa=afj tickets=120"""
+
+    def format(self, record):
+        line = f"{_timestamp(record)} {record.levelname} {record.name}: {record.getMessage()}"
+        fields = ' '.join(f"{key}={_value(value)}" for key, value in _fields(record).items())
+        if fields:
+            line += ' ' + fields
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por evento, para agregadores de logs"""
+
+    def format(self, record):
+        event = {
+            'ts': _timestamp(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+FORMATTERS = {'text': TextFormatter, 'json': JsonFormatter}
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Configura el logger raíz una vez (si ya tiene handlers, p. ej. los de
+    gunicorn o de la aplicación que importa el servidor, no se toca).
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    level = (level or os.environ.get('LOG_LEVEL', 'INFO')).upper()
+    fmt = (fmt or os.environ.get('LOG_FORMAT', 'text')).lower()
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(FORMATTERS.get(fmt, TextFormatter)())
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+    # Con LOG_LEVEL=DEBUG solo se detallan los módulos propios, no las librerías
+    for name in ('werkzeug', 'urllib3'):
+        logging.getLogger(name).setLevel(max(root.level, logging.INFO))
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas del servidor en formato Prometheus - AFJ Global
+Contadores, gauges e histogramas en memoria del proceso, expuestos en texto
+(formato 0.0.4) en /metrics. Registrar una observación cuesta un lock y una
+búsqueda binaria en los buckets; el texto solo se arma cuando se consulta.
+
+Con gunicorn cada worker tiene sus propias métricas (render.yaml usa un
+solo worker con hilos).
+"""
+
+import math
+import threading
+from bisect import bisect_left
+
+# Buckets por defecto (segundos), de 1 ms a 60 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base: nombre, ayuda, etiquetas y valores por combinación de etiquetas"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: etiquetas {sorted(labels)}, se esperaba {list(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(sufijo, valores de etiquetas, etiqueta extra, valor) de cada serie"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield '', key, None, value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            # Sin etiquetas la serie existe desde el principio (se exporta 0)
+            self._values[()] = 0
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Valor que sube y baja; con `callback` se calcula al consultar /metrics"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.callback is not None:
+            # callback() -> {tupla de etiquetas: valor}
+            for key, value in sorted(self.callback().items()):
+                if value is not None:
+                    yield '', tuple(str(v) for v in key), None, value
+            return
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        if not self.labelnames:
+            self._values[()] = [[0] * len(self.buckets), 0.0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # [cuenta por bucket (sin acumular), suma]
+                series = self._values[key] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        for key, (counts, total) in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield '_bucket', key, f'le="{_number(float(bound))}"', cumulative
+            yield '_sum', key, None, total
+            yield '_count', key, None, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrica repetida: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=(), callback=None):
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ============================================================
+# MÉTRICAS COMPARTIDAS POR LOS MÓDULOS
+# ============================================================
+
+REQUEST_SECONDS = histogram(
+    'freshdesk_http_request_duration_seconds',
+    'Duración de las peticiones HTTP hasta enviar las cabeceras, por endpoint',
+    ('endpoint', 'method', 'status'))
+
+CACHE_REQUESTS = counter(
+    'freshdesk_cache_requests_total',
+    'Consultas a los caches (snapshot: hit/stale/miss; response: hit/miss; report: hit/miss/coalesced)',
+    ('cache', 'result'))
+
+UPSTREAM_SECONDS = histogram(
+    'freshdesk_upstream_request_duration_seconds',
+    'Duración de cada petición (página) a la API de Freshdesk',
+    ('status',))
+
+UPSTREAM_BYTES = counter(
+    'freshdesk_upstream_response_bytes_total',
+    'Bytes recibidos de la API de Freshdesk')
+
+UPSTREAM_THROTTLED = counter(
+    'freshdesk_upstream_throttled_total',
+    'Respuestas 429 de la API de Freshdesk')
+
+CLASSIFICATION_SECONDS = histogram(
+    'freshdesk_classification_duration_seconds',
+    'Tiempo de clasificación por lote de tickets')
+
+CLASSIFIED_TICKETS = counter(
+    'freshdesk_classified_tickets_total',
+    'Tickets clasificados por criticidad')
+
+AGGREGATION_SECONDS = histogram(
+    'freshdesk_aggregation_duration_seconds',
+    'Tiempo de construcción de agregados (snapshot completo o cambios incrementales)',
+    ('kind',))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor simulado de la API de Freshdesk (/api/v2/tickets) para pruebas locales
+Permite inyectar latencia y respuestas 429 para probar el cliente.
+
+Uso:
+    python mock_freshdesk.py --tickets 2000 --latency 0.2 --throttle-every 5
+    FRESHDESK_URL=http://localhost:5001 python freshdesk_server.py
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import Flask, jsonify, request
+
+SUBJECTS = [
+    'revisar pc', 'aviso eset', 'Acceso Share Point', 'RE: Acceso FUNDAE',
+    'Limpieza buzón', 'Outlook no sincroniza', 'Alarma AWS', 'Alta usuario',
+    'Mensaje ausencia', 'Revisión Windows', 'Moodle caido', 'Cambio licencia'
+]
+
+
+def generate_tickets(count, seed=42):
+    """Genera tickets crudos con el formato de la API de Freshdesk"""
+    rnd = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    tickets = []
+    for i in range(count):
+        created = start + timedelta(minutes=rnd.randint(0, 60 * 24 * 400))
+        updated = created + timedelta(minutes=rnd.randint(0, 60 * 48))
+        tickets.append({
+            'id': 100000 + i,
+            'subject': f"{rnd.choice(SUBJECTS)} - {i}",
+            'description_text': 'Ticket generado por mock_freshdesk',
+            'status': rnd.choice([2, 3, 4, 5, 5, 5]),
+            'created_at': created.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'updated_at': updated.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'requester': {'name': f"Usuario {i % 50}"},
+            'tags': []
+        })
+    tickets.sort(key=lambda t: t['created_at'], reverse=True)
+    return tickets
+
+
+def create_app(tickets=1000, latency=0.0, throttle_every=0, retry_after=1,
+               rate_limit=0, seed=42, page_size=100):
+    """
+    Crea la app simulada.
+
+    - tickets: cantidad a generar o lista de tickets crudos ya generados
+    - latency: segundos de espera por petición
+    - throttle_every: responde 429 cada N peticiones (0 = nunca)
+    - rate_limit: presupuesto por minuto anunciado en X-RateLimit-* (0 = sin cabeceras)
+    - page_size: máximo de per_page (Freshdesk admite hasta 100)
+    """
+    app = Flask(__name__)
+    data = generate_tickets(tickets, seed=seed) if isinstance(tickets, int) else tickets
+    state = {'requests': 0, 'throttled': 0, 'window_start': time.time(), 'used': 0}
+    lock = threading.Lock()
+    app.config['MOCK_STATE'] = state
+
+    @app.route('/api/v2/tickets')
+    def list_tickets():
+        with lock:
+            state['requests'] += 1
+            n = state['requests']
+            if time.time() - state['window_start'] >= 60:
+                state['window_start'] = time.time()
+                state['used'] = 0
+            state['used'] += 1
+            used = state['used']
+
+        if latency:
+            time.sleep(latency)
+
+        headers = {}
+        if rate_limit:
+            headers['X-RateLimit-Total'] = str(rate_limit)
+            headers['X-RateLimit-Remaining'] = str(max(rate_limit - used, 0))
+
+        if (throttle_every and n % throttle_every == 0) or (rate_limit and used > rate_limit):
+            with lock:
+                state['throttled'] += 1
+            headers['Retry-After'] = str(retry_after)
+            return jsonify({'message': 'You have exceeded the limit of requests per minute'}), 429, headers
+
+        page = int(request.args.get('page', 1))
+        per_page = min(int(request.args.get('per_page', 30)), page_size)
+        since = request.args.get('updated_since')
+
+        items = data
+        if since:
+            items = [t for t in items if t['updated_at'] >= since]
+        order_by = request.args.get('order_by')
+        if order_by in ('created_at', 'updated_at'):
+            # Como Freshdesk: order_type desc por defecto
+            items = sorted(items, key=lambda t: (t[order_by], t['id']),
+                           reverse=request.args.get('order_type', 'desc') == 'desc')
+        start = (page - 1) * per_page
+        return jsonify(items[start:start + per_page]), 200, headers
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mock de la API de Freshdesk')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--tickets', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle-every', type=int, default=0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate-limit', type=int, default=0)
+    parser.add_argument('--page-size', type=int, default=100)
+    args = parser.parse_args()
+
+    app = create_app(args.tickets, args.latency, args.throttle_every,
+                     args.retry_after, args.rate_limit, page_size=args.page_size)
+    print(f"Mock Freshdesk en http://localhost:{args.port} ({args.tickets} tickets)")
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
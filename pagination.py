@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Paginación por cursor (keyset), orden y proyección de campos - AFJ Global
+El cursor codifica (valor del campo de orden, id) de la última fila enviada,
+así cada página cuesta O(log n + tamaño de página) sin importar su posición.
+"""
+
+import base64
+import json
+from bisect import bisect_left, bisect_right
+
+# Campos por los que se puede ordenar (el id desempata)
+SORT_FIELDS = ('created_at', 'updated_at', 'id')
+
+MAX_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    """Parámetros de paginación inválidos (se responde 400)"""
+
+
+def parse_sort(value):
+    """'-created_at' -> ('created_at', True). Por defecto, más recientes primero"""
+    value = value or '-created_at'
+    descending = value.startswith('-')
+    field = value.lstrip('-')
+    if field not in SORT_FIELDS:
+        raise PaginationError(f"sort debe ser uno de: {', '.join(SORT_FIELDS)}")
+    return field, descending
+
+
+def parse_limit(value):
+    if value is None or value == '':
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError("limit debe ser un número")
+    if limit < 1:
+        raise PaginationError("limit debe ser mayor que 0")
+    return min(limit, MAX_LIMIT)
+
+
+def parse_year(value):
+    """'2025' -> '2025'; vacío o 'all' -> None (todos los años)"""
+    if not value or value == 'all':
+        return None
+    if not (len(value) == 4 and value.isascii() and value.isdigit()):
+        raise PaginationError("year debe ser un año (p. ej. 2025)")
+    return value
+
+
+def parse_fields(value, allowed):
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f"Campos desconocidos: {', '.join(unknown)}")
+    return fields
+
+
+def encode_cursor(key):
+    raw = json.dumps(list(key), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return tuple(json.loads(base64.urlsafe_b64decode(padded)))
+    except Exception:
+        raise PaginationError("cursor inválido")
+
+
+def page(order, key, descending, limit, cursor=None):
+    """
+    Página de `order` (filas en orden ascendente según `key`) a partir del
+    cursor. Retorna (filas, cursor_siguiente o None).
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None and order:
+        try:
+            after < key(order[0])
+        except TypeError:
+            raise PaginationError("cursor no corresponde al orden pedido")
+
+    if descending:
+        end = bisect_left(order, after, key=key) if after is not None else len(order)
+        start = max(0, end - limit)
+        result = order[start:end][::-1]
+        has_more = start > 0
+        last = order[start] if result else None
+    else:
+        start = bisect_right(order, after, key=key) if after is not None else 0
+        end = start + limit
+        result = order[start:end]
+        has_more = end < len(order)
+        last = result[-1] if result else None
+
+    next_cursor = encode_cursor(key(last)) if has_more and last is not None else None
+    return result, next_cursor
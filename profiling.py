@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Perfilado de peticiones bajo demanda - AFJ Global
+Para saber en qué se va el tiempo de una petición lenta (descarga,
+filtrado por año, tendencias, serialización...) sin desplegar nada:
+
+- A petición: `?_profile=1` o la cabecera `X-Profile: 1`, con el token de
+  operador (`X-Profile-Token` o `_profile_token`). Sin PROFILE_TOKEN no se
+  atiende.
+- Por muestreo: con PROFILE_SAMPLE_EVERY=N se perfila 1 de cada N
+  peticiones. Con 0 (por defecto) el coste es comprobar un entero y dos
+  claves en la petición.
+
+Dos modos:
+- `cprofile` (por defecto a petición): estadísticas deterministas de
+  cProfile (`.prof`, para pstats / snakeviz).
+- `stacks` (por defecto al muestrear): un hilo toma la pila del hilo de la
+  petición cada milisegundo; se guardan pilas colapsadas (`.collapsed`,
+  para flamegraph.pl o speedscope). Casi no frena la petición.
+
+Se perfila desde before_request hasta after_request: en respuestas en
+streaming (exportaciones, SSE) solo queda la parte hasta las cabeceras.
+Solo se mide el hilo de la petición; las páginas que se descargan en
+paralelo aparecen como espera (su duración está en /metrics).
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from metrics import counter
+from webhooks import verify_secret
+
+MODES = ('cprofile', 'stacks')
+
+# Extensión del archivo guardado por cada modo
+EXTENSIONS = {'cprofile': 'prof', 'stacks': 'collapsed'}
+
+# Perfiles conservados en la carpeta (se borran los más antiguos)
+MAX_FILES = 100
+
+# Segundos entre muestras del modo `stacks`
+SAMPLE_INTERVAL = 0.001
+
+# Nombres válidos de perfil: los que genera `Profiler.finish`
+PROFILE_NAME = re.compile(r'^[\w.-]+\.(prof|collapsed)$')
+UNSAFE = re.compile(r'[^\w.-]')
+
+PROFILES = counter('freshdesk_profiles_total', 'Perfiles capturados', ('trigger', 'mode'))
+
+
+def _frame_label(code):
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{code.co_name}"
+
+
+class StackSampler:
+    """Cuenta las pilas de un hilo muestreadas desde otro hilo"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Formato de pilas colapsadas: 'a;b;c <muestras>' por línea"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """Perfil en curso de una petición"""
+
+    def __init__(self, mode, trigger):
+        self.mode = mode
+        self.trigger = trigger
+        self.start = time.perf_counter()
+        if mode == 'cprofile':
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.profile = StackSampler(threading.get_ident())
+            self.profile.start()
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self.profile.disable()
+        else:
+            self.profile.stop()
+        self.seconds = time.perf_counter() - self.start
+
+    def write(self, path):
+        temporary = f"{path}.tmp"
+        if self.mode == 'cprofile':
+            self.profile.dump_stats(temporary)
+        else:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                f.write(self.profile.collapsed())
+        os.replace(temporary, path)
+
+
+class Profiler:
+    """Decide qué peticiones se perfilan y guarda los resultados en `directory`"""
+
+    def __init__(self, directory, token='', sample_every=0, sample_mode='stacks',
+                 exclude=(), max_files=MAX_FILES):
+        self.directory = directory
+        self.token = token
+        self.sample_every = sample_every
+        self.sample_mode = sample_mode if sample_mode in MODES else 'stacks'
+        # Endpoints que no entran en el muestreo (p. ej. /metrics, que se consulta cada pocos segundos)
+        self.exclude = set(exclude)
+        self.max_files = max_files
+        self._requests = itertools.count(1)
+        self._files = itertools.count(1)
+        self.stats = {'request': 0, 'sample': 0, 'rejected': 0}
+
+    def authorized(self, provided):
+        return verify_secret(self.token, provided)
+
+    def begin(self, request):
+        """ProfileSession si esta petición se perfila (None en caso contrario)"""
+        asked = request.args.get('_profile') or request.headers.get('X-Profile')
+        if asked:
+            provided = request.headers.get('X-Profile-Token') or request.args.get('_profile_token')
+            if self.authorized(provided):
+                mode = asked if asked in MODES else 'cprofile'
+                return ProfileSession(mode, 'request')
+            self.stats['rejected'] += 1
+        if self.sample_every and request.endpoint not in self.exclude \
+                and next(self._requests) % self.sample_every == 0:
+            return ProfileSession(self.sample_mode, 'sample')
+        return None
+
+    def finish(self, session, endpoint):
+        """Detiene el perfil, lo guarda y retorna el nombre del archivo"""
+        session.stop()
+        name = UNSAFE.sub('_', f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint or 'none'}-"
+                               f"{session.trigger}-{os.getpid()}-{next(self._files)}")
+        name = f"{name}.{EXTENSIONS[session.mode]}"
+        os.makedirs(self.directory, exist_ok=True)
+        session.write(os.path.join(self.directory, name))
+        self.stats[session.trigger] += 1
+        PROFILES.inc(trigger=session.trigger, mode=session.mode)
+        self._prune()
+        return name
+
+    def path_for(self, name):
+        """Ruta de un perfil guardado; None si el nombre no es válido o no existe"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def list(self):
+        """Perfiles guardados, del más reciente al más antiguo"""
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if PROFILE_NAME.match(entry.name)]
+        except FileNotFoundError:
+            return []
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [{'name': entry.name, 'bytes': entry.stat().st_size} for entry in entries]
+
+    def _prune(self):
+        files = self.list()
+        for entry in files[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, entry['name']))
+            except OSError:
+                pass
+
+
+def stats_text(path, limit=40):
+    """Resumen legible de un `.prof`: las `limit` funciones con más tiempo acumulado"""
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
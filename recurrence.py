@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recurrencia por asuntos parecidos (MinHash + LSH) - AFJ Global
+Los asuntos se normalizan (sin RE:/FW:, nombres de personas, fechas, números
+ni correos) y los casi duplicados se agrupan en clusters con MinHash sobre
+trigramas de caracteres y LSH por bandas. Cada asunto distinto se asigna
+una sola vez, al llegar: el coste por ticket nuevo no depende del total y
+la recurrencia de un agregado solo suma sus contadores por cluster.
+"""
+
+import hashlib
+import re
+import random
+import threading
+import zlib
+
+from classifier import fold
+
+# Prefijos de respuesta / reenvío (se quitan repetidos: "RE: FW: ...")
+PREFIXES = re.compile(r'^(?:\s*(?:re|rv|fw|fwd|enc|tr|aw|recuperar|undeliverable)\s*:)+', re.I)
+EMAILS = re.compile(r'\S+@\S+')
+WORDS = re.compile(r'[^\W_]+')
+# Separadores de segmentos: " - ", "_", paréntesis, dos puntos...
+SEGMENTS = re.compile(r'\s[-–/|]\s*|\s*[-–]\s|[_()\[\]:,]')
+
+MONTHS = {
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+    'septiembre', 'setiembre', 'octubre', 'noviembre', 'diciembre',
+    'january', 'february', 'march', 'april', 'may', 'june', 'july', 'august',
+    'september', 'october', 'november', 'december'
+}
+
+STOPWORDS = {
+    'de', 'del', 'la', 'el', 'los', 'las', 'lo', 'a', 'al', 'y', 'e', 'o', 'en',
+    'para', 'por', 'con', 'sin', 'un', 'una', 'su', 'mi', 'se', 'que',
+    'the', 'of', 'to', 'and', 'for', 'in', 'on'
+}
+
+# Nombres de pila frecuentes (sin tildes). Un nombre y las palabras con
+# mayúscula inicial que lo siguen (apellidos) se quitan del asunto.
+FIRST_NAMES = {
+    'adolfo', 'adrian', 'agustin', 'alberto', 'alejandra', 'alejandro', 'alex',
+    'alexis', 'alfonso', 'alfredo', 'alicia', 'alonso', 'alvaro', 'amparo', 'ana',
+    'andrea', 'andres', 'angel', 'angela', 'angelica', 'anjela', 'antonia', 'antonio',
+    'arturo', 'barbara', 'beatriz', 'benjamin', 'bernardo', 'blanca', 'bryam', 'bryan',
+    'camila', 'carla', 'carlos', 'carmen', 'carolina', 'catalina', 'cecilia', 'cesar',
+    'claudia', 'claudio', 'constanza', 'cristian', 'cristina', 'daniel', 'daniela',
+    'david', 'diana', 'diego', 'edinson', 'eduardo', 'edy', 'elena', 'elisa', 'emilio',
+    'enrique', 'erika', 'ernesto', 'esteban', 'estefania', 'eva', 'fabian', 'felipe',
+    'fernanda', 'fernando', 'francisca', 'francisco', 'gabriel', 'gabriela', 'gerardo',
+    'gloria', 'gonzalo', 'guillermo', 'gustavo', 'hector', 'hugo', 'ignacio', 'ines',
+    'irene', 'isabel', 'ivan', 'jaime', 'javier', 'javiera', 'jean', 'jesus', 'joaquin',
+    'jorge', 'jose', 'josefa', 'juan', 'julia', 'julian', 'julio', 'karen', 'karina',
+    'laura', 'leonardo', 'lorena', 'lucia', 'luis', 'luisa', 'lydia', 'manuel',
+    'marcela', 'marcelo', 'marco', 'marcos', 'margarita', 'maria', 'mariana', 'marie',
+    'mario', 'marta', 'martin', 'matias', 'mauricio', 'miguel', 'monica', 'natalia',
+    'nicolas', 'nicole', 'oscar', 'pablo', 'paola', 'patricia', 'patricio', 'paula',
+    'pedro', 'pia', 'pierre', 'priscila', 'rafael', 'ramon', 'raul', 'ricardo',
+    'roberto', 'rocio', 'rodrigo', 'rosa', 'ruben', 'sandra', 'santiago', 'sara',
+    'sebastian', 'sergio', 'silvia', 'sofia', 'susana', 'tomas', 'valentina',
+    'valeria', 'veronica', 'vicente', 'victor', 'victoria', 'ximena', 'yolanda'
+}
+
+# Palabras del dominio que no son apellidos aunque vayan en mayúscula
+DOMAIN_WORDS = {
+    'alta', 'baja', 'acceso', 'portatil', 'equipo', 'correo', 'mail', 'buzon',
+    'licencia', 'outlook', 'windows', 'sharepoint', 'share', 'point', 'onedrive',
+    'teams', 'office', 'moodle', 'fundae', 'aws', 'pst', 'urgente', 'impresora',
+    'carpeta', 'cambio', 'revision', 'perfil', 'respaldo', 'usuario', 'clave',
+    'afj', 'afjperu', 'afjglobal', 'afjlearning', 'escritorio', 'remoto', 'vpn'
+}
+
+# MinHash: 32 funciones en 8 bandas de 4 -> umbral LSH ~0.6
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+# Similitud estimada mínima para unirse a un cluster
+THRESHOLD = 0.5
+
+_rnd = random.Random(20260115)
+MASKS = tuple(_rnd.getrandbits(32) for _ in range(NUM_PERM))
+
+
+def normalize_subject(subject):
+    """
+    Forma canónica de un asunto para agrupar: minúsculas sin tildes, sin
+    prefijos RE:/FW:, correos, fechas, meses, números, nombres de personas,
+    letras sueltas ni palabras vacías.
+    """
+    text = EMAILS.sub(' ', PREFIXES.sub('', subject or ''))
+    kept = []
+    for segment in SEGMENTS.split(text):
+        tokens = WORDS.findall(segment)
+        folded = [fold(token) for token in tokens]
+
+        # Segmento que solo tiene palabras con mayúscula inicial ajenas al dominio
+        # (" - Carmen Orellana - ") -> nombre de persona
+        if kept and 0 < len(tokens) <= 3 and all(
+            t[0].isupper() and not t.isupper() and f not in DOMAIN_WORDS
+            for t, f in zip(tokens, folded)
+        ):
+            continue
+
+        in_name = False
+        for token, word in zip(tokens, folded):
+            capitalized = token[0].isupper()
+            if word in FIRST_NAMES and capitalized:
+                in_name = True
+                continue
+            if in_name and capitalized and word not in DOMAIN_WORDS:
+                continue          # apellidos tras el nombre
+            in_name = False
+            if len(word) < 2 or any(ch.isdigit() for ch in word) or word in MONTHS \
+                    or word in STOPWORDS:
+                continue
+            kept.append(word)
+    return ' '.join(kept)
+
+
+def shingles(text):
+    """Trigramas de caracteres (con bordes), como hashes de 32 bits"""
+    padded = f" {text} "
+    if len(padded) < 3:
+        return {zlib.crc32(padded.encode('utf-8'))}
+    return {zlib.crc32(padded[i:i + 3].encode('utf-8')) for i in range(len(padded) - 2)}
+
+
+def signature(text):
+    """Firma MinHash: mínimo de cada hash permutado por XOR con una máscara fija"""
+    hashes = shingles(text)
+    return tuple(min(h ^ mask for h in hashes) for mask in MASKS)
+
+
+def _key(subject):
+    """Forma con la que se agrupa un asunto"""
+    return normalize_subject(subject) or fold(subject or '').strip()
+
+
+def similarity(a, b):
+    """Jaccard estimado entre dos firmas"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+class SubjectClusters:
+    """
+    Asignación incremental asunto -> cluster.
+
+    Cada forma normalizada distinta se firma una vez; sus bandas LSH dan los
+    clusters candidatos y se une al más parecido si supera THRESHOLD. Si no,
+    abre un cluster nuevo. Los asuntos ya vistos se resuelven con un dict.
+
+    La asignación depende del orden de llegada: `add_many` asigna ordenado
+    por forma normalizada y `state` resume la asignación hecha, para que las
+    respuestas que dependen de ella no se confundan entre procesos.
+    """
+
+    def __init__(self):
+        self._by_subject = {}       # asunto original -> cluster
+        self._by_key = {}           # forma normalizada -> cluster
+        self._buckets = {}          # (banda, valores) -> cluster
+        self._signatures = []       # firma del primer miembro de cada cluster
+        self.keys = []              # forma normalizada del primer miembro
+        self._fingerprint = 0       # XOR de (forma, cluster) asignados
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    @property
+    def state(self):
+        """
+        Huella de la asignación: igual en dos procesos que asignaron las
+        mismas formas a los mismos clusters, en cualquier orden
+        """
+        return len(self._by_key), self._fingerprint
+
+    def cluster_of(self, subject):
+        cluster = self._by_subject.get(subject)
+        if cluster is None:
+            with self._lock:
+                cluster = self._assign(subject)
+        return cluster
+
+    def add_many(self, subjects):
+        """
+        Asigna de una vez una colección de asuntos (p. ej. al cargar un
+        snapshot), ordenados por forma normalizada: los mismos asuntos dan
+        los mismos clusters sin importar en qué orden lleguen
+        """
+        with self._lock:
+            pending = {subject: _key(subject) for subject in subjects
+                       if subject not in self._by_subject}
+            for subject, key in sorted(pending.items(), key=lambda item: (item[1], item[0] or '')):
+                self._assign(subject, key)
+
+    def _assign(self, subject, key=None):
+        if subject in self._by_subject:
+            return self._by_subject[subject]
+
+        key = _key(subject) if key is None else key
+        cluster = self._by_key.get(key)
+        if cluster is None:
+            sig = signature(key)
+            bands = [(band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+            best, best_score = None, THRESHOLD
+            for candidate in {self._buckets[b] for b in bands if b in self._buckets}:
+                score = similarity(sig, self._signatures[candidate])
+                if score >= best_score and (best is None or score > best_score or candidate < best):
+                    best, best_score = candidate, score
+
+            if best is None:
+                cluster = len(self._signatures)
+                self._signatures.append(sig)
+                self.keys.append(key)
+                for b in bands:
+                    self._buckets.setdefault(b, cluster)
+            else:
+                cluster = best
+            self._by_key[key] = cluster
+            digest = hashlib.blake2b(f"{key}\x1f{self.keys[cluster]}".encode('utf-8'), digest_size=8)
+            self._fingerprint ^= int.from_bytes(digest.digest(), 'big')
+
+        self._by_subject[subject] = cluster
+        return cluster
+
+    def recurrence(self, subjects, total, top=20):
+        """
+        Top de clusters a partir de un Counter asunto -> tickets. Cada entrada
+        lleva el asunto más frecuente del cluster como representante, el
+        número de variantes y algunos ejemplos. Los empates se resuelven por
+        texto, no por el orden del Counter.
+        """
+        groups = {}
+        for subject, count in subjects.items():
+            group = groups.get(self.cluster_of(subject))
+            if group is None:
+                groups[self.cluster_of(subject)] = group = {'count': 0, 'members': []}
+            group['count'] += count
+            group['members'].append((count, subject))
+
+        ranked = sorted(groups.items(), key=lambda item: (-item[1]['count'], self.keys[item[0]]))[:top]
+        result = []
+        for cluster, group in ranked:
+            members = sorted(group['members'], key=lambda member: (-member[0], member[1] or ''))
+            result.append({
+                "subject": members[0][1],
+                "count": group['count'],
+                "percentage": round((group['count'] / total * 100), 1) if total > 0 else 0,
+                "variants": len(members),
+                "examples": [subject for _, subject in members[1:4]],
+                "normalized": self.keys[cluster]
+            })
+        return result
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reproduce webhooks de Freshdesk grabados (NDJSON o lista JSON) - AFJ Global
+Los cuerpos se graban en el servidor con FRESHDESK_WEBHOOK_RECORD=archivo.ndjson
+
+Uso:
+    python replay_webhooks.py webhooks_ejemplo.ndjson --url http://localhost:8080 --secret s3cr3t
+    python replay_webhooks.py webhooks_ejemplo.ndjson --local   # sin servidor (test client de Flask)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+WEBHOOK_PATH = '/api/webhooks/freshdesk'
+
+
+def load_payloads(path):
+    """Cuerpos grabados: una línea JSON por webhook, o un archivo con una lista"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def remote_sender(base_url, secret):
+    import requests
+
+    session = requests.Session()
+    url = base_url.rstrip('/') + WEBHOOK_PATH
+
+    def send(payload):
+        response = session.post(url, json=payload, headers={'X-Webhook-Secret': secret}, timeout=30)
+        return response.status_code, response.json()
+    return send
+
+
+def local_sender(secret):
+    os.environ['FRESHDESK_WEBHOOK_SECRET'] = secret
+    import freshdesk_server
+
+    client = freshdesk_server.app.test_client()
+
+    def send(payload):
+        response = client.post(WEBHOOK_PATH, json=payload, headers={'X-Webhook-Secret': secret})
+        return response.status_code, response.get_json()
+    return send
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reproduce webhooks de Freshdesk grabados')
+    parser.add_argument('file', help='NDJSON (o lista JSON) con los cuerpos grabados')
+    parser.add_argument('--url', default='http://localhost:8080', help='URL base del servidor')
+    parser.add_argument('--secret', default=os.environ.get('FRESHDESK_WEBHOOK_SECRET', ''))
+    parser.add_argument('--delay', type=float, default=0.0, help='segundos entre webhooks')
+    parser.add_argument('--local', action='store_true',
+                        help='aplicar en proceso con el test client (usa TICKET_STORE_FILE)')
+    args = parser.parse_args()
+
+    if not args.secret:
+        sys.exit("Falta el secreto: --secret o FRESHDESK_WEBHOOK_SECRET")
+
+    send = local_sender(args.secret) if args.local else remote_sender(args.url, args.secret)
+    payloads = load_payloads(args.file)
+    failed = 0
+    start = time.perf_counter()
+
+    for n, payload in enumerate(payloads, 1):
+        status, body = send(payload)
+        if status != 200:
+            failed += 1
+        print(f"{n:>4}  {status}  {json.dumps(body, ensure_ascii=False)}")
+        if args.delay:
+            time.sleep(args.delay)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(payloads)} webhooks en {elapsed:.2f}s ({failed} con error)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Informes PDF en lote - AFJ Global
+Genera varios informes (empresa, período) de una vez, para el cierre de mes.
+Los tickets de cada empresa se leen y agregan una sola vez para todos sus
+períodos (analyze_periods); después los PDF se construyen en paralelo en un
+pool de procesos (ReportLab es CPU puro y no libera el GIL). A cada worker
+solo viajan los contadores ya agregados, no los tickets.
+
+Uso:
+    python report_batch.py afj:2025 afj:2025-Q4 afj:2025-12 acme:2025-12
+    python report_batch.py --year 2025                  # año, trimestres y meses de todas las empresas
+    python report_batch.py --year 2025 --companies afj --source afj=tickets_data.json
+
+Las empresas salen de FRESHDESK_COMPANIES (ver tenants.py) y, por defecto,
+sus tickets del almacén del servidor; --source empresa=archivo acepta
+cualquier fuente de report_sources (.xlsx, .json, .ndjson, .db).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from generate_report import analyze_periods, parse_period, render_report
+from report_sources import SourceError, open_source
+from tenants import load_companies, store_file_for
+
+OUTPUT_DIR = 'informes'
+
+
+def parse_job(text):
+    """'empresa:período' -> (empresa, período); sin período = todo el histórico"""
+    slug, _, period = text.partition(':')
+    return slug.strip(), parse_period(period)
+
+
+def year_jobs(year, slugs):
+    """Año completo, sus cuatro trimestres y sus doce meses para cada empresa"""
+    periods = [str(year)] + [f"{year}-Q{q}" for q in range(1, 5)] + \
+        [f"{year}-{m:02d}" for m in range(1, 13)]
+    return [(slug, period) for slug in slugs for period in periods]
+
+
+def output_name(slug, period):
+    return f"Informe_Soporte_Tecnico_{slug}_{period or 'historico'}.pdf"
+
+
+def aggregate_company(slug, source, periods):
+    """Se ejecuta en un worker: una pasada sobre la fuente para todos los períodos"""
+    start = time.perf_counter()
+    data = analyze_periods(open_source(source), periods)
+    return slug, data, time.perf_counter() - start
+
+
+def build_pdf(filename, company, period, data):
+    """Se ejecuta en un worker: construye un PDF y devuelve su duración"""
+    start = time.perf_counter()
+    render_report(data, filename, company, period)
+    return time.perf_counter() - start, os.getpid()
+
+
+def run_batch(jobs, companies, sources, output_dir=OUTPUT_DIR, workers=None):
+    """
+    Ejecuta los trabajos (empresa, período) y devuelve una lista de
+    resultados con los tiempos de cada uno. Los períodos sin tickets no
+    generan PDF (el informe divide por el total).
+    """
+    names = {c['slug']: c.get('name') or c['slug'] for c in companies}
+    periods = {}
+    for slug, period in jobs:
+        periods.setdefault(slug, set()).add(period)
+
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # 1. Agregación: una tarea por empresa (cada fuente se lee una vez)
+        start = time.perf_counter()
+        futures = [pool.submit(aggregate_company, slug, sources[slug], sorted(p, key=str))
+                   for slug, p in periods.items()]
+        aggregated = {}
+        for future in as_completed(futures):
+            slug, data, seconds = future.result()
+            aggregated[slug] = data
+            print(f"📁 {slug}: {len(data)} períodos agregados en {seconds:.2f}s")
+        aggregate_seconds = time.perf_counter() - start
+
+        # 2. PDFs en paralelo
+        start = time.perf_counter()
+        futures = {}
+        for slug, period in jobs:
+            data = aggregated[slug][period]
+            job = {'company': slug, 'period': period, 'tickets': data['total_tickets']}
+            if not data['total_tickets']:
+                results.append({**job, 'file': None, 'seconds': 0.0})
+                print(f"   {slug:<12} {period or 'histórico':<10} sin tickets, se omite")
+                continue
+            job['file'] = os.path.join(output_dir, output_name(slug, period))
+            futures[pool.submit(build_pdf, job['file'], names[slug], period, data)] = job
+
+        for future in as_completed(futures):
+            job = futures[future]
+            job['seconds'], job['worker'] = future.result()
+            results.append(job)
+            print(f"   {job['company']:<12} {job['period'] or 'histórico':<10} "
+                  f"{job['tickets']:>7} tickets  {job['seconds']:6.2f}s  (pid {job['worker']})")
+        build_seconds = time.perf_counter() - start
+
+    built = [r for r in results if r['file']]
+    total = sum(r['seconds'] for r in built)
+    print(f"\n✅ {len(built)} informes en {output_dir}/: agregación {aggregate_seconds:.2f}s, "
+          f"PDFs {build_seconds:.2f}s (suma de trabajos {total:.2f}s, "
+          f"x{total / build_seconds if build_seconds else 0:.1f} con {workers or os.cpu_count()} procesos)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Informes PDF en lote por empresa y período')
+    parser.add_argument('jobs', nargs='*', help='empresa:período (2025, 2025-Q1, 2025-03; sin período = todo)')
+    parser.add_argument('--year', type=int, help='año, trimestres y meses de ese año')
+    parser.add_argument('--companies', help='empresas para --year, separadas por comas (por defecto todas)')
+    parser.add_argument('--source', action='append', default=[], metavar='EMPRESA=ARCHIVO',
+                        help='fuente de tickets de una empresa (por defecto su almacén)')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='carpeta de los PDF')
+    parser.add_argument('--workers', type=int, help='procesos (por defecto, uno por CPU)')
+    args = parser.parse_args()
+
+    companies = load_companies()
+    slugs = [c['slug'] for c in companies]
+    try:
+        jobs = [parse_job(text) for text in args.jobs]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.year:
+        wanted = args.companies.split(',') if args.companies else slugs
+        jobs += year_jobs(args.year, [s.strip() for s in wanted])
+    if not jobs:
+        parser.error('indique trabajos empresa:período o --year')
+
+    unknown = sorted({slug for slug, _ in jobs} - set(slugs))
+    if unknown:
+        parser.error(f"empresas desconocidas: {', '.join(unknown)} (configuradas: {', '.join(slugs)})")
+    # Trabajos repetidos se generan una vez, en el orden dado
+    jobs = list(dict.fromkeys(jobs))
+
+    sources = {slug: store_file_for(slug, n == 0) for n, slug in enumerate(slugs)}
+    for text in args.source:
+        slug, _, path = text.partition('=')
+        if slug not in sources or not path:
+            parser.error(f"--source inválido: {text!r} (use empresa=archivo)")
+        sources[slug] = path
+    for slug in {slug for slug, _ in jobs}:
+        try:
+            open_source(sources[slug]).close()
+        except SourceError as e:
+            print(f"❌ {slug}: {e}")
+            sys.exit(1)
+
+    print(f"📊 {len(jobs)} informes de {len({s for s, _ in jobs})} empresas")
+    print("=" * 60)
+    run_batch(jobs, companies, sources, args.output_dir, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache en disco del informe PDF - AFJ Global
+Cada PDF se guarda con el hash de sus entradas como nombre (contadores
+agregados, empresa, período y formato del informe): mientras los datos no
+cambian se sirve el mismo archivo y, cuando cambian, la clave es otra. Se
+escribe en un temporal y se renombra (os.replace), así que varios workers
+de gunicorn pueden compartir la carpeta.
+
+Los PDF se construyen en un pool de procesos aparte: ReportLab es CPU puro
+y en un hilo del servidor frenaría al resto de peticiones. Las peticiones
+simultáneas por la misma clave esperan a la misma construcción.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from metrics import CACHE_REQUESTS
+
+log = logging.getLogger(__name__)
+
+# Cambia si cambia el contenido del PDF para una misma entrada (invalida el cache)
+REPORT_FORMAT = 1
+
+# PDFs conservados en la carpeta (se borran los usados hace más tiempo)
+MAX_FILES = 200
+
+
+def report_key(data, company, period=None):
+    """Hash de las entradas del informe (mismo dict de analyze_data)"""
+    payload = json.dumps({
+        'format': REPORT_FORMAT,
+        'company': company,
+        'period': period,
+        'data': data
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _build(path, data, company, period, date):
+    """Se ejecuta en el pool: escribe el PDF y retorna la duración"""
+    from generate_report import render_report
+
+    start = time.perf_counter()
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        render_report(data, temporary, company, period, date)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return time.perf_counter() - start
+
+
+class ReportCache:
+    """PDFs por clave de contenido, construidos fuera del hilo de la petición"""
+
+    def __init__(self, directory, workers=1, max_files=MAX_FILES):
+        self.directory = directory
+        self.workers = workers
+        self.max_files = max_files
+        self._executor = None
+        self._pending = {}       # clave -> Future de la construcción en curso
+        self._lock = threading.Lock()
+        self.stats = {'hit': 0, 'miss': 0, 'coalesced': 0, 'errors': 0}
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _submit(self, *args):
+        # 'spawn': el proceso hijo no hereda hilos ni sockets del servidor
+        for _ in range(2):
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            try:
+                return self._executor.submit(_build, *args)
+            except BrokenProcessPool:
+                # Un worker murió (p. ej. por memoria): se crea un pool nuevo
+                self._executor = None
+        raise BrokenProcessPool("No se pudo iniciar el pool de informes")
+
+    def get(self, data, company, period=None, timeout=None):
+        """
+        Ruta del PDF para estas entradas: (clave, ruta, 'hit'|'miss'|'coalesced').
+        Si la construcción tarda más de `timeout` lanza TimeoutError (sigue en
+        curso y la siguiente petición la reutiliza); los errores de ReportLab
+        se propagan.
+        """
+        key = report_key(data, company, period)
+        path = self.path_for(key)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                self.stats['hit'] += 1
+                CACHE_REQUESTS.inc(cache='report', result='hit')
+                return key, path, 'hit'
+            future = self._pending.get(key)
+            status = 'coalesced' if future is not None else 'miss'
+            if future is None:
+                os.makedirs(self.directory, exist_ok=True)
+                future = self._submit(path, data, company, period,
+                                      datetime.now().strftime('%d de %B de %Y'))
+                self._pending[key] = future
+            self.stats[status] += 1
+        CACHE_REQUESTS.inc(cache='report', result=status)
+        if status == 'miss':
+            future.add_done_callback(lambda f: self._finished(key, f))
+
+        future.result(timeout)
+        return key, path, status
+
+    def _finished(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+        if future.exception() is not None:
+            self.stats['errors'] += 1
+            log.error("Error generando informe PDF", extra={'key': key[:12], 'error': str(future.exception())})
+            return
+        log.info("Informe PDF generado", extra={'key': key[:12], 'seconds': future.result()})
+        self._prune()
+
+    def _prune(self):
+        """Deja como mucho `max_files` PDFs en la carpeta"""
+        try:
+            files = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pdf')]
+            if len(files) <= self.max_files:
+                return
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in files[:len(files) - self.max_files]:
+                os.remove(entry.path)
+        except OSError as e:
+            log.warning("No se pudo limpiar la carpeta de informes",
+                        extra={'directory': self.directory, 'error': str(e)})
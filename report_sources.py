@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fuentes de tickets para el informe PDF - AFJ Global
+Cada fuente entrega los tickets de a uno (generador) con los campos del
+Excel exportado: subject, description, priority (Alto/Medio/Bajo), status,
+created_at... El informe los agrega en una sola pasada, así que la memoria
+no depende del número de filas.
+
+- .xlsx: hoja 'Todos los Tickets' en modo solo lectura (openpyxl)
+- .json: tickets_data.json ({"tickets": [...]}) o una lista, leída por trozos
+- .ndjson / .jsonl: un ticket por línea
+- .db: almacén SQLite del servidor (ticket_store.db)
+"""
+
+import json
+import os
+
+EXCEL_SHEET = 'Todos los Tickets'
+
+# Bytes leídos de una vez en las fuentes JSON
+CHUNK_SIZE = 1 << 16
+
+
+class SourceError(ValueError):
+    """Fuente de datos no reconocida o con formato inválido"""
+
+
+def excel_tickets(path, sheet=EXCEL_SHEET):
+    """Filas de la hoja como dicts (la primera fila son los encabezados)"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        for row in rows:
+            yield dict(zip(headers, row))
+    finally:
+        workbook.close()
+
+
+def _read_more(f, buffer):
+    chunk = f.read(CHUNK_SIZE)
+    if not chunk:
+        raise SourceError(f"{f.name}: JSON incompleto")
+    return buffer + chunk
+
+
+def _skip(f, buffer, pos, chars=' \t\r\n'):
+    """Avanza sobre los caracteres indicados, leyendo más si hace falta"""
+    while True:
+        while pos < len(buffer) and buffer[pos] in chars:
+            pos += 1
+        if pos < len(buffer):
+            return buffer, pos
+        buffer, pos = _read_more(f, buffer[pos:]), 0
+
+
+def _decode(f, decoder, buffer, pos):
+    """Un valor JSON desde `pos`; si el buffer lo corta a la mitad, lee más"""
+    while True:
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            buffer, pos = _read_more(f, buffer[pos:]), 0
+            continue
+        if end == len(buffer):
+            # Un número al final del buffer puede seguir en el próximo trozo
+            chunk = f.read(CHUNK_SIZE)
+            if chunk:
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+        return value, buffer, end
+
+
+def _array_items(f, decoder, buffer, pos):
+    """Elementos de la lista que empieza en `pos` (en el '[')"""
+    buffer, pos = _skip(f, buffer, pos + 1)
+    if buffer[pos] == ']':
+        return
+    while True:
+        item, buffer, pos = _decode(f, decoder, buffer, pos)
+        yield item
+        buffer, pos = _skip(f, buffer, pos)
+        if buffer[pos] == ']':
+            return
+        if buffer[pos] != ',':
+            raise SourceError(f"{f.name}: se esperaba ',' en la lista de tickets")
+        buffer, pos = _skip(f, buffer, pos + 1)
+        # Se descarta lo ya leído para no acumular el archivo en memoria
+        buffer, pos = buffer[pos:], 0
+
+
+def json_tickets(path, key='tickets'):
+    """
+    Tickets de un JSON sin cargarlo entero: la lista del objeto raíz bajo
+    `key` (las demás claves se leen completas) o una lista en la raíz.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer, pos = _skip(f, '', 0)
+        if buffer[pos] == '[':
+            yield from _array_items(f, decoder, buffer, pos)
+            return
+        if buffer[pos] != '{':
+            raise SourceError(f"{path}: se esperaba un objeto o una lista")
+
+        buffer, pos = _skip(f, buffer, pos + 1)
+        while buffer[pos] != '}':
+            name, buffer, pos = _decode(f, decoder, buffer, pos)
+            buffer, pos = _skip(f, buffer, pos)
+            buffer, pos = _skip(f, buffer, pos + 1)       # ':'
+            if name == key and buffer[pos] == '[':
+                yield from _array_items(f, decoder, buffer, pos)
+                return
+            _, buffer, pos = _decode(f, decoder, buffer, pos)
+            buffer, pos = _skip(f, buffer, pos, ' \t\r\n,')
+        raise SourceError(f"{path}: no tiene la clave '{key}'")
+
+
+def ndjson_tickets(path):
+    """Un ticket por línea (líneas vacías se ignoran)"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def store_tickets(path):
+    """Tickets del almacén del servidor, con la prioridad como nombre (como el Excel)"""
+    from ticket_store import TicketStore
+
+    for t in TicketStore(path).iter_tickets():
+        yield {**t, 'priority': t.get('priority_name') or t.get('priority')}
+
+
+SOURCES = {
+    '.xlsx': excel_tickets,
+    '.json': json_tickets,
+    '.ndjson': ndjson_tickets,
+    '.jsonl': ndjson_tickets,
+    '.db': store_tickets,
+    '.sqlite': store_tickets
+}
+
+
+def open_source(path):
+    """Generador de tickets según la extensión del archivo"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SOURCES:
+        raise SourceError(f"Fuente no soportada: {path} (use {', '.join(SOURCES)})")
+    if not os.path.exists(path):
+        raise SourceError(f"No existe el archivo: {path}")
+    return SOURCES[extension](path)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de respuestas JSON por versión del snapshot - AFJ Global
+Cada respuesta lleva un ETag derivado de la versión de los datos (con la
+identidad del almacén: si el archivo se pierde las versiones vuelven a
+empezar) y de la consulta; `If-None-Match` se responde con 304 y los cuerpos
+se comprimen (gzip / brotli) una sola vez por snapshot en lugar de en cada
+petición.
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from metrics import CACHE_REQUESTS
+
+try:
+    import brotli  # opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+# Por debajo de este tamaño no compensa comprimir
+MIN_COMPRESS_SIZE = 1024
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class ResponseCache:
+    """
+    Decorador para endpoints GET que dependen solo del snapshot y de la query.
+
+    `get_version` retorna la versión actual de los datos (y asegura que el
+    snapshot esté cargado): cualquier valor hashable, p. ej. (almacén,
+    versión); `get_scope` separa las entradas por origen de datos (la
+    empresa), cada uno con su versión y hasta `max_entries` respuestas;
+    `get_headers` añade cabeceras por petición, como la edad del snapshot,
+    que no forman parte del cuerpo cacheado.
+    """
+
+    def __init__(self, get_version, get_headers=None, get_scope=None, max_entries=256):
+        self.get_version = get_version
+        self.get_headers = get_headers
+        self.get_scope = get_scope
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # scope -> (versión, OrderedDict de entradas)
+        self._scopes = {}
+
+    def _lookup(self, scope, key, version):
+        with self._lock:
+            current = self._scopes.get(scope)
+            if current is None or current[0] != version:
+                # Snapshot nuevo: las respuestas anteriores ya no sirven
+                current = self._scopes[scope] = (version, OrderedDict())
+            entries = current[1]
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+            return entry
+
+    def _store(self, scope, key, entry, version):
+        with self._lock:
+            current = self._scopes.get(scope)
+            if current is None or current[0] != version:
+                # Se publicó otro snapshot mientras se generaba: no se guarda
+                return
+            entries = current[1]
+            entries[key] = entry
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def _encoding_for(self, entry):
+        """Codificación a usar según Accept-Encoding (comprime una vez por entrada)"""
+        if len(entry['body']) < MIN_COMPRESS_SIZE:
+            return None
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            if accepted[encoding]:
+                if encoding not in entry['encoded']:
+                    entry['encoded'][encoding] = _compress(entry['body'], encoding)
+                return encoding
+        return None
+
+    def cached(self, view=None, vary=None):
+        """
+        Decora un endpoint: `@responses.cached`. Si la respuesta depende de
+        algo más que el snapshot y la query, `@responses.cached(vary=f)`:
+        lo que retorne `f` entra en la clave y en el ETag.
+        """
+        if view is None:
+            return lambda view: self.cached(view, vary)
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            scope = self.get_scope() if self.get_scope else None
+            version = self.get_version()
+            key = (request.path, tuple(sorted(request.args.items(multi=True))),
+                   vary() if vary else None)
+            entry = self._lookup(scope, key, version)
+            CACHE_REQUESTS.inc(cache='response', result='miss' if entry is None else 'hit')
+
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                digest = hashlib.sha1(repr((scope, version, key)).encode('utf-8')).hexdigest()
+                entry = {
+                    'etag': digest[:24],
+                    'body': response.get_data(),
+                    'mimetype': response.mimetype,
+                    'encoded': {}
+                }
+                self._store(scope, key, entry, version)
+
+            extra = self.get_headers() if self.get_headers else {}
+
+            if request.if_none_match.contains(entry['etag']):
+                response = Response(status=304)
+            else:
+                encoding = self._encoding_for(entry)
+                body = entry['encoded'][encoding] if encoding else entry['body']
+                response = Response(body, mimetype=entry['mimetype'])
+                if encoding:
+                    response.headers['Content-Encoding'] = encoding
+
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Accept-Encoding')
+            response.headers.update(extra)
+            return response
+
+        return wrapper
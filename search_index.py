@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Búsqueda de texto completo sobre asunto y descripción - AFJ Global
+Índice invertido en memoria: término (minúsculas, sin tildes) -> filas que
+lo contienen y frecuencia en cada una, en arrays compactos ordenados por
+fila. Las consultas expanden cada palabra a los términos que empiezan por
+ella (vocabulario ordenado + bisect), exigen que aparezcan todas y ordenan
+por BM25 (el asunto pesa más que la descripción). Con NumPy el puntaje se
+calcula vectorizado; sin NumPy, con un dict por consulta.
+"""
+
+import heapq
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from classifier import fold, strip_accents
+from recurrence import STOPWORDS
+
+try:
+    import numpy as np
+except ImportError:        # opcional: sin NumPy se puntúa con dicts
+    np = None
+
+TOKENS = re.compile(r'[^\W_]+')
+
+# Palabras más largas se ignoran (hashes, base64 pegado en la descripción)
+MAX_TOKEN = 40
+
+# Una aparición en el asunto cuenta como SUBJECT_WEIGHT en la descripción
+SUBJECT_WEIGHT = 3
+
+# Parámetros de BM25
+K1 = 1.2
+B = 0.75
+
+# Términos a los que se expande cada prefijo como máximo (los más frecuentes)
+MAX_EXPANSIONS = 64
+
+# Los prefijos más cortos solo coinciden con la palabra exacta
+MIN_PREFIX = 2
+
+# Años guardados por fila para filtrar sin tocar el snapshot (0 = sin fecha)
+NO_YEAR = 0
+
+
+def tokenize(text):
+    """Palabras del texto como (término normalizado, inicio, fin) en el texto original"""
+    tokens = []
+    for match in TOKENS.finditer(text or ''):
+        term = fold(match.group())
+        if term and len(term) <= MAX_TOKEN and term not in STOPWORDS:
+            tokens.append((term, match.start(), match.end()))
+    return tokens
+
+
+def term_counts(text, weight=1, counts=None):
+    """
+    Frecuencia (ponderada) de cada término del texto. Equivale a contar
+    `tokenize(text)`, pero sin posiciones: es lo que se usa al indexar.
+    """
+    words = TOKENS.findall((text or '').lower())
+    if text and not text.isascii():
+        words = [word if word.isascii() else strip_accents(word) for word in words]
+    found = Counter(words)
+    counts = {} if counts is None else counts
+    for term, tf in found.items():
+        if term and len(term) <= MAX_TOKEN and term not in STOPWORDS:
+            counts[term] = counts.get(term, 0) + tf * weight
+    return counts
+
+
+def parse_query(query):
+    """Términos distintos de la consulta, en orden"""
+    seen = []
+    for term, _, _ in tokenize(query):
+        if term not in seen:
+            seen.append(term)
+    return seen
+
+
+class SearchIndex:
+    """
+    Índice invertido de un snapshot (TicketColumns).
+
+    Las listas de filas se mantienen ordenadas, así que agregar o quitar un
+    ticket es una búsqueda binaria por término. Para quitar un ticket se
+    vuelve a tokenizar su texto anterior: no se guardan los términos por fila.
+    `copy` da un índice para un snapshot nuevo que comparte las listas con
+    este y copia cada una la primera vez que la modifica.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.postings = {}            # término -> (filas array('I'), frecuencias array('H'))
+        self.lengths = array('I')     # longitud ponderada de cada fila (0 = fuera del índice)
+        self.years = array('H')       # año de creación de cada fila
+        self.documents = 0
+        self.total_length = 0
+        self._lock = threading.Lock()
+        self._shared = set()          # términos cuyas listas son también de otro índice
+        self._build()
+        self.vocabulary = sorted(self.postings)
+
+    def copy(self, columns):
+        """Índice independiente sobre `columns` (una copia de las columnas de este)"""
+        index = SearchIndex.__new__(SearchIndex)
+        index.columns = columns
+        with self._lock:
+            index.postings = dict(self.postings)
+            index.lengths = self.lengths[:]
+            index.years = self.years[:]
+            index.vocabulary = list(self.vocabulary)
+            index.documents = self.documents
+            index.total_length = self.total_length
+        index._lock = threading.Lock()
+        index._shared = set(index.postings)
+        return index
+
+    def _own(self, term):
+        """Listas del término que se pueden modificar (se copian si son compartidas)"""
+        entry = self.postings[term]
+        if term in self._shared:
+            self._shared.discard(term)
+            entry = self.postings[term] = (entry[0][:], entry[1][:])
+        return entry
+
+    def _row_counts(self, i, cache=None):
+        """Términos de la fila `i` (asunto ponderado + descripción)"""
+        columns = self.columns
+        code = columns.subject.codes[i]
+        if cache is not None and code in cache:
+            counts = dict(cache[code])
+        else:
+            counts = term_counts(columns.subject.values[code], SUBJECT_WEIGHT)
+            if cache is not None:
+                cache[code] = dict(counts)
+        return term_counts(columns.description[i], 1, counts)
+
+    def _build(self):
+        # Los asuntos se repiten mucho: se tokeniza cada uno una sola vez
+        subjects = {}
+        postings = self.postings
+        for i in range(len(self.columns)):
+            counts = self._row_counts(i, subjects)
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array('I'), array('H'))
+                entry[0].append(i)
+                entry[1].append(tf if tf < 0xFFFF else 0xFFFF)
+            self._set_length(i, counts)
+
+    def _set_length(self, i, counts):
+        length = sum(counts.values())
+        year = self.columns.year(i)
+        while len(self.lengths) <= i:
+            self.lengths.append(0)
+            self.years.append(NO_YEAR)
+        self.lengths[i] = length
+        self.years[i] = int(year) if year else NO_YEAR
+        self.documents += 1
+        self.total_length += length
+
+    def __len__(self):
+        return self.documents
+
+    # --------------------------------------------------------
+    # Cambios incrementales
+    # --------------------------------------------------------
+
+    def add(self, i):
+        """Indexa la fila `i` con los valores actuales de las columnas"""
+        counts = self._row_counts(i)
+        with self._lock:
+            for term, tf in counts.items():
+                if term not in self.postings:
+                    self.postings[term] = (array('I'), array('H'))
+                    insort(self.vocabulary, term)
+                rows, tfs = self._own(term)
+                position = bisect_left(rows, i)
+                rows.insert(position, i)
+                tfs.insert(position, min(tf, 0xFFFF))
+            self._set_length(i, counts)
+
+    def remove(self, i):
+        """
+        Quita la fila `i` del índice. Debe llamarse antes de sobrescribir la
+        fila en las columnas (se tokeniza el texto que se indexó).
+        """
+        counts = self._row_counts(i)
+        with self._lock:
+            for term in counts:
+                if term not in self.postings:
+                    continue
+                rows, tfs = self._own(term)
+                position = bisect_left(rows, i)
+                if position < len(rows) and rows[position] == i:
+                    del rows[position]
+                    del tfs[position]
+                if not rows:
+                    del self.postings[term]
+                    del self.vocabulary[bisect_left(self.vocabulary, term)]
+            self.documents -= 1
+            self.total_length -= self.lengths[i]
+            self.lengths[i] = 0
+            self.years[i] = NO_YEAR
+
+    # --------------------------------------------------------
+    # Consultas
+    # --------------------------------------------------------
+
+    def expand(self, term):
+        """Términos del vocabulario que empiezan por `term` (los más frecuentes primero)"""
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self.postings else []
+        vocabulary = self.vocabulary
+        start = bisect_left(vocabulary, term)
+        end = bisect_left(vocabulary, term + '\uffff', start)
+        matches = vocabulary[start:end]
+        if len(matches) > MAX_EXPANSIONS:
+            matches.sort(key=lambda t: -len(self.postings[t][0]))
+            matches = matches[:MAX_EXPANSIONS]
+        return matches
+
+    def _idf(self, df):
+        return math.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+
+    def search(self, query, year=None, limit=20, offset=0):
+        """
+        Filas que contienen todas las palabras de la consulta (cada una como
+        prefijo), ordenadas por BM25. Retorna (total, [(fila, puntaje)], palabras).
+        `year` filtra por año de creación ('2025') o por prefijo de fecha ('2025-03').
+        """
+        words = parse_query(query)
+        wanted = None
+        if year and year != 'all':
+            if not year[:4].isdigit():
+                return 0, [], words
+            wanted = int(year[:4])
+
+        with self._lock:
+            expansions = [self.expand(word) for word in words]
+            if not words or not all(expansions):
+                return 0, [], words
+            average = self.total_length / self.documents if self.documents else 1.0
+            score = self._score_numpy if np is not None else self._score_python
+            rows, scores = score(expansions, average, wanted)
+
+        if wanted is not None and len(year) > 4:
+            columns = self.columns
+            if np is not None:
+                rows, scores = list(rows), list(scores)
+            kept = [n for n, i in enumerate(rows)
+                    if (columns.value(i, 'created_at') or '').startswith(year)]
+            rows = [rows[n] for n in kept]
+            scores = [scores[n] for n in kept]
+
+        total, wanted_rows = len(rows), offset + limit
+        if np is not None and isinstance(scores, np.ndarray) and total > wanted_rows:
+            # Solo se ordenan los candidatos a la página pedida (y los empates del corte)
+            cut = np.partition(scores, total - wanted_rows)[total - wanted_rows]
+            keep = scores >= cut
+            rows, scores = rows[keep], scores[keep]
+        if np is not None and isinstance(scores, np.ndarray):
+            rows, scores = rows.tolist(), scores.tolist()
+
+        # Mayor puntaje primero; a igualdad, el ticket más reciente
+        created, ids = self.columns.created, self.columns.ids
+        top = heapq.nlargest(wanted_rows, zip(scores, rows),
+                             key=lambda item: (item[0], created[item[1]], ids[item[1]]))
+        return total, [(i, score) for score, i in top[offset:]], words
+
+    def _term_weights(self, term, average):
+        """idf y constantes de BM25 para un término"""
+        rows, _ = self.postings[term]
+        return self._idf(len(rows)), K1 * (1 - B), K1 * B / average
+
+    def _score_numpy(self, expansions, average, wanted):
+        size = len(self.lengths)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32).astype(np.float64)
+        total = np.zeros(size)
+        if wanted is None:
+            matched = np.ones(size, dtype=bool)
+        else:
+            matched = np.frombuffer(self.years, dtype=np.uint16) == wanted
+
+        for terms in expansions:
+            # Cada palabra puntúa con el mejor de los términos a los que se expande
+            best = np.zeros(size)
+            for term in terms:
+                idf, base, slope = self._term_weights(term, average)
+                rows_view, tfs_view = self.postings[term]
+                rows = np.frombuffer(rows_view, dtype=np.uint32)
+                tf = np.frombuffer(tfs_view, dtype=np.uint16).astype(np.float64)
+                score = idf * tf * (K1 + 1) / (tf + base + slope * lengths[rows])
+                best[rows] = np.maximum(best[rows], score)
+            matched &= best > 0
+            total += best
+
+        rows = np.flatnonzero(matched)
+        return rows, total[rows]
+
+    def _score_python(self, expansions, average, wanted):
+        lengths, years = self.lengths, self.years
+        total = None
+        for terms in expansions:
+            best = {}
+            for term in terms:
+                idf, base, slope = self._term_weights(term, average)
+                rows, tfs = self.postings[term]
+                for i, tf in zip(rows, tfs):
+                    if wanted is not None and years[i] != wanted:
+                        continue
+                    score = idf * tf * (K1 + 1) / (tf + base + slope * lengths[i])
+                    if score > best.get(i, 0):
+                        best[i] = score
+            if total is None:
+                total = best
+            else:
+                total = {i: score + best[i] for i, score in total.items() if i in best}
+            if not total:
+                return [], []
+
+        return list(total), list(total.values())
+
+    def highlights(self, i, words):
+        """Posiciones [inicio, fin) de las palabras buscadas en asunto y descripción"""
+        columns = self.columns
+        result = {}
+        for field, text in (('subject', columns.subject[i]), ('description', columns.description[i])):
+            result[field] = [
+                [start, end] for term, start, end in tokenize(text)
+                if any(term.startswith(word) if len(word) >= MIN_PREFIX else term == word
+                       for word in words)
+            ]
+        return result
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot de tickets servido por la API - AFJ Global
+Agrupa las columnas y todo lo que se deriva de ellas (agregados por año,
+filas por año, vistas ordenadas). Un snapshot publicado no se modifica:
+una versión nueva del almacén se arma aparte y se publica de una sola vez;
+los cambios pequeños (webhooks, sondeos incrementales) se aplican sobre una
+copia actualizando los agregados ticket a ticket.
+"""
+
+from array import array
+from bisect import insort
+
+import threading
+
+from aggregates import Aggregate, add_row, aggregate_rows, build_index
+from search_index import SearchIndex
+from ticket_columns import TicketColumns
+
+CLOSED_STATUSES = (4, 5)
+
+KPI_COUNTS = ('total', 'closed', 'open')
+
+
+class Snapshot:
+    """Columnas + índices derivados de una versión del almacén"""
+
+    def __init__(self, columns, version=None):
+        self.columns = columns
+        self.version = version
+        self.aggregates = build_index(columns)
+        # Filas en orden del snapshot (más recientes primero, como el almacén)
+        self.order = array('I', range(len(columns)))
+        self.by_year = self._group_by_year()
+        self._views = {}
+        self._search = None
+        self._search_lock = threading.Lock()
+
+    @classmethod
+    def from_tickets(cls, tickets, version=None):
+        return cls(TicketColumns.from_tickets(tickets), version)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def _group_by_year(self):
+        """Filas por año de creación, conservando el orden del snapshot"""
+        by_year = {}
+        columns = self.columns
+        for i in self.order:
+            year = columns.year(i)
+            if year:
+                if year not in by_year:
+                    by_year[year] = array('I')
+                by_year[year].append(i)
+        return by_year
+
+    def rows_for_year(self, year):
+        """Filas del año pedido (lista precalculada; año parcial se filtra al vuelo)"""
+        columns = self.columns
+        if not year or year == 'all':
+            return self.order
+        if year in self.by_year:
+            return self.by_year[year]
+        if len(year) == 4:
+            return []
+        return [i for i in self.order
+                if (columns.value(i, 'created_at') or '').startswith(year)]
+
+    def tickets_for_year(self, year, fields=None):
+        """Tickets del año pedido como dicts (solo `fields` si se indica)"""
+        return self.columns.rows(self.rows_for_year(year), fields)
+
+    def sorted_rows(self, year, field):
+        """Filas del año en orden ascendente por `field` (se calcula una vez)"""
+        key = (year or 'all', field)
+        view = self._views.get(key)
+        if view is None:
+            view = array('I', sorted(self.rows_for_year(year), key=self.columns.sort_key(field)))
+            # Los años sin tickets no se guardan: el cache crece solo con años reales
+            if view:
+                self._views[key] = view
+        return view
+
+    def aggregate(self, year):
+        """
+        Agregados del año pedido desde el índice (búsqueda O(1)).
+        Solo se recalcula al vuelo si `year` no es un año completo.
+        """
+        if not year or year == 'all':
+            return self.aggregates['all']
+        if year in self.aggregates:
+            return self.aggregates[year]
+        if len(year) == 4:
+            return Aggregate()
+        return aggregate_rows(self.columns, self.rows_for_year(year))
+
+    @property
+    def has_search_index(self):
+        return self._search is not None
+
+    def search_index(self):
+        """Índice de búsqueda (se construye la primera vez que se pide)"""
+        if self._search is None:
+            with self._search_lock:
+                if self._search is None:
+                    self._search = SearchIndex(self.columns)
+        return self._search
+
+    # --------------------------------------------------------
+    # Cambios
+    # --------------------------------------------------------
+
+    def _snapshot_key(self):
+        """Clave del orden del snapshot: created_at descendente, luego id descendente"""
+        created, ids = self.columns.created, self.columns.ids
+        return lambda i: (-created[i], -ids[i])
+
+    def _writable(self, year, owned):
+        """
+        Agregado de `year` (o 'all') que este snapshot puede modificar, con
+        sus filas por año: los compartidos con el snapshot anterior se copian
+        la primera vez (`owned` son las claves ya copiadas)
+        """
+        if year not in owned:
+            owned.add(year)
+            aggregate = self.aggregates.get(year)
+            self.aggregates[year] = aggregate.copy() if aggregate is not None else Aggregate()
+            if year != 'all':
+                rows = self.by_year.get(year)
+                self.by_year[year] = rows[:] if rows is not None else array('I')
+        return self.aggregates[year]
+
+    def _index_row(self, i, sign, owned):
+        """Suma (o descuenta) la fila `i` en los agregados y en las filas por año"""
+        columns = self.columns
+        add_row(self._writable('all', owned), columns, i, sign=sign)
+        year = columns.year(i)
+        if not year:
+            return
+        add_row(self._writable(year, owned), columns, i, sign=sign)
+
+        if sign > 0:
+            insort(self.by_year[year], i, key=self._snapshot_key())
+        else:
+            self.by_year[year].remove(i)
+
+    def apply(self, tickets, version):
+        """
+        Snapshot nuevo con tickets procesados nuevos o actualizados aplicados
+        sobre una copia de este, que no se modifica (las peticiones en curso
+        lo siguen leyendo; se publica el nuevo de una vez): columnas, orden,
+        filas por año, agregados (se descuenta la versión anterior de cada
+        ticket y se suma la nueva, sin reconstruir el índice; solo se copian
+        los años que cambian) y el índice de búsqueda si ya se construyó.
+        Retorna (snapshot, diff), con el diff en el mismo formato que `diff`.
+        """
+        before = self.aggregate('all').kpis()
+        # Un índice de búsqueda a medio construir espera a que termine
+        with self._search_lock:
+            search = self._search
+
+        snapshot = Snapshot.__new__(Snapshot)
+        columns = snapshot.columns = self.columns.copy()
+        snapshot.version = version
+        snapshot.aggregates = dict(self.aggregates)
+        snapshot.order = self.order[:]
+        snapshot.by_year = dict(self.by_year)
+        snapshot._views = {}
+        snapshot._search = search = search.copy(columns) if search is not None else None
+        snapshot._search_lock = threading.Lock()
+
+        new, updated, closed = [], [], []
+        years, owned = set(), set()
+        for t in tickets:
+            i = columns.positions.get(t['id'])
+            if i is None:
+                i = columns.append(t)
+                new.append(t['id'])
+            else:
+                was_closed = columns.status[i] in CLOSED_STATUSES
+                years.add(columns.year(i))
+                snapshot._index_row(i, -1, owned)
+                snapshot.order.remove(i)
+                if search is not None:
+                    search.remove(i)
+                columns.replace(i, t)
+                updated.append(t['id'])
+                if columns.status[i] in CLOSED_STATUSES and not was_closed:
+                    closed.append(t['id'])
+            insort(snapshot.order, i, key=snapshot._snapshot_key())
+            years.add(columns.year(i))
+            snapshot._index_row(i, 1, owned)
+            if search is not None:
+                search.add(i)
+
+        diff = snapshot._diff_payload(self.version, before, new, updated, closed, [], years)
+        return snapshot, diff
+
+    def diff(self, previous):
+        """
+        Cambios respecto a un snapshot anterior: ids nuevos, actualizados,
+        cerrados (pasaron a Resuelto/Cerrado) y eliminados, años afectados y
+        variación de los KPIs globales.
+        """
+        columns, old = self.columns, previous.columns
+        old_positions = old.positions
+        new, updated, closed = [], [], []
+        years = set()
+
+        for i, ticket_id in enumerate(columns.ids):
+            j = old_positions.get(ticket_id)
+            if j is None:
+                new.append(ticket_id)
+                years.add(columns.year(i))
+                continue
+            if columns.updated[i] == old.updated[j] and columns.status[i] == old.status[j] \
+                    and columns.priority[i] == old.priority[j]:
+                continue
+            updated.append(ticket_id)
+            years.update((columns.year(i), old.year(j)))
+            if columns.status[i] in CLOSED_STATUSES and old.status[j] not in CLOSED_STATUSES:
+                closed.append(ticket_id)
+
+        removed = []
+        if len(old) + len(new) != len(columns):
+            positions = columns.positions
+            removed = [ticket_id for ticket_id in old.ids if ticket_id not in positions]
+            years.update(old.year(old_positions[ticket_id]) for ticket_id in removed)
+
+        return self._diff_payload(previous.version, previous.aggregate('all').kpis(),
+                                  new, updated, closed, removed, years)
+
+    def _diff_payload(self, previous_version, before, new, updated, closed, removed, years):
+        after = self.aggregate('all').kpis()
+        return {
+            'version': self.version,
+            'previous_version': previous_version,
+            'new': new,
+            'updated': updated,
+            'closed': closed,
+            'removed': removed,
+            'years': sorted(year for year in years if year),
+            'kpis_delta': kpis_delta(before, after),
+            'kpis': after
+        }
+
+
+def kpis_delta(before, after):
+    """Variación de los conteos de KPIs (totales y por prioridad)"""
+    delta = {key: after[key] - before[key] for key in KPI_COUNTS}
+    delta['by_priority'] = {
+        level: after['by_priority'][level] - before['by_priority'][level]
+        for level in after['by_priority']
+    }
+    return delta
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Snapshot binario mapeado en memoria - AFJ Global
+El mismo contenido que TicketColumns, tal cual está en memoria: columnas de
+ancho fijo para los números (id, estado, prioridad, fechas en segundos
+epoch) y, por cada columna de texto, sus códigos más una tabla de textos
+(offsets + UTF-8). Abrirlo es un mmap y leer la cabecera: las columnas son
+memoryviews sobre el archivo, los textos se decodifican al pedirlos y las
+páginas las comparte el sistema operativo entre todos los procesos que
+abren el mismo archivo (workers de gunicorn, reinicios).
+
+Estructura (little-endian, secciones alineadas a 8 bytes):
+
+    cabecera   magic, formato, filas, nº de secciones, largo de meta
+    meta       JSON: version, synced_at, high_water_mark, store_id...
+    secciones  por cada una: nombre, typecode, compresión, código del
+               valor nulo (tablas de texto), offset, bytes en disco, bytes
+    datos      ids (q), status (h), priority (b), created/updated (q) y
+               <columna>.codes (I) / .offsets (Q) / .data (UTF-8) para
+               subject, description, requester y tags
+
+Las descripciones (la parte más grande) pueden ir comprimidas con zstd
+(`pip install zstandard`) o zlib; entonces se descomprimen en memoria del
+proceso la primera vez que se lee una. Sin compresión todo queda mapeado.
+
+Las columnas mapeadas son de solo lectura: un cambio (webhook, sondeo
+incremental) publica un snapshot nuevo sobre una copia en arrays y listas
+normales.
+
+Conversión desde y hacia JSON:
+    python snapshot_binary.py snapshots/afj.json snapshots/afj.snap [--compress zstd|zlib|none]
+    python snapshot_binary.py snapshots/afj.snap afj.json
+    python snapshot_binary.py tickets_data.json semilla.snap
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+
+from report_sources import SourceError, open_source
+from snapshot_file import SNAPSHOT_FORMAT, write_snapshot
+from ticket_columns import PRIORITY_NAMES, StringColumn, TicketColumns, copy_array
+
+try:
+    import zstandard  # opcional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'AFJSNAP\0'
+
+# Cambia si cambia la estructura del archivo (los anteriores se ignoran)
+BINARY_FORMAT = 1
+
+HEADER = struct.Struct('<8sIQII')              # magic, formato, filas, secciones, largo de meta
+SECTION = struct.Struct('<32scBxxIQQQ')        # nombre, typecode, compresión, nulo, offset, bytes, bytes sin comprimir
+ALIGNMENT = 8
+
+CODECS = {'none': 0, 'zlib': 1, 'zstd': 2}
+DEFAULT_COMPRESSION = 'zstd' if zstandard is not None else 'none'
+# Errores de descompresión de cada códec (zstd solo si está instalado)
+DECOMPRESS_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+# Código "sin valor nulo" en las tablas de texto
+NO_NULL = 0xFFFFFFFF
+
+# Separador de los tags de un ticket en su tabla de texto
+TAG_SEPARATOR = '\x1f'
+
+NUMERIC_COLUMNS = (('ids', 'q'), ('status', 'h'), ('priority', 'b'), ('created', 'q'), ('updated', 'q'))
+STRING_COLUMNS = ('subject', 'description', 'requester', 'tags')
+
+PRIORITY_CODES = {name: code for code, name in PRIORITY_NAMES.items()}
+
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+class SnapshotFormatError(ValueError):
+    """Snapshot binario truncado o con una estructura que no es la esperada"""
+
+
+def binary_path(directory, slug):
+    return os.path.join(directory, f"{slug}.snap")
+
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("La compresión zstd requiere el paquete zstandard")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, 6)
+    return data
+
+
+def _decompress(data, codec, size):
+    """Descomprime una sección; SnapshotFormatError si está dañada o no mide `size`"""
+    try:
+        if codec == CODECS['zstd']:
+            if zstandard is None:
+                raise ValueError("El snapshot tiene descripciones zstd y falta el paquete zstandard")
+            data = zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+        elif codec == CODECS['zlib']:
+            data = zlib.decompress(data)
+    except DECOMPRESS_ERRORS as e:
+        raise SnapshotFormatError(f"sección comprimida dañada: {e}")
+    if len(data) != size:
+        raise SnapshotFormatError("sección comprimida de tamaño inesperado")
+    return data
+
+
+# ============================================================
+# COLUMNAS SOBRE EL ARCHIVO MAPEADO
+# ============================================================
+
+def _swapped(data, typecode):
+    """Columna little-endian copiada y convertida al orden de bytes de la máquina"""
+    column = array(typecode)
+    column.frombytes(data)
+    column.byteswap()
+    return column
+
+
+class StringTable:
+    """
+    Valores de una columna de texto leídos del archivo: se decodifican al
+    pedirlos y se guardan. Recorrer la tabla entera (agregados por asunto,
+    índice de búsqueda) la decodifica de una vez en una lista.
+    """
+
+    def __init__(self, offsets, data, null=NO_NULL, tuples=False):
+        self.offsets = offsets
+        self.null = null
+        self.tuples = tuples
+        # `data` es la vista del archivo o, si va comprimida, una función que la descomprime
+        self._data = data if not callable(data) else None
+        self._load = data if callable(data) else None
+        self._lock = threading.Lock()
+        self._decoded = {}
+        self._values = None
+
+    def _blob(self):
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+        return self._data
+
+    def _decode(self, blob, code):
+        if code == self.null:
+            return None
+        text = str(blob[self.offsets[code]:self.offsets[code + 1]], 'utf-8')
+        if self.tuples:
+            return tuple(text.split(TAG_SEPARATOR)) if text else ()
+        return text
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code):
+        if self._values is not None:
+            return self._values[code]
+        try:
+            return self._decoded[code]
+        except KeyError:
+            pass
+        if code < 0:
+            return self[code + len(self)]
+        value = self._decoded[code] = self._decode(self._blob(), code)
+        return value
+
+    def __iter__(self):
+        if self._values is None:
+            blob = self._blob()
+            self._values = [self._decode(blob, code) for code in range(len(self))]
+        return iter(self._values)
+
+
+class MappedStringColumn(StringColumn):
+    """StringColumn de solo lectura sobre el archivo; `copy` da una modificable"""
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def copy(self):
+        column = StringColumn()
+        column.codes = copy_array(self.codes, 'I')
+        column.values = list(self.values)
+        column._lookup = {value: code for code, value in enumerate(column.values)}
+        return column
+
+
+class MappedColumns(TicketColumns):
+    """
+    TicketColumns de solo lectura sobre un snapshot binario mapeado: las
+    lecturas van directo al archivo y los cambios se hacen sobre `copy()`,
+    que copia las columnas a memoria propia.
+    El índice id -> fila se arma la primera vez que se usa.
+    """
+
+    def __init__(self, buffer, numeric, strings):
+        self._buffer = buffer
+        for name, view in numeric.items():
+            setattr(self, name, view)
+        for name, column in strings.items():
+            setattr(self, name, column)
+        self._positions = None
+
+    @property
+    def positions(self):
+        if self._positions is None:
+            self._positions = dict(zip(self.ids, range(len(self.ids))))
+        return self._positions
+
+
+# ============================================================
+# ESCRITURA
+# ============================================================
+
+def _pack(values, typecode):
+    """Bytes little-endian de una columna numérica (array, memoryview o lista)"""
+    if isinstance(values, memoryview) and LITTLE_ENDIAN:
+        return values.tobytes()
+    packed = array(typecode, values)
+    if not LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _string_table(values, tuples=False):
+    """(offsets, datos UTF-8, código del valor nulo) de la tabla de una columna de texto"""
+    offsets = array('Q', [0])
+    chunks = []
+    total = 0
+    null = NO_NULL
+    for code, value in enumerate(values):
+        if value is None:
+            null = code
+            encoded = b''
+        else:
+            encoded = (TAG_SEPARATOR.join(value) if tuples else str(value)).encode('utf-8')
+        total += len(encoded)
+        offsets.append(total)
+        chunks.append(encoded)
+    return offsets, b''.join(chunks), null
+
+
+def pack_columns(columns, order=None):
+    """
+    Secciones del archivo (nombre, typecode, datos, código nulo) con el
+    contenido actual de las columnas. `order` son las filas en el orden del
+    snapshot (Snapshot.order): tras cambios incrementales no coincide con el
+    de las columnas, y el archivo guarda las filas en ese orden, que es el
+    que tendrán al mapearlo. Solo copia y codifica; comprimir y escribir va
+    aparte.
+    """
+    if order is not None and order == array('I', range(len(order))):
+        order = None
+
+    def rows(values, typecode):
+        return values if order is None else array(typecode, (values[i] for i in order))
+
+    sections = [(name, typecode, _pack(rows(getattr(columns, name), typecode), typecode), NO_NULL)
+                for name, typecode in NUMERIC_COLUMNS]
+    for name in STRING_COLUMNS:
+        column = getattr(columns, name)
+        offsets, data, null = _string_table(column.values, tuples=name == 'tags')
+        sections.append((f"{name}.codes", 'I', _pack(rows(column.codes, 'I'), 'I'), NO_NULL))
+        sections.append((f"{name}.offsets", 'Q', _pack(offsets, 'Q'), null))
+        sections.append((f"{name}.data", 'B', data, NO_NULL))
+    return sections
+
+
+def _padding(offset):
+    return -offset % ALIGNMENT
+
+
+def write_binary(path, meta, sections, compression=DEFAULT_COMPRESSION):
+    """
+    Escribe el snapshot de forma atómica (temporal + fsync + os.replace).
+    `sections` sale de `pack_columns`; `compression` (none, zlib, zstd) se
+    aplica a la tabla de descripciones. Retorna el tamaño del archivo.
+    """
+    if compression not in CODECS:
+        raise ValueError(f"Compresión desconocida: {compression} (use {', '.join(CODECS)})")
+    rows = len(sections[0][2]) // 8
+    meta_bytes = json.dumps({'format': BINARY_FORMAT, **meta}, ensure_ascii=False).encode('utf-8')
+
+    stored = []
+    for name, typecode, data, null in sections:
+        codec = compression if name == 'description.data' else 'none'
+        stored.append((name, typecode, CODECS[codec], null, _compress(data, codec), len(data)))
+
+    offset = HEADER.size + len(meta_bytes) + SECTION.size * len(stored)
+    table = []
+    for name, typecode, codec, null, data, size in stored:
+        offset += _padding(offset)
+        table.append(SECTION.pack(name.encode('ascii'), typecode.encode('ascii'), codec, null,
+                                  offset, len(data), size))
+        offset += len(data)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, BINARY_FORMAT, rows, len(stored), len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(b''.join(table))
+            for _, _, _, _, data, _ in stored:
+                f.write(b'\0' * _padding(f.tell()))
+                f.write(data)
+            size = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return size
+
+
+# ============================================================
+# LECTURA
+# ============================================================
+
+def _check_bounds(buffer, start, length, what):
+    """Que [start, start + length) esté dentro del archivo"""
+    if start + length > len(buffer):
+        raise SnapshotFormatError(f"archivo truncado ({what})")
+
+
+def _sections(buffer):
+    """meta y {nombre: (typecode, compresión, nulo, vista, bytes sin comprimir)} validando la estructura"""
+    _check_bounds(buffer, 0, HEADER.size, 'cabecera')
+    magic, version, rows, count, meta_length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise SnapshotFormatError("no es un snapshot binario")
+    if version != BINARY_FORMAT:
+        raise SnapshotFormatError(f"formato {version}, se esperaba {BINARY_FORMAT}")
+
+    offset = HEADER.size
+    _check_bounds(buffer, offset, meta_length, 'meta')
+    try:
+        meta = json.loads(bytes(buffer[offset:offset + meta_length]))
+    except ValueError as e:
+        raise SnapshotFormatError(f"meta inválida: {e}")
+    if not isinstance(meta, dict):
+        raise SnapshotFormatError("meta inválida")
+    offset += meta_length
+    _check_bounds(buffer, offset, count * SECTION.size, 'tabla de secciones')
+    view = memoryview(buffer)
+    sections = {}
+    for n in range(count):
+        name, typecode, codec, null, start, length, size = SECTION.unpack_from(buffer, offset + n * SECTION.size)
+        try:
+            name, typecode = name.rstrip(b'\0').decode('ascii'), typecode.decode('ascii')
+        except UnicodeDecodeError:
+            raise SnapshotFormatError("tabla de secciones inválida")
+        _check_bounds(buffer, start, length, name)
+        sections[name] = (typecode, codec, null, view[start:start + length], size)
+    return rows, meta, sections
+
+
+def _section(sections, name):
+    try:
+        return sections[name]
+    except KeyError:
+        raise SnapshotFormatError(f"falta la sección {name}")
+
+
+def _numeric(sections, name, typecode, rows):
+    found, _, _, data, _ = _section(sections, name)
+    if found != typecode or len(data) != rows * array(typecode).itemsize:
+        raise SnapshotFormatError(f"columna {name} inválida")
+    return data.cast(typecode) if LITTLE_ENDIAN else _swapped(data, typecode)
+
+
+def _string_column(sections, name, rows):
+    codes = _numeric(sections, f"{name}.codes", 'I', rows)
+    found, _, null, offsets, _ = _section(sections, f"{name}.offsets")
+    if found != 'Q' or len(offsets) % 8:
+        raise SnapshotFormatError(f"tabla de textos {name} inválida")
+    offsets = offsets.cast('Q') if LITTLE_ENDIAN else _swapped(offsets, 'Q')
+    _, codec, _, data, size = _section(sections, f"{name}.data")
+    if not offsets or offsets[-1] != size or (codec == CODECS['none'] and len(data) != size):
+        raise SnapshotFormatError(f"tabla de textos {name} inválida")
+    if codec != CODECS['none']:
+        if codec not in CODECS.values():
+            raise SnapshotFormatError(f"compresión desconocida en {name}")
+        if codec == CODECS['zstd'] and zstandard is None:
+            raise ValueError("El snapshot tiene descripciones zstd y falta el paquete zstandard")
+        compressed = data
+        data = lambda: _decompress(compressed, codec, size)  # noqa: E731
+    return MappedStringColumn(codes, StringTable(offsets, data, null, tuples=name == 'tags'))
+
+
+def map_columns(buffer):
+    """(meta, MappedColumns) de un snapshot binario en memoria o mapeado"""
+    rows, meta, sections = _sections(buffer)
+    numeric = {name: _numeric(sections, name, typecode, rows) for name, typecode in NUMERIC_COLUMNS}
+    strings = {name: _string_column(sections, name, rows) for name in STRING_COLUMNS}
+    return meta, MappedColumns(buffer, numeric, strings)
+
+
+def open_binary(path):
+    """
+    Snapshot binario mapeado como dict (format, version, synced_at,
+    high_water_mark, store_id..., columns); None si no hay o no sirve.
+    No lee los datos: solo la cabecera y la tabla de secciones.
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # ValueError: archivo vacío (no se puede mapear)
+        log.warning("Snapshot binario ilegible, se ignora", extra={'file': path, 'error': str(e)})
+        return None
+    try:
+        meta, columns = map_columns(buffer)
+    except ValueError as e:
+        # SnapshotFormatError (truncado, dañado) o falta zstandard
+        log.warning("Snapshot binario inválido, se ignora", extra={'file': path, 'error': str(e)})
+        return None
+    return {**meta, 'columns': columns}
+
+
+# ============================================================
+# CONVERSIÓN DESDE Y HACIA JSON
+# ============================================================
+
+def _processed(t):
+    """
+    Ticket con el formato del visor: los del snapshot JSON ya lo tienen; los
+    de tickets_data.json (formato del informe) traen la prioridad por nombre
+    y los tags como texto.
+    """
+    priority = t.get('priority')
+    tags = t.get('tags')
+    if isinstance(priority, str) or isinstance(tags, str):
+        t = dict(t)
+        if isinstance(priority, str):
+            t['priority'] = PRIORITY_CODES.get(priority, 1)
+        if isinstance(tags, str):
+            t['tags'] = [tag.strip() for tag in tags.split(',') if tag.strip()]
+    return t
+
+
+def json_to_binary(source, target, compression=DEFAULT_COMPRESSION):
+    """
+    Convierte un snapshot JSON (snapshot_file.py), tickets_data.json o un
+    .ndjson de tickets (p. ej. /api/tickets/export) al formato binario,
+    conservando el orden de los tickets. Retorna el número de tickets.
+    """
+    meta = {}
+    if source.lower().endswith('.json'):
+        with open(source, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            if data.get('format') not in (None, SNAPSHOT_FORMAT):
+                raise SourceError(f"{source}: snapshot JSON de formato {data.get('format')}")
+            meta = {key: data[key] for key in ('version', 'synced_at', 'high_water_mark') if key in data}
+            tickets = data.get('tickets') or []
+        else:
+            tickets = data
+    else:
+        tickets = open_source(source)
+    columns = TicketColumns.from_tickets(_processed(t) for t in tickets)
+    write_binary(target, {**meta, 'count': len(columns)}, pack_columns(columns), compression)
+    return len(columns)
+
+
+def binary_to_json(source, target):
+    """Convierte un snapshot binario al snapshot JSON de snapshot_file.py; retorna el número de tickets"""
+    saved = open_binary(source)
+    if saved is None:
+        raise SourceError(f"{source}: no es un snapshot binario válido")
+    meta = {key: saved.get(key) for key in ('version', 'synced_at', 'high_water_mark')}
+    return write_snapshot(target, meta, iter(saved['columns']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte snapshots entre JSON y el formato binario (.snap)")
+    parser.add_argument('source', help="snapshot .json/.ndjson o .snap")
+    parser.add_argument('target', help="archivo de salida (.snap para binario, .json para JSON)")
+    parser.add_argument('--compress', choices=sorted(CODECS), default=DEFAULT_COMPRESSION,
+                        help=f"compresión de las descripciones (por defecto {DEFAULT_COMPRESSION})")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        if args.target.lower().endswith('.snap'):
+            count = json_to_binary(args.source, args.target, args.compress)
+        else:
+            count = binary_to_json(args.source, args.target)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"{count} tickets -> {args.target} ({os.path.getsize(args.target)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
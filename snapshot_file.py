@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copia en disco del último snapshot sincronizado (JSON) - AFJ Global
+Los tickets procesados de la empresa con su versión y marca de agua
+(temporal + fsync + os.replace: un lector nunca ve un archivo a medias).
+El servidor guarda ahora el formato binario (snapshot_binary.py); este JSON
+es el formato de intercambio de sus conversores y, al arrancar con el
+almacén vacío, se sigue leyendo SNAPSHOT_DIR/<empresa>.json si no hay copia
+binaria. Si no hay ninguna, se usa la semilla incluida en el repositorio
+(tickets_data.json, formato del informe), para servir la primera petición
+al momento mientras la actualización en segundo plano se pone al día.
+"""
+
+import json
+import logging
+import os
+
+from report_sources import SourceError, open_source
+
+log = logging.getLogger(__name__)
+
+# Cambia si cambia la estructura del archivo (los anteriores se ignoran)
+SNAPSHOT_FORMAT = 1
+
+
+def snapshot_path(directory, slug):
+    return os.path.join(directory, f"{slug}.json")
+
+
+def write_snapshot(path, meta, tickets):
+    """
+    Escribe el snapshot de forma atómica. `meta` lleva version, synced_at y
+    high_water_mark; `tickets` puede ser un iterador (se escribe de a uno).
+    Retorna el número de tickets escritos.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    count = 0
+    try:
+        with open(temporary, 'w', encoding='utf-8') as f:
+            header = {'format': SNAPSHOT_FORMAT, **meta}
+            f.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "tickets": [\n')
+            for ticket in tickets:
+                if count:
+                    f.write(',\n')
+                f.write(json.dumps(ticket, ensure_ascii=False, sort_keys=True))
+                count += 1
+            f.write('\n]}\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return count
+
+
+def read_snapshot(path):
+    """Snapshot guardado como dict (format, version, synced_at, high_water_mark, tickets); None si no hay o no sirve"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning("Snapshot en disco ilegible, se ignora", extra={'file': path, 'error': str(e)})
+        return None
+    if not isinstance(data, dict) or data.get('format') != SNAPSHOT_FORMAT:
+        log.warning("Snapshot en disco de otro formato, se ignora", extra={'file': path})
+        return None
+    return data
+
+
+def seed_tickets(path, company_id):
+    """
+    Tickets crudos (formato de la API) de la semilla con formato del informe
+    (tickets_data.json) para la empresa indicada. La criticidad guardada en
+    la semilla no se usa: hay que clasificarlos como los de Freshdesk.
+    """
+    seeds = []
+    try:
+        source = open_source(path)
+        for t in source:
+            if t.get('company_id') is not None and str(t['company_id']) != str(company_id):
+                continue
+            tags = t.get('tags') or []
+            if isinstance(tags, str):
+                tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
+            raw = {
+                'id': t['id'],
+                'subject': t.get('subject'),
+                'description_text': t.get('description') or '',
+                'status': t.get('status'),
+                'created_at': t.get('created_at'),
+                'updated_at': t.get('updated_at'),
+                'tags': tags
+            }
+            seeds.append(raw)
+    except SourceError as e:
+        log.warning("Semilla no disponible", extra={'file': path, 'error': str(e)})
+        return []
+    return seeds
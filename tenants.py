@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Empresas (clientes) servidas por el servidor - AFJ Global
+Cada empresa tiene su almacén SQLite, su snapshot en memoria con sus
+agregados, sus clusters de recurrencia y sus clientes SSE. La lista se lee
+del JSON indicado en FRESHDESK_COMPANIES:
+
+    [{"slug": "afj", "company_id": 63000424434, "name": "AFJ Global"},
+     {"slug": "acme", "company_id": 63000000001, "name": "ACME"}]
+
+Sin archivo se sirve solo AFJ Global, con el almacén de siempre. La primera
+empresa de la lista es la de las rutas sin empresa (/api/kpis...).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from recurrence import SubjectClusters
+from ticket_store import TicketStore, STORE_FILE
+
+DEFAULT_COMPANIES = [{"slug": "afj", "company_id": 63000424434, "name": "AFJ Global"}]
+
+# Segundos desde la última petición durante los que una empresa cuenta como vista
+ACTIVE_SECONDS = 120
+
+SLUG = re.compile(r'^[a-z0-9][a-z0-9-]*$')
+
+# Primer segmento de las rutas /api/... existentes: no pueden ser slugs
+RESERVED = {
+    'tickets', 'search', 'kpis', 'recurrence', 'trends', 'dashboard', 'events',
+    'webhooks', 'refresh', 'companies'
+}
+
+
+class Tenant:
+    """Estado de una empresa en este worker"""
+
+    def __init__(self, slug, company_id, name, store_file):
+        self.slug = slug
+        self.company_id = int(company_id)
+        self.name = name
+        self.store = TicketStore(store_file)
+
+        # Copia local del snapshot compartido (una por worker)
+        self.cache = {
+            'data': None,        # Snapshot publicado (columnas + índices)
+            'version': None,     # versión del almacén cargada en 'data'
+            'timestamp': None,   # última sincronización correcta (compartida entre workers)
+            'last_attempt': 0,   # último intento de actualización de este worker
+            'ttl': int(os.environ.get("CACHE_TTL", 300))  # 5 minutos (con webhooks puede ser de horas)
+        }
+        # Solo una actualización del snapshot en curso por empresa y proceso
+        self.refresh_lock = threading.Lock()
+        # Una sola recarga del snapshot a la vez (y un solo diff publicado por versión)
+        self.snapshot_lock = threading.Lock()
+        # Copia en disco del snapshot (snapshot_file.py): una escritura a la vez
+        self.save_lock = threading.Lock()
+        self.saved_version = None
+
+        self.clusters = SubjectClusters()
+        self.broker = None       # EventBroker de /api/<empresa>/events (lo crea el servidor)
+        self.last_seen = 0.0
+
+    def touch(self):
+        self.last_seen = time.time()
+
+    def is_active(self):
+        """Alguien mira el visor: clientes SSE conectados o peticiones recientes"""
+        return bool(self.broker and len(self.broker)) or \
+            time.time() - self.last_seen < ACTIVE_SECONDS
+
+
+def store_file_for(slug, first):
+    """La primera empresa usa TICKET_STORE_FILE; las demás, un archivo con su slug"""
+    if first:
+        return STORE_FILE
+    root, ext = os.path.splitext(STORE_FILE)
+    return f"{root}_{slug}{ext or '.db'}"
+
+
+def load_companies(path=None):
+    """Configuración de empresas (lista de dicts) validada"""
+    path = path or os.environ.get("FRESHDESK_COMPANIES")
+    if not path:
+        return DEFAULT_COMPANIES
+    with open(path, encoding='utf-8') as f:
+        companies = json.load(f)
+
+    if not companies:
+        raise ValueError(f"{path}: la lista de empresas está vacía")
+    seen = set()
+    for company in companies:
+        slug = company.get('slug', '')
+        if not SLUG.match(slug) or slug in RESERVED:
+            raise ValueError(f"{path}: slug inválido: {slug!r}")
+        if slug in seen:
+            raise ValueError(f"{path}: slug repetido: {slug}")
+        if not str(company.get('company_id', '')).isdigit():
+            raise ValueError(f"{path}: company_id inválido en {slug}")
+        seen.add(slug)
+    return companies
+
+
+def build_tenants(companies):
+    """slug -> Tenant, en el orden de la configuración"""
+    return {
+        company['slug']: Tenant(company['slug'], company['company_id'],
+                                company.get('name') or company['slug'],
+                                store_file_for(company['slug'], n == 0))
+        for n, company in enumerate(companies)
+    }
@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Los módulos del proyecto están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Almacén temporal y Freshdesk inaccesible; se fija antes de que los tests
+# importen ticket_store, que lee TICKET_STORE_FILE al importarse
+DIRECTORY = tempfile.mkdtemp()
+os.environ.update(
+    TICKET_STORE_FILE=os.path.join(DIRECTORY, 'tickets.db'), SNAPSHOT_DIR=DIRECTORY,
+    SNAPSHOT_SEED='', FRESHDESK_WEBHOOK_SECRET='s3cr3t', FRESHDESK_URL='http://127.0.0.1:9'
+)
+
+
+@pytest.fixture(scope='session')
+def server():
+    """freshdesk_server arrancado sobre un almacén vacío y sin Freshdesk accesible"""
+    import freshdesk_server
+    freshdesk_server.start()
+    # Almacén recién sincronizado y vacío: las peticiones no esperan a Freshdesk
+    freshdesk_server.tenant_for().store.merge([])
+    return freshdesk_server
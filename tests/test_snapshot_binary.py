@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Snapshot binario: ida y vuelta exacta y archivos truncados o dañados ignorados"""
+
+import os
+from array import array
+
+import pytest
+
+import snapshot_binary
+from snapshot_binary import (HEADER, SECTION, SnapshotFormatError, open_binary, pack_columns,
+                             write_binary)
+from tenants import Tenant
+from ticket_columns import TicketColumns
+
+CODECS = ['none', 'zlib', pytest.param('zstd', marks=pytest.mark.skipif(
+    snapshot_binary.zstandard is None, reason="requiere zstandard"))]
+
+
+def ticket(ticket_id, subject, **fields):
+    return {'id': ticket_id, 'subject': subject, 'status': 2, 'priority': 1,
+            'created_at': f"2025-01-{ticket_id:02d}T10:00:00Z", 'updated_at': '2025-02-01T10:00:00Z',
+            'description': f"Descripción del ticket {ticket_id} " * 20, 'requester_name': 'Ana',
+            'tags': ['vpn'], **fields}
+
+
+def columns_with_freed_codes():
+    columns = TicketColumns.from_tickets([
+        ticket(1, 'VPN caída'), ticket(2, 'Correo lleno', requester_name=None, tags=[]),
+        ticket(3, None, status=None, description='ñandú'), ticket(4, 'Impresora'),
+    ])
+    # 'Impresora' deja su código libre y 'Escáner' lo reutiliza
+    columns.replace(3, ticket(4, 'VPN caída', tags=['a', 'b']))
+    columns.replace(0, ticket(1, 'Escáner', description=''))
+    assert columns.subject._free == [] and columns.subject.values[3] == 'Escáner'
+    return columns
+
+
+def write(path, columns, compression='none', order=None):
+    write_binary(str(path), {'version': 7, 'store_id': 'x'}, pack_columns(columns, order), compression)
+    return path
+
+
+@pytest.mark.parametrize('compression', CODECS)
+def test_round_trip(tmp_path, compression):
+    columns = columns_with_freed_codes()
+    order = array('I', [2, 0, 3, 1])
+    saved = open_binary(str(write(tmp_path / 'a.snap', columns, compression, order)))
+    assert saved['version'] == 7 and saved['store_id'] == 'x'
+    assert list(saved['columns']) == columns.rows(order)
+    assert list(saved['columns'].copy()) == columns.rows(order)
+
+
+def test_truncated_file_is_ignored(tmp_path):
+    path = write(tmp_path / 'a.snap', columns_with_freed_codes())
+    data = path.read_bytes()
+    for size in (0, HEADER.size - 1, HEADER.size + 5, len(data) // 2, len(data) - 1):
+        path.write_bytes(data[:size])
+        assert open_binary(str(path)) is None
+        if size:
+            with pytest.raises(SnapshotFormatError):
+                snapshot_binary.map_columns(data[:size])
+
+
+def test_lengths_beyond_the_file_are_ignored(tmp_path):
+    path = write(tmp_path / 'a.snap', columns_with_freed_codes())
+    data = path.read_bytes()
+    magic, version, rows, count, meta_length = HEADER.unpack_from(data)
+    for header in (HEADER.pack(magic, version, rows, count, len(data)),
+                   HEADER.pack(magic, version, rows, count + 1000, meta_length)):
+        path.write_bytes(header + data[HEADER.size:])
+        assert open_binary(str(path)) is None
+
+
+def damage_descriptions(path):
+    """Cambia los bytes de la tabla de descripciones (comprimida) sin alterar su largo"""
+    data = bytearray(path.read_bytes())
+    _, _, _, count, meta_length = HEADER.unpack_from(data)
+    for n in range(count):
+        name, _, _, _, start, length, _ = SECTION.unpack_from(data, HEADER.size + meta_length + n * SECTION.size)
+        if name.rstrip(b'\0') == b'description.data':
+            data[start:start + length] = bytes(b ^ 0x5A for b in data[start:start + length])
+    path.write_bytes(bytes(data))
+
+
+def test_damaged_compressed_block_is_a_format_error(tmp_path):
+    path = write(tmp_path / 'a.snap', columns_with_freed_codes(), 'zlib')
+    damage_descriptions(path)
+    saved = open_binary(str(path))
+    with pytest.raises(SnapshotFormatError):
+        list(saved['columns'])
+
+
+def test_restore_skips_damaged_snapshot(server, tmp_path):
+    path = write(tmp_path / 'x.snap', columns_with_freed_codes(), 'zlib')
+    damage_descriptions(path)
+    os.replace(path, snapshot_binary.binary_path(server.SNAPSHOT_DIR, 'dañado'))
+    tenant = Tenant('dañado', 1, 'Dañado', str(tmp_path / 'store.db'))
+    assert server.restore_snapshot(tenant) is False
+    assert tenant.store.tickets() == []
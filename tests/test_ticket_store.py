@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+import pytest
+
+from ticket_store import LeaseLost, TicketStore
+
+
+def ticket(ticket_id, updated_at='2025-01-01T00:00:00Z'):
+    return {'id': ticket_id, 'created_at': updated_at, 'updated_at': updated_at, 'subject': 'x'}
+
+
+@pytest.fixture
+def store():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield TicketStore(os.path.join(tmp, 'store.db'))
+
+
+def test_renewed_lease_keeps_other_workers_out(store):
+    assert store.acquire_lease('a', 60)
+    assert store.acquire_lease('a', 60)
+    assert not store.acquire_lease('b', 60)
+
+
+def test_merge_with_lost_lease_writes_nothing(store):
+    assert store.acquire_lease('a', -1)
+    assert store.acquire_lease('b', 60)
+    with pytest.raises(LeaseLost):
+        store.merge([ticket(1)], owner='a')
+    with pytest.raises(LeaseLost):
+        store.replace_all([ticket(1)], owner='a')
+    assert store.tickets() == []
+    assert store.high_water_mark() is None
+
+    assert store.merge([ticket(1)], owner='b') == (1, 0)
+    assert store.replace_all([ticket(2)], owner='b') == (1, 0)
+    assert [t['id'] for t in store.tickets()] == [2]
+
+
+def test_expired_lease_is_lost(store):
+    assert store.acquire_lease('a', -1)
+    with pytest.raises(LeaseLost):
+        store.merge([ticket(1)], owner='a')
+    assert store.merge([ticket(1)]) == (1, 0)
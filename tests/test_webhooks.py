@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Webhooks malformados: 400 sin tocar el almacén ni bloquear los siguientes"""
+
+import pytest
+
+from webhooks import WebhookError, ticket_from_payload
+
+INVALID = [
+    {'ticket': 'x'},
+    {'ticket': {'id': 6, 'status': 2.5}},
+    {'ticket': {'id': 6, 'status': [2]}},
+    {'ticket': {'id': 6, 'status': 'raro'}},
+    {'ticket': {'id': 6, 'status': 70000}},
+    {'ticket': {'id': 6, 'tags': 5}},
+    {'ticket': {'id': 6, 'tags': [['a']]}},
+    {'ticket': {'id': 6, 'subject': {'a': 1}}},
+    {'ticket': {'id': 6, 'requester': 'Ana'}},
+    {'ticket': {'id': 2**63}},
+    {'ticket': {'id': True}},
+    {'ticket': {'id': 0}},
+    {'freshdesk_webhook': 'x'},
+    {'freshdesk_webhook': None},
+    {'freshdesk_webhook': {'ticket_id': 'abc'}},
+    [],
+]
+
+
+@pytest.mark.parametrize('payload', INVALID)
+def test_invalid_payloads_raise(payload):
+    with pytest.raises(WebhookError):
+        ticket_from_payload(payload)
+
+
+def test_valid_payloads():
+    raw = ticket_from_payload({'freshdesk_webhook': {
+        'ticket_id': '#42', 'ticket_status': 'Closed', 'ticket_tags': 'vpn, urgente'}})
+    assert raw['id'] == 42 and raw['status'] == 5 and raw['tags'] == ['vpn', 'urgente']
+    raw = ticket_from_payload({'ticket': {'id': 7, 'status': '3', 'tags': ['a']}})
+    assert raw['status'] == 3 and raw['tags'] == ['a']
+
+
+@pytest.mark.parametrize('payload', INVALID)
+def test_invalid_webhook_is_rejected_before_storing(server, payload):
+    client = server.app.test_client()
+    response = client.post('/api/webhooks/freshdesk', json=payload,
+                           headers={'X-Webhook-Secret': server.WEBHOOK_SECRET})
+    assert response.status_code == 400
+    assert server.tenant_for().store.get(6) is None
+
+
+def test_later_webhooks_still_apply(server):
+    client = server.app.test_client()
+    headers = {'X-Webhook-Secret': server.WEBHOOK_SECRET}
+    client.post('/api/webhooks/freshdesk', json={'ticket': {'id': 6, 'status': 2.5}}, headers=headers)
+    for ticket_id in (7, 8):
+        response = client.post('/api/webhooks/freshdesk', headers=headers, json={
+            'ticket': {'id': ticket_id, 'subject': 'VPN caída', 'status': 2,
+                       'created_at': '2026-01-15T14:34:53Z'}})
+        assert response.status_code == 200, response.get_json()
+    ids = [t['id'] for t in server.tenant_for().store.tickets()]
+    assert 6 not in ids and {7, 8} <= set(ids)
+    assert server.tenant_for().cache['data'].columns.positions.keys() >= {7, 8}
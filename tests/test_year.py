@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Parámetro year: 400 si no es un año y sin vistas cacheadas de años vacíos"""
+
+import pytest
+
+from pagination import PaginationError, parse_year
+from snapshot import Snapshot
+
+ENDPOINTS = ['/api/tickets', '/api/tickets/export', '/api/kpis', '/api/recurrence',
+             '/api/trends', '/api/dashboard', '/api/search?q=vpn&', '/api/report.pdf']
+
+
+def url(endpoint, year):
+    return f"{endpoint}{'' if endpoint.endswith('&') else '?'}year={year}"
+
+
+def test_parse_year():
+    assert parse_year(None) is None
+    assert parse_year('') is None
+    assert parse_year('all') is None
+    assert parse_year('2025') == '2025'
+    for value in ('25', '2025-01', '20x5', '２０２５', '12345'):
+        with pytest.raises(PaginationError):
+            parse_year(value)
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS)
+def test_invalid_year_is_rejected(server, endpoint):
+    response = server.app.test_client().get(url(endpoint, '2025-x'))
+    assert response.status_code == 400
+    assert 'year' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('endpoint', ENDPOINTS[:-1])
+def test_valid_year_is_accepted(server, endpoint):
+    client = server.app.test_client()
+    assert client.get(url(endpoint, '2025')).status_code == 200
+    assert client.get(url(endpoint, 'all')).status_code == 200
+
+
+def test_empty_years_are_not_cached():
+    snapshot = Snapshot.from_tickets([
+        {'id': 1, 'subject': 'a', 'created_at': '2025-03-01T10:00:00Z', 'status': 2},
+        {'id': 2, 'subject': 'b', 'created_at': '2024-03-01T10:00:00Z', 'status': 2},
+    ], 1)
+    assert list(snapshot.sorted_rows('1999', 'id')) == []
+    assert len(snapshot.sorted_rows('2025', 'id')) == 1
+    assert len(snapshot.sorted_rows(None, 'id')) == 2
+    assert set(snapshot._views) == {('2025', 'id'), ('all', 'id')}
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén columnar en memoria de tickets - AFJ Global
+En lugar de una lista de dicts (cada uno repite sus claves y guarda fechas
+como texto) el snapshot se guarda por columnas: arrays compactos para id,
+estado, prioridad y fechas en segundos epoch, y columnas de texto
+codificadas por diccionario (cada asunto/solicitante distinto se guarda una
+sola vez). Las fechas se parsean una vez al ingerir; los dicts para JSON se
+construyen solo para las filas que se van a enviar.
+"""
+
+import logging
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+STATUS_NAMES = {2: "Abierto", 3: "Pendiente", 4: "Resuelto", 5: "Cerrado"}
+PRIORITY_NAMES = {1: 'Bajo', 2: 'Medio', 3: 'Alto'}
+
+# Valor de las columnas numéricas cuando el dato no existe
+MISSING = -1
+
+
+def parse_epoch(value):
+    """Fecha ISO de Freshdesk ('2026-01-15T14:34:53Z') a segundos epoch"""
+    if not value:
+        return MISSING
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except (TypeError, ValueError) as e:
+        log.warning("Error procesando fecha", extra={'value': value, 'error': str(e)})
+        return MISSING
+
+
+def format_epoch(epoch):
+    """Segundos epoch a fecha ISO en UTC (formato de la API)"""
+    if epoch == MISSING:
+        return None
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(epoch))
+
+
+def copy_array(values, typecode):
+    """Array nuevo con el contenido de un array o de una vista de memoria"""
+    copy = array(typecode)
+    copy.frombytes(memoryview(values).cast('B'))
+    return copy
+
+
+class StringColumn:
+    """
+    Columna codificada por diccionario: códigos enteros + tabla de valores.
+
+    Al sobrescribir filas se cuentan las referencias de cada código (se
+    empiezan a contar en el primer reemplazo: armar columnas nuevas no paga
+    nada) y los valores que quedan sin uso dejan su código libre para el
+    próximo valor nuevo, así la tabla no crece con cada cambio.
+    """
+
+    def __init__(self):
+        self.codes = array('I')
+        self.values = []
+        self._lookup = {}
+        self._refs = None      # filas por código (None: aún no se cuentan)
+        self._free = []        # códigos sin filas, para reutilizar
+
+    def encode(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            if self._free:
+                code = self._free.pop()
+                self.values[code] = value
+            else:
+                code = len(self.values)
+                self.values.append(value)
+                if self._refs is not None:
+                    self._refs.append(0)
+            self._lookup[value] = code
+        return code
+
+    def append(self, value):
+        code = self.encode(value)
+        self.codes.append(code)
+        if self._refs is not None:
+            self._refs[code] += 1
+
+    def __setitem__(self, i, value):
+        if self._refs is None:
+            self._count_refs()
+        old, code = self.codes[i], self.encode(value)
+        if code == old:
+            return
+        self.codes[i] = code
+        self._refs[code] += 1
+        self._refs[old] -= 1
+        if not self._refs[old]:
+            self._release(old)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def _release(self, code):
+        """Libera un código sin filas (su valor deja de ocupar memoria)"""
+        if self._lookup.get(self.values[code]) == code:
+            del self._lookup[self.values[code]]
+        self.values[code] = ''
+        self._free.append(code)
+
+    def _count_refs(self):
+        counts = Counter(self.codes)
+        self._refs = array('I', (counts[code] for code in range(len(self.values))))
+        self._lookup = {self.values[code]: code for code in counts}
+        self._free = []
+        for code, count in enumerate(self._refs):
+            if not count:
+                self.values[code] = ''
+                self._free.append(code)
+
+    def copy(self):
+        """Columna independiente con el mismo contenido"""
+        column = StringColumn()
+        column.codes = copy_array(self.codes, 'I')
+        column.values = list(self.values)
+        column._lookup = dict(self._lookup)
+        if self._refs is not None:
+            column._refs = self._refs[:]
+            column._free = list(self._free)
+        return column
+
+
+class TicketColumns:
+    """Snapshot de tickets por columnas con vista de filas perezosa"""
+
+    FIELDS = (
+        'id', 'subject', 'description', 'priority', 'priority_name', 'status',
+        'status_name', 'created_at', 'updated_at', 'requester_name', 'tags'
+    )
+
+    NUMERIC = (('ids', 'q'), ('status', 'h'), ('priority', 'b'), ('created', 'q'), ('updated', 'q'))
+    STRINGS = ('subject', 'description', 'requester', 'tags')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.status = array('h')
+        self.priority = array('b')
+        self.created = array('q')
+        self.updated = array('q')
+        self.subject = StringColumn()
+        self.description = StringColumn()
+        self.requester = StringColumn()
+        self.tags = StringColumn()     # tuplas de tags
+        self.positions = {}            # id -> fila
+
+    @classmethod
+    def from_tickets(cls, tickets):
+        """Construye las columnas a partir de tickets procesados (dicts)"""
+        columns = cls()
+        for t in tickets:
+            columns.append(t)
+        return columns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def copy(self):
+        """
+        Columnas independientes con el mismo contenido: los cambios se hacen
+        sobre la copia y el snapshot publicado no se toca
+        """
+        columns = TicketColumns()
+        for name, typecode in self.NUMERIC:
+            setattr(columns, name, copy_array(getattr(self, name), typecode))
+        for name in self.STRINGS:
+            setattr(columns, name, getattr(self, name).copy())
+        columns.positions = dict(self.positions)
+        return columns
+
+    def append(self, t):
+        """Agrega un ticket procesado al final; retorna su número de fila"""
+        i = len(self.ids)
+        self.positions[t.get('id')] = i
+        self.ids.append(t.get('id') or 0)
+        self.status.append(t.get('status') or MISSING)
+        self.priority.append(t.get('priority') or MISSING)
+        self.created.append(parse_epoch(t.get('created_at')))
+        self.updated.append(parse_epoch(t.get('updated_at')))
+        self.subject.append(t.get('subject'))
+        self.description.append(t.get('description') or '')
+        self.requester.append(t.get('requester_name'))
+        self.tags.append(tuple(t.get('tags') or ()))
+        return i
+
+    def replace(self, i, t):
+        """Sobrescribe la fila `i` con un ticket procesado"""
+        self.status[i] = t.get('status') or MISSING
+        self.priority[i] = t.get('priority') or MISSING
+        self.created[i] = parse_epoch(t.get('created_at'))
+        self.updated[i] = parse_epoch(t.get('updated_at'))
+        self.subject[i] = t.get('subject')
+        self.description[i] = t.get('description') or ''
+        self.requester[i] = t.get('requester_name')
+        self.tags[i] = tuple(t.get('tags') or ())
+
+    # --------------------------------------------------------
+    # Vista de filas
+    # --------------------------------------------------------
+
+    def value(self, i, field):
+        """Valor de un campo de la fila `i` con el formato de la API"""
+        if field == 'id':
+            return self.ids[i]
+        if field == 'subject':
+            return self.subject[i]
+        if field == 'description':
+            return self.description[i]
+        if field in ('status', 'priority'):
+            value = getattr(self, field)[i]
+            return None if value == MISSING else value
+        if field == 'status_name':
+            return STATUS_NAMES.get(self.value(i, 'status'), "Otro")
+        if field == 'priority_name':
+            return PRIORITY_NAMES.get(self.priority[i], 'Bajo')
+        if field == 'created_at':
+            return format_epoch(self.created[i])
+        if field == 'updated_at':
+            return format_epoch(self.updated[i])
+        if field == 'requester_name':
+            return self.requester[i]
+        if field == 'tags':
+            return list(self.tags[i])
+        raise KeyError(field)
+
+    def row(self, i, fields=None):
+        """Fila `i` como dict (solo los campos pedidos)"""
+        if fields:
+            return {field: self.value(i, field) for field in fields}
+
+        status = self.status[i]
+        priority = self.priority[i]
+        return {
+            "id": self.ids[i],
+            "subject": self.subject[i],
+            "description": self.description[i],
+            "priority": None if priority == MISSING else priority,
+            "priority_name": PRIORITY_NAMES.get(priority, 'Bajo'),
+            "status": None if status == MISSING else status,
+            "status_name": STATUS_NAMES.get(status, "Otro"),
+            "created_at": format_epoch(self.created[i]),
+            "updated_at": format_epoch(self.updated[i]),
+            "requester_name": self.requester[i],
+            "tags": list(self.tags[i])
+        }
+
+    def rows(self, indices=None, fields=None):
+        """Lista de dicts para las filas indicadas (todas por defecto)"""
+        if indices is None:
+            indices = range(len(self))
+        return [self.row(i, fields) for i in indices]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def year(self, i):
+        """Año de creación (texto) de la fila `i`, o None"""
+        created = self.created[i]
+        if created == MISSING:
+            return None
+        return str(time.gmtime(created).tm_year)
+
+    def sort_key(self, field):
+        """Clave (valor, id) de una fila para ordenar por created_at, updated_at o id"""
+        ids = self.ids
+        if field == 'id':
+            return lambda i: (ids[i], ids[i])
+        column = self.created if field == 'created_at' else self.updated
+        return lambda i: (column[i], ids[i])
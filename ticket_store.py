@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Almacén local persistente de tickets - AFJ Global
+Guarda los tickets procesados en un archivo SQLite (modo WAL) junto con la
+marca de agua (updated_at) para que la sincronización con Freshdesk sea
+incremental. El mismo archivo actúa como cache compartido entre los workers
+de gunicorn: una versión que sube con cada cambio y un lease que garantiza
+que solo un worker actualiza a la vez.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+STORE_FILE = os.environ.get("TICKET_STORE_FILE", "ticket_store.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class LeaseLost(RuntimeError):
+    """El lease de actualización ya no es de este worker: no se guarda nada"""
+
+
+class TicketStore:
+    """Tickets procesados + metadatos de sincronización en SQLite"""
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._store_id = None
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(tickets)")]
+        if 'version' not in columns:
+            # Almacenes creados antes de registrar la versión de cada fila
+            conn.execute("ALTER TABLE tickets ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS tickets_version ON tickets (version)")
+        # Identidad del archivo: las versiones solo son comparables dentro del mismo almacén
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+
+    def _conn(self):
+        """
+        Una conexión por hilo y proceso: sqlite3 no comparte conexiones entre
+        hilos ni sobrevive a un fork (gunicorn --preload).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # --------------------------------------------------------
+    # Metadatos
+    # --------------------------------------------------------
+
+    def _get_meta(self, key, conn=None):
+        row = (conn or self._conn()).execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, conn, key, value):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, None if value is None else str(value))
+        )
+
+    def high_water_mark(self):
+        """Mayor `updated_at` sincronizado (None si nunca se sincronizó)"""
+        return self._get_meta('high_water_mark')
+
+    def snapshot_meta(self):
+        """Versión de los datos y momento de la última sincronización correcta"""
+        rows = dict(self._conn().execute(
+            "SELECT key, value FROM meta WHERE key IN ('version', 'synced_at')"
+        ).fetchall())
+        return {
+            'version': int(rows.get('version') or 0),
+            'synced_at': float(rows['synced_at']) if rows.get('synced_at') else None
+        }
+
+    def store_id(self):
+        """Identidad del archivo (se genera al crearlo y no cambia)"""
+        if self._store_id is None:
+            self._store_id = self._get_meta('store_id')
+        return self._store_id
+
+    def sync_state(self):
+        """
+        Identidad del almacén, versión, fecha de sincronización y marca de
+        agua leídas en una sola consulta (coherentes entre sí)
+        """
+        rows = dict(self._conn().execute(
+            "SELECT key, value FROM meta "
+            "WHERE key IN ('store_id', 'version', 'synced_at', 'high_water_mark')"
+        ).fetchall())
+        return {
+            'store_id': rows.get('store_id'),
+            'version': int(rows.get('version') or 0),
+            'synced_at': float(rows['synced_at']) if rows.get('synced_at') else None,
+            'high_water_mark': rows.get('high_water_mark')
+        }
+
+    # --------------------------------------------------------
+    # Datos
+    # --------------------------------------------------------
+
+    def tickets(self, conn=None):
+        """Lista de tickets, más recientes primero (como la API)"""
+        rows = (conn or self._conn()).execute(
+            "SELECT data FROM tickets ORDER BY created_at DESC, id DESC"
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_tickets(self):
+        """Como `tickets`, pero de a uno: no carga todo el almacén en memoria"""
+        cursor = self._conn().execute(
+            "SELECT data FROM tickets ORDER BY created_at DESC, id DESC"
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def get(self, ticket_id):
+        """Ticket procesado por id (None si no está)"""
+        row = self._conn().execute(
+            "SELECT data FROM tickets WHERE id = ?", (ticket_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def changes(self, known_version=None, max_changes=0):
+        """
+        Lectura versionada en una sola transacción: retorna
+        (meta, tickets, incremental).
+
+        - Versión igual a `known_version`: tickets es None.
+        - Si desde `known_version` solo cambiaron hasta `max_changes` filas (y
+          no hubo sincronización completa), tickets son solo esas filas e incremental es True.
+        - Si no, tickets es la lista completa e incremental es False.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            meta = self.snapshot_meta()
+            if meta['version'] == known_version:
+                return meta, None, False
+
+            if known_version is not None and max_changes:
+                reset_version = int(self._get_meta('reset_version', conn) or 0)
+                if reset_version <= known_version:
+                    count = conn.execute(
+                        "SELECT COUNT(*) FROM tickets WHERE version > ?", (known_version,)
+                    ).fetchone()[0]
+                    if count <= max_changes:
+                        rows = conn.execute(
+                            "SELECT data FROM tickets WHERE version > ? ORDER BY version, id",
+                            (known_version,)
+                        ).fetchall()
+                        return meta, [json.loads(row[0]) for row in rows], True
+
+            return meta, self.tickets(conn), False
+        finally:
+            conn.execute("COMMIT")
+
+    def merge(self, tickets, advance=True, owner=None):
+        """
+        Fusiona tickets por `id`, avanza la marca de agua y marca la
+        sincronización como correcta. La versión solo sube si algo cambió.
+        Con `advance=False` (eventos sueltos, p. ej. webhooks) no se tocan la
+        marca de agua ni la fecha de sincronización: el próximo sondeo
+        incremental sigue pidiendo desde donde se quedó. Con `owner` solo se
+        guarda si ese worker sigue teniendo el lease (si no, LeaseLost).
+        Retorna (nuevos, actualizados).
+        """
+        conn = self._conn()
+        new = 0
+        updated = 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_lease(conn, owner)
+            hwm = self._get_meta('high_water_mark', conn)
+            version = int(self._get_meta('version', conn) or 0) + 1
+            for t in tickets:
+                data = json.dumps(t, ensure_ascii=False, sort_keys=True)
+                previous = conn.execute(
+                    "SELECT data FROM tickets WHERE id = ?", (t['id'],)
+                ).fetchone()
+                if previous is None:
+                    new += 1
+                elif previous[0] != data:
+                    updated += 1
+                else:
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO tickets (id, created_at, updated_at, data, version) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (t['id'], t.get('created_at'), t.get('updated_at'), data, version)
+                )
+
+            if new or updated:
+                self._set_meta(conn, 'version', version)
+            if advance:
+                self._advance(conn, hwm, tickets)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return new, updated
+
+    def _advance(self, conn, hwm, tickets):
+        """Avanza la marca de agua hasta el mayor `updated_at` de `tickets` y marca la sincronización"""
+        for t in tickets:
+            if t.get('updated_at') and (hwm is None or t['updated_at'] > hwm):
+                hwm = t['updated_at']
+        self._set_meta(conn, 'high_water_mark', hwm)
+        self._set_meta(conn, 'synced_at', time.time())
+
+    def replace_all(self, tickets, owner=None):
+        """
+        Sincronización completa: sustituye todos los tickets por `tickets` en
+        una sola transacción (si la descarga falla antes, el almacén queda
+        como estaba). `owner` como en merge(). Retorna (nuevos, actualizados)
+        respecto a lo anterior.
+        """
+        conn = self._conn()
+        new = 0
+        updated = 0
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_lease(conn, owner)
+            previous = dict(conn.execute("SELECT id, data FROM tickets"))
+            version = int(self._get_meta('version', conn) or 0) + 1
+            rows = []
+            for t in tickets:
+                data = json.dumps(t, ensure_ascii=False, sort_keys=True)
+                old = previous.get(t['id'])
+                if old is None:
+                    new += 1
+                elif old != data:
+                    updated += 1
+                rows.append((t['id'], t.get('created_at'), t.get('updated_at'), data, version))
+            conn.execute("DELETE FROM tickets")
+            conn.executemany(
+                "INSERT OR REPLACE INTO tickets (id, created_at, updated_at, data, version) "
+                "VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._set_meta(conn, 'version', version)
+            # Las copias en memoria anteriores a esta versión deben recargarse enteras
+            self._set_meta(conn, 'reset_version', version)
+            self._advance(conn, None, tickets)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        return new, updated
+
+    def restore(self, tickets, high_water_mark=None, synced_at=None):
+        """
+        Carga un snapshot guardado (o una semilla) en un almacén vacío, con su
+        marca de agua y fecha de sincronización: la próxima sincronización
+        sigue desde ahí. Si el almacén ya tiene datos (p. ej. otro worker lo
+        restauró o ya sincronizó) no hace nada. Retorna los metadatos
+        (version, synced_at) del almacén restaurado, o None si no se cargó.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._get_meta('synced_at', conn) is not None or \
+                    conn.execute("SELECT 1 FROM tickets LIMIT 1").fetchone() is not None:
+                conn.execute("ROLLBACK")
+                return None
+            version = int(self._get_meta('version', conn) or 0) + 1
+            conn.executemany(
+                "INSERT OR REPLACE INTO tickets (id, created_at, updated_at, data, version) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((t['id'], t.get('created_at'), t.get('updated_at'),
+                  json.dumps(t, ensure_ascii=False, sort_keys=True), version) for t in tickets)
+            )
+            synced_at = synced_at if synced_at is not None else time.time()
+            self._set_meta(conn, 'version', version)
+            self._set_meta(conn, 'high_water_mark', high_water_mark)
+            self._set_meta(conn, 'synced_at', synced_at)
+            conn.execute("COMMIT")
+            return {'version': version, 'synced_at': float(synced_at)}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --------------------------------------------------------
+    # Lease del refresco (un solo worker sincroniza a la vez)
+    # --------------------------------------------------------
+
+    def acquire_lease(self, owner, seconds):
+        """Intenta tomar el lease de actualización; True si este worker lo obtuvo"""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            holder = self._get_meta('lease_owner', conn)
+            until = float(self._get_meta('lease_until', conn) or 0)
+            if holder not in (None, owner) and until > now:
+                conn.execute("ROLLBACK")
+                return False
+            self._set_meta(conn, 'lease_owner', owner)
+            self._set_meta(conn, 'lease_until', now + seconds)
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _check_lease(self, conn, owner):
+        """
+        Dentro de una transacción de escritura: falla con LeaseLost si el
+        lease de `owner` venció o pasó a otro worker (que puede estar
+        sincronizando a la vez). Sin `owner` no se comprueba nada.
+        """
+        if owner is None:
+            return
+        holder = self._get_meta('lease_owner', conn)
+        until = float(self._get_meta('lease_until', conn) or 0)
+        if holder != owner or until <= time.time():
+            raise LeaseLost(f"El lease de {owner} ya no está vigente")
+
+    def release_lease(self, owner):
+        """Libera el lease si sigue siendo de este worker"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        if self._get_meta('lease_owner', conn) == owner:
+            self._set_meta(conn, 'lease_until', 0)
+        conn.execute("COMMIT")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Webhooks de Freshdesk (automatizaciones de creación/actualización) - AFJ Global
+Convierte el cuerpo del webhook en un ticket con el formato de la API
+(/api/v2/tickets) para procesarlo igual que los descargados. Se aceptan:
+
+- el ticket tal cual lo devuelve la API, o dentro de {"ticket": {...}}
+- el cuerpo típico de una automatización con placeholders:
+  {"freshdesk_webhook": {"ticket_id": ..., "ticket_subject": ..., ...}}
+
+Solo se incluyen los campos presentes en el cuerpo: en una actualización
+parcial el resto se toma del ticket ya guardado.
+"""
+
+import hmac
+from datetime import datetime, timezone
+
+# Nombres de estado (placeholders de Freshdesk en inglés o español) -> código
+STATUS_CODES = {
+    'open': 2, 'abierto': 2,
+    'pending': 3, 'pendiente': 3,
+    'resolved': 4, 'resuelto': 4,
+    'closed': 5, 'cerrado': 5
+}
+
+# Placeholder de la automatización -> campo de la API
+PLACEHOLDER_FIELDS = {
+    'ticket_subject': 'subject',
+    'ticket_description': 'description_text',
+    'ticket_status': 'status',
+    'ticket_created_at': 'created_at',
+    'ticket_updated_at': 'updated_at',
+    'ticket_tags': 'tags',
+    'ticket_company_id': 'company_id'
+}
+
+
+# Los ids se guardan en columnas int64 y los estados en int16
+MAX_ID = 2**63 - 1
+MAX_STATUS = 2**15 - 1
+
+# Campos de texto del ticket (formato API)
+TEXT_FIELDS = ('subject', 'description_text')
+
+
+class WebhookError(ValueError):
+    """Cuerpo de webhook inválido (se responde 400)"""
+
+
+def verify_secret(expected, provided):
+    """Compara el secreto compartido en tiempo constante"""
+    return bool(expected) and hmac.compare_digest(expected.encode('utf-8'),
+                                                  (provided or '').encode('utf-8'))
+
+
+def iso_date(value):
+    """Fecha del webhook a ISO UTC ('2026-01-15T14:34:53Z'); None si no se entiende"""
+    if not value:
+        return None
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            moment = datetime.fromtimestamp(value, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def ticket_from_payload(payload):
+    """Ticket (formato API, solo los campos presentes) a partir del cuerpo del webhook"""
+    if not isinstance(payload, dict):
+        raise WebhookError("El cuerpo debe ser un objeto JSON")
+
+    if 'freshdesk_webhook' in payload:
+        data = payload['freshdesk_webhook']
+        if not isinstance(data, dict):
+            raise WebhookError("freshdesk_webhook debe ser un objeto")
+        raw = {'id': data.get('ticket_id')}
+        for placeholder, field in PLACEHOLDER_FIELDS.items():
+            if data.get(placeholder) not in (None, ''):
+                raw[field] = data[placeholder]
+        if data.get('ticket_requester_name'):
+            raw['requester'] = {'name': data['ticket_requester_name']}
+    else:
+        ticket = payload.get('ticket', payload)
+        if not isinstance(ticket, dict):
+            raise WebhookError("ticket debe ser un objeto")
+        raw = dict(ticket)
+
+    raw['id'] = _ticket_id(raw.get('id'))
+    if 'status' in raw:
+        raw['status'] = _status(raw['status'])
+    if 'tags' in raw:
+        raw['tags'] = _tags(raw['tags'])
+    for field in TEXT_FIELDS:
+        if raw.get(field) is not None and not isinstance(raw[field], str):
+            raise WebhookError(f"{field} debe ser texto")
+    requester = raw.get('requester')
+    if requester is not None and not (isinstance(requester, dict)
+                                      and isinstance(requester.get('name', ''), (str, type(None)))):
+        raise WebhookError("requester debe ser un objeto con name de texto")
+
+    for field in ('created_at', 'updated_at'):
+        if field in raw:
+            raw[field] = iso_date(raw[field])
+    if not raw.get('updated_at'):
+        raw['updated_at'] = now_iso()
+
+    return raw
+
+
+def _ticket_id(value):
+    """Id del ticket ('#123' o 123) como entero positivo que cabe en int64"""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise WebhookError("El webhook no trae un ticket_id válido")
+    text = str(value).strip().lstrip('#')
+    if not text.isdigit() or not 0 < int(text) <= MAX_ID:
+        raise WebhookError("El webhook no trae un ticket_id válido")
+    return int(text)
+
+
+def _status(value):
+    """Estado como código entero: número o nombre conocido (None si no viene)"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        code = STATUS_CODES.get(value.strip().lower())
+        if code is not None:
+            return code
+        if not value.strip().isdigit():
+            raise WebhookError(f"Estado desconocido: {value}")
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_STATUS:
+        raise WebhookError(f"Estado inválido: {value!r}")
+    return value
+
+
+def _tags(value):
+    """Tags como lista de textos (se aceptan separados por comas)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [tag.strip() for tag in value.split(',') if tag.strip()]
+    if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+        raise WebhookError("tags debe ser una lista de textos o texto separado por comas")
+    return value
+
+
+def as_raw(ticket):
+    """Ticket procesado (formato del visor) de vuelta al formato de la API"""
+    return {
+        'id': ticket['id'],
+        'subject': ticket.get('subject'),
+        'description_text': ticket.get('description', ''),
+        'status': ticket.get('status'),
+        'created_at': ticket.get('created_at'),
+        'updated_at': ticket.get('updated_at'),
+        'requester': {'name': ticket.get('requester_name')},
+        'tags': ticket.get('tags', [])
+    }